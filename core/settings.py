@@ -274,6 +274,14 @@ Danke für deine Anmeldung als Gastfamilie für The Muri Competition. Du kannst
         "Hallo {inscription.given_name}\nDu erhältst dieses E-Mail, da du dich als Helfer für den TMC angemeldet hast. Du kannst deine Informationen jederzeit hier einsehen und bearbeiten: {auth_link}\n\nLiebe Grüsse, das TMC Team",
         "text sent to helpers after signup",
     ),
+    "TRANSPORT_WINDOW": (
+        60,
+        "minutes between the first and the last jury member of a pickup run",
+    ),
+    "VEHICLE_CAPACITY": (
+        4,
+        "seats for jury members in a vehicle of the drivers",
+    ),
 }
 
 Q_CLUSTER = {
@@ -286,7 +294,33 @@ Q_CLUSTER = {
     "orm": "default",
 }
 
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+# "s3" or "local": keep the files in MEDIA_ROOT and let the web server send the
+# recordings once Django authorized the request (see tmc.views.recording_file)
+RECORDING_STORAGE = env("RECORDING_STORAGE", default="s3")
+
+if RECORDING_STORAGE == "local":
+    DEFAULT_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+else:
+    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+
+# Regional buckets next to the default one, as json:
+# {"asia": {"bucket": "...", "region_name": "...", "endpoint_url": "...",
+#           "access_key_id": "...", "secret_access_key": "...", "probe_url": "..."}}
+RECORDING_BACKENDS = env.json("RECORDING_BACKENDS", default={})
+# url the upload script measures the latency of the default bucket with, the
+# endpoint url by default (plain AWS has none, e.g. https://s3.eu-central-1.amazonaws.com)
+RECORDING_PROBE_URL = env("RECORDING_PROBE_URL", default="")
+# nationality -> regional bucket, e.g. "CN=asia,JP=asia"
+RECORDING_BACKEND_COUNTRIES = env.dict("RECORDING_BACKEND_COUNTRIES", default={})
+
+# Prefix for the urls of local recordings used outside the browser (playlists)
+RECORDING_BASE_URL = env("RECORDING_BASE_URL", default="")
+
+# "X-Accel-Redirect" for nginx, "X-Sendfile" for apache/lighttpd or "" to let
+# Django send the file itself (development)
+SENDFILE_HEADER = env("SENDFILE_HEADER", default="X-Accel-Redirect")
+# internal nginx location that aliases MEDIA_ROOT
+SENDFILE_URL = env("SENDFILE_URL", default="/protected/")
 
 AWS_S3_ACCESS_KEY_ID = env("S3_ACCESS_KEY_ID", default="")
 
@@ -296,6 +330,14 @@ AWS_S3_REGION_NAME = env("S3_REGION_NAME", default="")
 AWS_S3_ENDPOINT_URL = env("S3_ENDPOINT_URL", default="")
 AWS_QUERYSTRING_EXPIRE = 60 * 60 * 24 * 5
 
+# Size of the parts for multipart uploads of recordings, grows for very large files
+RECORDING_PART_SIZE = env.int("RECORDING_PART_SIZE", default=16 * 1024 * 1024)
+
+# Light renditions of the recordings for playback in the browser
+FFMPEG_BINARY = env("FFMPEG_BINARY", default="ffmpeg")
+RECORDING_PREVIEW_HEIGHT = env.int("RECORDING_PREVIEW_HEIGHT", default=720)
+RECORDING_PREVIEW_BITRATE = env("RECORDING_PREVIEW_BITRATE", default="1500k")
+
 DJANGO_DRF_FILEPOND_UPLOAD_TMP = "/uploads/tmp/"
 DJANGO_DRF_FILEPOND_FILE_STORE_PATH = "/uploads/final"
 DJANGO_DRF_FILEPOND_ALLOW_EXTERNAL_UPLOAD_DIR = True
@@ -1,20 +1,55 @@
-import csv
-import io
+import datetime
+import tempfile
+from itertools import islice
 
-import pandas as pd
+from constance import config
+from django.conf import settings
 from django.contrib import admin
-from django.db import transaction
-from django.db.models import Q, QuerySet
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import (
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Sum,
+)
+from django.db.models.functions import TruncDate
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 from django.utils.translation import gettext as _
-from import_export import resources
-from import_export.admin import (
-    ExportActionMixin,
-    HttpResponse,
-    ImportExportMixin,
+from import_export import fields, resources
+from import_export.admin import ImportExportMixin
+
+from tmc.changelists import AutocompleteFilter, LargeTableMixin
+from tmc.exclusions import exclusion_graph
+from tmc.exports import (
+    manifest_csv,
+    manifest_json,
+    manifest_m3u,
+    recording_archive,
+    recording_manifest,
+    repertoire_rows,
+    resource_rows,
+    table_csv,
+    table_json,
+    write_xlsx,
 )
-
 from tmc.forms import HostAdminForm
+from tmc.imports import PersonResource
+from tmc.jobs import BackgroundExportActionMixin, background_action
+from tmc.matching import assign_hosts
 from tmc.models import (
+    AdminJob,
     DateSlot,
     Helper,
     HostFamily,
@@ -27,10 +62,28 @@ from tmc.models import (
     RequiredRecording,
     Ressort,
     Round,
+    SecretIdAllocation,
     Selection,
     SetList,
+    Shift,
+    StaffingDemand,
     TimeSlot,
+    UploadAttempt,
 )
+from tmc.progress import count_of
+from tmc.repertoire import repertoire_statistics
+from tmc.scheduling import schedule_helpers
+from tmc.secret_ids import allocate_secret_ids, replay
+from tmc.services import assign_guests
+from tmc.storage import get_backend
+from tmc.tasks import reconcile_recordings
+from tmc.transport import run_rows, transport_runs
+
+# Recordings listed per page on the change form of an inscription
+RECORDINGS_PER_PAGE = 20
+# Valid combinations of pieces listed and counted on the form of a set list
+COMBINATIONS_SHOWN = 20
+COMBINATIONS_COUNTED = 10000
 
 # Register your models here.
 
@@ -45,168 +98,419 @@ class InstrumentAdmin(admin.ModelAdmin):
     list_display = ("name",)
 
 
-class InscriptionResource(resources.ModelResource):
+class InscriptionResource(PersonResource):
     class Meta:
         model = Inscription
+        import_id_fields = ("uid",)
 
 
-class JuryResource(resources.ModelResource):
+class JuryResource(PersonResource):
     class Meta:
         model = JuryMember
 
 
-class HostFamilyResource(resources.ModelResource):
+class HostFamilyResource(PersonResource):
     class Meta:
         model = HostFamily
 
 
-class HelperResource(resources.ModelResource):
+class HelperResource(PersonResource):
     class Meta:
         model = Helper
 
 
+class ShiftResource(resources.ModelResource):
+    """The rota, one row per shift."""
+
+    date = fields.Field(attribute="demand__date__date", column_name="date")
+    slot = fields.Field(column_name="slot")
+    ressort = fields.Field(attribute="demand__ressort__name", column_name="ressort")
+    given_name = fields.Field(attribute="helper__given_name", column_name="given name")
+    surname = fields.Field(attribute="helper__surname", column_name="surname")
+    email = fields.Field(attribute="helper__email", column_name="email")
+    phone = fields.Field(attribute="helper__phone", column_name="phone")
+
+    class Meta:
+        model = Shift
+        fields = ("date", "slot", "ressort", "given_name", "surname", "email", "phone")
+        export_order = fields
+
+    def dehydrate_slot(self, shift):
+        return shift.demand.get_slot_display()
+
+
+class PersonImportMixin(ImportExportMixin):
+    """Imports with a `PersonResource`, which needs the site for the welcome mails."""
+
+    def get_import_resource_kwargs(self, request, *args, **kwargs):
+        return {
+            **super().get_import_resource_kwargs(request, *args, **kwargs),
+            "base_url": request.build_absolute_uri("/").rstrip("/"),
+        }
+
+
 @admin.register(RequiredRecording)
 class RequiredRecordingAdmin(admin.ModelAdmin):
     list_display = ("name", "nr", "instrument", "slug")
     list_filter = ("instrument",)
-
-
-class RecordingInline(admin.TabularInline):
-    model = Recording
-    extra = 0
+    search_fields = ("name", "slug")
 
 
 @admin.register(Recording)
-class RecordingAdmin(admin.ModelAdmin):
+class RecordingAdmin(LargeTableMixin, admin.ModelAdmin):
     list_display = ("requirement", "__str__", "uploader", "created", "updated")
-    list_filter = ("requirement", "uploader", "requirement__instrument")
+    list_filter = (
+        ("requirement", AutocompleteFilter),
+        ("uploader", AutocompleteFilter),
+        "requirement__instrument",
+        "backend",
+    )
+    list_select_related = ("requirement", "uploader")
+    autocomplete_fields = ("requirement", "uploader")
 
 
-@admin.action(description=_("Check for recordings and documents"))
-def check_recordings(modeladmin, request, queryset):
-    queryset.filter(Q(photo="") | Q(passport="")).update(has_documents=False)
-    queryset.exclude(Q(photo="") | Q(passport="")).update(has_documents=True)
+def int_param(request, name, default, minimum=0, maximum=None):
+    """An integer of the query string, `default` when it is missing or malformed."""
+    try:
+        value = max(int(request.GET.get(name) or default), minimum)
+    except ValueError:
+        return default
 
-    queryset.filter(recording__isnull=False).update(has_recordings=True)
-    queryset.filter(recording__isnull=True).update(has_recordings=False)
+    return value if maximum is None else min(value, maximum)
 
 
-@admin.action(description="Download recording playlist")
-def download_playlist(modeladmin, request, queryset):
-    recordings = Recording.objects.filter(uploader__in=queryset).order_by(
-        "uploader__secret_id", "requirement__nr"
+def upload_report(queryset: QuerySet[UploadAttempt]):
+    """Upload attempts aggregated per day and nationality of the contestants."""
+    completed = Q(status=UploadAttempt.COMPLETED)
+    duration = ExpressionWrapper(
+        F("finished") - F("started"), output_field=DurationField()
     )
 
-    results = []
-    for recording in recordings:
-        results.append(
-            {
-                "id": recording.uploader.secret_id,
-                "url": recording.recording.url,
-                "name": recording.requirement.name,
-            }
+    rows = (
+        queryset.annotate(
+            day=TruncDate("started"), nationality=F("inscription__nationality")
         )
+        .values("day", "nationality")
+        .annotate(
+            attempts=Count("pk"),
+            completed=Count("pk", filter=completed),
+            failed=Count("pk", filter=Q(status=UploadAttempt.FAILED)),
+            open=Count("pk", filter=Q(status=UploadAttempt.STARTED)),
+            size=Sum("size", filter=completed),
+            duration=Sum(duration, filter=completed),
+        )
+        .order_by("-day", "nationality")
+    )
 
-    response = HttpResponse(
-        content_type="text/m3u",
-        headers={"Content-Disposition": 'attachment; filename="recordings.m3u"'},
+    for row in rows:
+        seconds = row["duration"].total_seconds() if row["duration"] else 0
+        row["throughput"] = (
+            (row["size"] or 0) / seconds / 1024 / 1024 if seconds else None
+        )
+        row["average_duration"] = (
+            row["duration"] / row["completed"] if row["completed"] else None
+        )
+        yield row
+
+
+@admin.register(UploadAttempt)
+class UploadAttemptAdmin(admin.ModelAdmin):
+    list_display = (
+        "inscription",
+        "requirement",
+        "started",
+        "finished",
+        "size",
+        "status",
+        "error",
     )
+    list_filter = ("status", "inscription__nationality")
+    list_select_related = ("inscription", "requirement")
+    date_hierarchy = "started"
+
+    def get_urls(self):
+        return [
+            path(
+                "report/",
+                self.admin_site.admin_view(self.report_view),
+                name="tmc_uploadattempt_report",
+            )
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        days = int_param(request, "days", 30, minimum=1)
+        queryset = UploadAttempt.objects.filter(
+            started__gte=timezone.now() - datetime.timedelta(days=days)
+        )
+
+        return TemplateResponse(
+            request,
+            "admin/tmc/uploadattempt/report.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": _("Upload report"),
+                "days": days,
+                "rows": list(upload_report(queryset)),
+            },
+        )
 
-    response.write("#EXTM3U\n\n")
-    for i, result in enumerate(results):
-        line = f'#EXTINF:{i:03}, {result["id"]} - {result["name"]}\n{result["url"]}\n'
-        response.write(line)
 
-    return response
+@admin.register(SecretIdAllocation)
+class SecretIdAllocationAdmin(admin.ModelAdmin):
+    list_display = ("created", "user", "seed", "size")
+    list_select_related = ("user",)
+    fields = ("created", "user", "seed", "assignments", "is_reproducible")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description=_("inscriptions"))
+    def size(self, obj):
+        return len(obj.assignments)
+
+    @admin.display(description=_("reproducible"), boolean=True)
+    def is_reproducible(self, obj):
+        return replay(obj) == obj.assignments
 
 
-def read_repertoire_df(queryset: QuerySet[Selection]):
-    results = []
+@admin.register(AdminJob)
+class AdminJobAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "status", "created", "finished", "size")
+    list_filter = ("status",)
+    list_select_related = ("user",)
+    fields = ("name", "user", "status", "created", "finished", "size", "message")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.user.is_superuser:
+            return queryset
+        return queryset.filter(user=request.user)
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/progress/",
+                self.admin_site.admin_view(self.progress_view),
+                name="tmc_adminjob_progress",
+            ),
+            path(
+                "<int:pk>/status/",
+                self.admin_site.admin_view(self.status_view),
+                name="tmc_adminjob_status",
+            ),
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="tmc_adminjob_download",
+            ),
+        ] + super().get_urls()
+
+    def progress_view(self, request, pk):
+        job = get_object_or_404(self.get_queryset(request), pk=pk)
+
+        return TemplateResponse(
+            request,
+            "admin/tmc/adminjob/progress.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": job.name,
+                "job": job,
+            },
+        )
+
+    def status_view(self, request, pk):
+        job = get_object_or_404(self.get_queryset(request), pk=pk)
 
-    for row in queryset:
-        results.append(
+        return JsonResponse(
             {
-                "id": row.inscription.pk,
-                "secret_id": row.inscription.secret_id,
-                "first name": row.inscription.given_name,
-                "last name": row.inscription.surname,
-                "round": str(row.round()) + " - " + str(row.set_list.name),
-                "pieces": ",".join(
-                    row.pieces.values_list("name", flat=True),
+                "status": job.get_status_display(),
+                "finished": job.is_finished(),
+                "size": job.size,
+                "message": job.message,
+                "download": (
+                    reverse("admin:tmc_adminjob_download", args=(job.pk,))
+                    if job.result
+                    else None
                 ),
             }
         )
 
-    df = pd.DataFrame.from_records(results)
+    def download_view(self, request, pk):
+        job = get_object_or_404(self.get_queryset(request), pk=pk)
 
-    names = df.drop_duplicates("id").set_index("id")[
-        ["first name", "last name", "secret_id"]
-    ]
-    pieces = df.pivot(index="id", columns="round", values=["pieces"])
-    pieces.columns = pieces.columns.droplevel(0)
+        if not job.result:
+            raise Http404()
+        if settings.RECORDING_STORAGE == "local":
+            return FileResponse(job.result.open("rb"), as_attachment=True)
+        # presigned by the S3 storage
+        return redirect(job.result.url)
 
-    output = io.BytesIO()
 
-    names.join(pieces).to_excel(output)
-    output.seek(0)
+@admin.action(description=_("Check for recordings on the bucket"))
+@background_action
+def check_recordings(modeladmin, request, queryset):
+    created, updated = reconcile_recordings(list(queryset.values_list("pk", flat=True)))
+    modeladmin.message_user(
+        request,
+        _("%(created)d recordings were found on the bucket, %(updated)d updated.")
+        % {"created": created, "updated": updated},
+    )
 
-    return output.read()
+
+@admin.action(description="Download recording playlist")
+@background_action
+def download_playlist(modeladmin, request, queryset):
+    rows = recording_manifest(
+        Recording.objects.filter(uploader__in=queryset), playback=True
+    )
+
+    return StreamingHttpResponse(
+        manifest_m3u(rows),
+        content_type="text/m3u",
+        headers={"Content-Disposition": 'attachment; filename="recordings.m3u"'},
+    )
 
 
 @admin.action(description="Download repertoire")
+@background_action
 def download_repertoire(modeladmin, request, queryset):
-    return HttpResponse(
-        read_repertoire_df(queryset),
+    # the xlsx is assembled in a temporary file, openpyxl needs to zip it at the end
+    output = tempfile.TemporaryFile()
+    write_xlsx(repertoire_rows(queryset), output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename="repertoire.xlsx",
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="repertoire.xlsx"'},
     )
 
 
 @admin.action(description="Download recording url list")
+@background_action
 def download_info(modeladmin, request, queryset):
-    recordings = Recording.objects.filter(uploader__in=queryset).order_by(
-        "uploader__secret_id", "requirement__nr"
-    )
+    rows = recording_manifest(Recording.objects.filter(uploader__in=queryset))
 
-    results = []
-    for recording in recordings:
-        id = recording.uploader.secret_id
-        nr = recording.requirement.nr
-        slug = recording.requirement.slug
-        extension = recording.recording.name.split(".")[-1]
-        results.append(
-            {
-                "id": id,
-                "url": recording.recording.url,
-                "name": recording.requirement.name,
-                "slug": slug,
-                "target": f"{id}/{nr:02}_{slug}.{extension}",
-            }
-        )
-
-    response = HttpResponse(
+    return StreamingHttpResponse(
+        manifest_csv(rows),
         content_type="text/csv",
         headers={"Content-Disposition": 'attachment; filename="recordings.csv"'},
     )
 
-    writer = csv.DictWriter(response, ["id", "url", "name", "slug", "target"])
-    writer.writeheader()
-    writer.writerows(results)
-    return response
+
+@admin.action(description="Download recording url list (json)")
+@background_action
+def download_manifest(modeladmin, request, queryset):
+    rows = recording_manifest(Recording.objects.filter(uploader__in=queryset))
+
+    return StreamingHttpResponse(
+        manifest_json(rows),
+        content_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="recordings.json"'},
+    )
+
+
+@admin.action(description="Download recordings as zip")
+def download_archive(modeladmin, request, queryset):
+    return StreamingHttpResponse(
+        recording_archive(Recording.objects.filter(uploader__in=queryset)),
+        content_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="recordings.zip"'},
+    )
+
+
+def stream_table(modeladmin, request, queryset, content, extension, content_type):
+    if not modeladmin.has_export_permission(request):
+        raise PermissionDenied
+
+    resource = modeladmin.get_export_resource_classes()[0](
+        **modeladmin.get_export_resource_kwargs(request)
+    )
+    filename = f"{modeladmin.model._meta.model_name}.{extension}"
+
+    return StreamingHttpResponse(
+        content(resource_rows(resource, queryset)),
+        content_type=content_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@admin.action(description=_("Stream selected %(verbose_name_plural)s as csv"))
+def stream_csv(modeladmin, request, queryset):
+    return stream_table(modeladmin, request, queryset, table_csv, "csv", "text/csv")
+
+
+@admin.action(description=_("Stream selected %(verbose_name_plural)s as json"))
+def stream_json(modeladmin, request, queryset):
+    return stream_table(
+        modeladmin, request, queryset, table_json, "json", "application/json"
+    )
 
 
 @admin.action(description="Enumerate inscriptions (random)")
 def enumerate_inscriptions(modeladmin, request, queryset):
-    with transaction.atomic():
-        queryset = queryset.order_by("?")
+    allocation = allocate_secret_ids(queryset, user=request.user)
+    modeladmin.message_user(
+        request,
+        _("%(count)d inscriptions were enumerated with the seed %(seed)s.")
+        % {"count": len(allocation.assignments), "seed": allocation.seed},
+    )
+
+
+class RecordingsFilter(admin.SimpleListFilter):
+    title = _("uploaded recordings")
+    parameter_name = "recordings"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("none", _("None")),
+            ("incomplete", _("Incomplete")),
+            ("complete", _("Complete")),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "none":
+            return queryset.filter(recording_count=0)
+        if self.value() == "incomplete":
+            return queryset.filter(
+                recording_count__gt=0, recording_count__lt=F("required_count")
+            )
+        if self.value() == "complete":
+            return queryset.filter(recording_count__gte=F("required_count"))
+
 
-        for i, q in enumerate(queryset):
-            q.secret_id = f"{i+1:04}"
-            q.save()
+class SelectionsFilter(admin.SimpleListFilter):
+    title = _("valid selections")
+    parameter_name = "selections"
+
+    def lookups(self, request, model_admin):
+        return (("none", _("None")), ("some", _("Some")))
+
+    def queryset(self, request, queryset):
+        if self.value() == "none":
+            return queryset.filter(selection_count=0)
+        if self.value() == "some":
+            return queryset.filter(selection_count__gt=0)
 
 
 @admin.register(Inscription)
-class InscriptionAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
+class InscriptionAdmin(
+    LargeTableMixin, PersonImportMixin, BackgroundExportActionMixin, admin.ModelAdmin
+):
     resource_class = InscriptionResource
 
     list_filter = (
@@ -218,6 +522,8 @@ class InscriptionAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
         "vegetarian",
         "has_recordings",
         "has_documents",
+        RecordingsFilter,
+        SelectionsFilter,
     )
     list_display = (
         "given_name",
@@ -231,6 +537,8 @@ class InscriptionAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
         "phone",
         "secret_id",
         "uploaded_recordings",
+        "required_recordings",
+        "valid_selections",
     )
     date_hierarchy = "submitted_at"
     search_fields = (
@@ -242,15 +550,95 @@ class InscriptionAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
     list_editable = ["is_qualified"]
 
     readonly_fields = ["submitted_at"]
+    autocomplete_fields = ["user", "host_family"]
 
-    inlines = [RecordingInline]
     actions = [
         check_recordings,
         download_playlist,
         download_info,
+        download_manifest,
+        download_archive,
         enumerate_inscriptions,
+        stream_csv,
+        stream_json,
     ]
 
+    def get_queryset(self, request):
+        # the counts of the inscription are stored, see tmc.progress
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                required_count=count_of(
+                    RequiredRecording.objects.filter(instrument=OuterRef("instrument")),
+                    "instrument",
+                ),
+            )
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/recordings/",
+                self.admin_site.admin_view(self.recordings_view),
+                name="tmc_inscription_recordings",
+            ),
+            path(
+                "<path:object_id>/recordings/<int:pk>/",
+                self.admin_site.admin_view(self.open_recording_view),
+                name="tmc_inscription_open_recording",
+            ),
+        ] + super().get_urls()
+
+    def get_recordings(self, request, object_id):
+        inscription = self.get_object(request, object_id)
+        if inscription is None:
+            raise Http404()
+        if not self.has_view_permission(request, inscription):
+            raise PermissionDenied()
+        return Recording.objects.filter(uploader=inscription)
+
+    def recordings_view(self, request, object_id):
+        """
+        One page of the recordings of an inscription, loaded by the change form.
+
+        The urls of the recordings are only signed when one is opened.
+        """
+        recordings = (
+            self.get_recordings(request, object_id)
+            .select_related("requirement")
+            .order_by("requirement__nr", "pk")
+        )
+        page = Paginator(recordings, RECORDINGS_PER_PAGE).get_page(
+            request.GET.get("page")
+        )
+
+        return TemplateResponse(
+            request,
+            "admin/tmc/inscription/recordings.html",
+            {"page": page, "object_id": object_id},
+        )
+
+    def open_recording_view(self, request, object_id, pk):
+        recording = get_object_or_404(self.get_recordings(request, object_id), pk=pk)
+        if not recording.recording:
+            raise Http404()
+        return redirect(
+            get_backend(recording.backend).presign_get(recording.recording.name)
+        )
+
+    @admin.display(description=_("uploaded"), ordering="recording_count")
+    def uploaded_recordings(self, obj):
+        return obj.recording_count
+
+    @admin.display(description=_("required"), ordering="required_count")
+    def required_recordings(self, obj):
+        return obj.required_count
+
+    @admin.display(description=_("valid selections"), ordering="selection_count")
+    def valid_selections(self, obj):
+        return obj.selection_count
+
 
 class InscriptionInline(admin.TabularInline):
     model = Inscription
@@ -268,11 +656,36 @@ class InscriptionInline(admin.TabularInline):
     readonly_fields = fields
 
 
+@admin.action(description=_("Assign guests automatically"))
+def assign_guests_automatically(modeladmin, request, queryset):
+    result = assign_hosts(queryset)
+    modeladmin.message_user(
+        request,
+        _("%(placed)d contestants were placed, %(unplaced)d are still without host.")
+        % {"placed": result.placed, "unplaced": len(result.unplaced)},
+    )
+
+
+class GuestAutocompleteView(AutocompleteJsonView):
+    """Autocomplete of `GuestSelect`, qualified contestants that still need a host."""
+
+    def get_queryset(self):
+        queryset = Inscription.objects.filter(
+            is_qualified=True, accomodation_needed=True, host_family=None
+        ).order_by("surname", "given_name")
+        queryset, use_distinct = self.model_admin.get_search_results(
+            self.request, queryset, self.term
+        )
+        return queryset.distinct() if use_distinct else queryset
+
+
 @admin.register(HostFamily)
-class HostFamilyAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
+class HostFamilyAdmin(PersonImportMixin, BackgroundExportActionMixin, admin.ModelAdmin):
     form = HostAdminForm
     resource_class = HostFamilyResource
+    actions = [assign_guests_automatically, stream_csv, stream_json]
     list_display = ("given_name", "surname", "email", "single_rooms", "double_rooms")
+    search_fields = ("given_name", "surname", "email")
     list_filter = (
         "provides_breakfast",
         "has_wifi",
@@ -281,10 +694,21 @@ class HostFamilyAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
         "smoking_allowed",
     )
 
-    def save_model(self, request, obj: HostFamily, form, change):
-        super().save_model(request, obj, form, change)
-        print(type(form.cleaned_data["guests"]))
-        obj.inscription_set.set(form.cleaned_data["guests"])
+    def get_urls(self):
+        return [
+            path(
+                "guests/",
+                self.admin_site.admin_view(
+                    GuestAutocompleteView.as_view(admin_site=self.admin_site)
+                ),
+                name="tmc_hostfamily_guests",
+            ),
+        ] + super().get_urls()
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # checked and locked by HostAdminForm.clean
+        assign_guests(form.instance, form.cleaned_data["guests"])
 
 
 class SlotInline(admin.TabularInline):
@@ -293,12 +717,54 @@ class SlotInline(admin.TabularInline):
 
 
 @admin.register(Helper)
-class HelperAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
+class HelperAdmin(PersonImportMixin, BackgroundExportActionMixin, admin.ModelAdmin):
     resource_class = HelperResource
+    actions = [stream_csv, stream_json]
     list_display = ("given_name", "surname", "email")
+    search_fields = ("given_name", "surname", "email")
     inlines = [SlotInline]
 
 
+@admin.action(description=_("Schedule helpers"))
+def schedule_shifts(modeladmin, request, queryset):
+    rota = schedule_helpers(queryset)
+    modeladmin.message_user(
+        request,
+        _("%(filled)d shifts were filled, %(missing)d are still open.")
+        % {"filled": rota.filled, "missing": sum(rota.missing.values())},
+    )
+
+
+@admin.register(StaffingDemand)
+class StaffingDemandAdmin(admin.ModelAdmin):
+    list_display = ("ressort", "date", "slot", "helpers", "staffed")
+    list_editable = ("helpers",)
+    list_filter = ("date", "slot", "ressort")
+    list_select_related = ("ressort", "date")
+    actions = [schedule_shifts]
+
+    def get_queryset(self, request):
+        shifts = Shift.objects.filter(demand=OuterRef("pk"))
+        return (
+            super().get_queryset(request).annotate(staffed=count_of(shifts, "demand"))
+        )
+
+    @admin.display(description=_("staffed"), ordering="staffed")
+    def staffed(self, obj):
+        return obj.staffed
+
+
+@admin.register(Shift)
+class ShiftAdmin(BackgroundExportActionMixin, admin.ModelAdmin):
+    resource_class = ShiftResource
+    actions = [stream_csv, stream_json]
+    list_display = ("helper", "demand")
+    list_filter = ("demand__date", "demand__slot", "demand__ressort")
+    list_select_related = ("helper", "demand__ressort", "demand__date")
+    autocomplete_fields = ("helper",)
+    search_fields = ("helper__given_name", "helper__surname")
+
+
 @admin.register(DateSlot)
 class DateSlotAdmin(admin.ModelAdmin):
     list_display = ("date", "note")
@@ -310,12 +776,51 @@ class RessortAdmin(admin.ModelAdmin):
 
 
 @admin.register(JuryMember)
-class JuryMemberAdmin(ImportExportMixin, ExportActionMixin, admin.ModelAdmin):
+class JuryMemberAdmin(PersonImportMixin, BackgroundExportActionMixin, admin.ModelAdmin):
     resource_class = JuryResource
+    change_list_template = "admin/tmc/jurymember/change_list.html"
+    actions = [stream_csv, stream_json]
     list_display = ("given_name", "surname", "email")
     list_editable = ("email",)
     list_filter = ("transport_arrival", "transport_departure", "means_of_travel")
 
+    def get_urls(self):
+        return [
+            path(
+                "transport/",
+                self.admin_site.admin_view(self.transport_view),
+                name="tmc_jurymember_transport",
+            )
+        ] + super().get_urls()
+
+    def transport_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        # a window beyond a day would pool unrelated arrivals (and overflow timedelta)
+        window = int_param(request, "window", config.TRANSPORT_WINDOW, maximum=24 * 60)
+        capacity = int_param(request, "capacity", config.VEHICLE_CAPACITY, minimum=1)
+        runs = transport_runs(window=window, capacity=capacity)
+
+        if request.GET.get("format") == "csv":
+            return StreamingHttpResponse(
+                table_csv(run_rows(runs)),
+                content_type="text/csv",
+                headers={"Content-Disposition": 'attachment; filename="transport.csv"'},
+            )
+
+        return TemplateResponse(
+            request,
+            "admin/tmc/jurymember/transport.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": _("Transport"),
+                "window": window,
+                "capacity": capacity,
+                "runs": runs,
+            },
+        )
+
 
 class SetListInline(admin.TabularInline):
     model = SetList
@@ -334,8 +839,34 @@ class RoundAdmin(admin.ModelAdmin):
 @admin.register(SetList)
 class SetlistAdmin(admin.ModelAdmin):
     list_display = ["name", "round"]
+    search_fields = ["name", "round__name"]
+    readonly_fields = ["combinations"]
     inlines = [PieceInline]
 
+    @admin.display(description=_("valid combinations"))
+    def combinations(self, obj):
+        if obj.pk is None:
+            return "-"
+        graph = exclusion_graph(obj.pk)
+        names = dict(obj.piece_set.values_list("pk", "name"))
+
+        combinations = graph.combinations(obj.required)
+        shown = list(islice(combinations, COMBINATIONS_SHOWN))
+        rest = islice(combinations, COMBINATIONS_COUNTED + 1 - len(shown))
+        count = len(shown) + sum(1 for _ in rest)
+        return format_html(
+            "{}<ul>{}</ul>",
+            f"{COMBINATIONS_COUNTED}+" if count > COMBINATIONS_COUNTED else count,
+            format_html_join(
+                "",
+                "<li>{}</li>",
+                (
+                    (", ".join(names[pk] for pk in graph.members(mask)),)
+                    for mask in shown
+                ),
+            ),
+        )
+
 
 @admin.register(Piece)
 class PieceAdmin(admin.ModelAdmin):
@@ -343,7 +874,7 @@ class PieceAdmin(admin.ModelAdmin):
 
 
 @admin.register(Selection)
-class SelectionAdmin(admin.ModelAdmin):
+class SelectionAdmin(LargeTableMixin, admin.ModelAdmin):
     list_display = [
         "inscription",
         "round",
@@ -352,7 +883,58 @@ class SelectionAdmin(admin.ModelAdmin):
         "list_pieces",
         "is_valid",
     ]
-    list_filter = ["is_valid", "set_list__round__instrument"]
+    list_filter = [
+        "is_valid",
+        "set_list__round__instrument",
+        ("inscription", AutocompleteFilter),
+    ]
+    list_select_related = ["inscription", "set_list__round__instrument"]
+    autocomplete_fields = ["inscription", "set_list"]
     readonly_fields = ["pieces"]
 
     actions = [download_repertoire]
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .prefetch_related(Prefetch("pieces", Piece.objects.order_by("pk")))
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                "statistics/",
+                self.admin_site.admin_view(self.statistics_view),
+                name="tmc_selection_statistics",
+            )
+        ] + super().get_urls()
+
+    def statistics_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        return TemplateResponse(
+            request,
+            "admin/tmc/selection/statistics.html",
+            {
+                **self.admin_site.each_context(request),
+                "opts": self.model._meta,
+                "title": _("Repertoire statistics"),
+                **repertoire_statistics(),
+            },
+        )
+
+    @admin.display(description=_("round"), ordering="set_list__round__name")
+    def round(self, obj):
+        return obj.set_list.round
+
+    @admin.display(
+        description=_("instrument"), ordering="set_list__round__instrument__name"
+    )
+    def instrument(self, obj):
+        return obj.set_list.round.instrument
+
+    @admin.display(description=_("pieces"))
+    def list_pieces(self, obj):
+        return ",".join(piece.name for piece in obj.pieces.all())
@@ -6,6 +6,9 @@ class TMCConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tmc'
 
+    def ready(self):
+        from tmc import exclusions, progress, repertoire  # noqa: F401
+
 
 class AddressConfig(AddressConfig):
     default_auto_field = 'django.db.models.AutoField'
@@ -0,0 +1,114 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+# Tables estimated to have fewer rows than this are counted exactly
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimated_count(queryset):
+    """
+    The number of rows of the table of `queryset` according to the statistics
+    of Postgres, None if there are none.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    # -1 for tables that were never analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that does not count all rows of a large table.
+
+    Unfiltered lists on Postgres use the estimate of the planner once it is
+    above `ESTIMATE_THRESHOLD`, filtered ones are still counted, they are
+    what the filters and the search are there for.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == "postgresql" and not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter by a foreign key with the select2 autocomplete of the admin.
+
+    Unlike the related field filter it doesn't render every related object.
+    The related model admin needs `search_fields`, the changelist admin needs
+    `LargeTableMixin` for the scripts.
+    """
+
+    template = "admin/tmc/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = getattr(field, "verbose_name", field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            to_field_name=field.target_field.name,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # the template renders the widget for the other choices
+        yield {
+            "selected": self.lookup_val is None,
+            "query_string": changelist.get_query_string(remove=[self.lookup_kwarg]),
+            "display": _("All"),
+        }
+
+    def widget(self):
+        return self.form_field.widget.render(
+            self.lookup_kwarg,
+            self.lookup_val,
+            attrs={"data-autocomplete-filter": self.lookup_kwarg},
+        )
+
+
+class LargeTableMixin:
+    """
+    Changelist options for tables with tens of thousands of rows.
+
+    Counts with `EstimatedCountPaginator`, skips the count of all rows next
+    to the filtered ones and loads the scripts of `AutocompleteFilter`.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for spec in self.list_filter:
+            if isinstance(spec, tuple) and issubclass(spec[1], AutocompleteFilter):
+                field = self.model._meta.get_field(spec[0])
+                media += AutocompleteSelect(field, self.admin_site).media
+        return media
@@ -0,0 +1,132 @@
+import math
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from tmc.models import Piece
+
+# Seconds a graph stays cached, the signals below drop it on changes before
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass(frozen=True)
+class ExclusionGraph:
+    """
+    The pieces of a set list and the ones each of them excludes, as bitsets.
+
+    Bit i stands for `pieces[i]`, `masks[i]` has the bits of the pieces that
+    can't be selected together with it. Exclusions with pieces of other set
+    lists don't matter for a selection and are left out.
+    """
+
+    pieces: tuple
+    values: tuple
+    masks: tuple
+
+    @classmethod
+    def build(cls, set_list_id):
+        """Build the graph of a set list with one query."""
+        bits = {}
+        values = []
+        excludes = {}
+        rows = (
+            Piece.objects.filter(set_list=set_list_id)
+            .order_by("pk")
+            .values_list("pk", "value", "excludes", "excludes__set_list")
+        )
+        for pk, value, other, other_set_list in rows:
+            if pk not in bits:
+                bits[pk] = len(values)
+                values.append(value)
+                excludes[pk] = []
+            if other is not None and other_set_list == set_list_id:
+                excludes[pk].append(other)
+
+        masks = tuple(
+            sum(1 << bits[other] for other in set(excludes[pk])) for pk in bits
+        )
+        return cls(tuple(bits), tuple(values), masks)
+
+    def mask(self, pks):
+        """The bitset of the pieces `pks`, pieces of other set lists have no bit."""
+        bits = {pk: i for i, pk in enumerate(self.pieces)}
+        return sum(1 << bits[pk] for pk in set(pks) if pk in bits)
+
+    def conflicts(self, mask):
+        """The pieces of `mask` that exclude some other piece of it, with those."""
+        for i, excluded in enumerate(self.masks):
+            if mask >> i & 1 and excluded & mask:
+                yield self.pieces[i], self.members(excluded & mask)
+
+    def members(self, mask):
+        return [pk for i, pk in enumerate(self.pieces) if mask >> i & 1]
+
+    def combinations(self, required):
+        """
+        Every selection worth `required` without exclusions, as bitsets.
+
+        A depth-first search over the pieces in order that skips the pieces
+        excluded by the ones taken so far and, with no negative values, stops
+        once a selection is worth more than `required`.
+        """
+        size = len(self.pieces)
+        prune = all(value >= 0 for value in self.values)
+
+        def search(i, mask, blocked, total):
+            if math.isclose(total, required):
+                yield mask
+            if i == size or prune and total > required:
+                return
+            for j in range(i, size):
+                if not blocked >> j & 1:
+                    yield from search(
+                        j + 1,
+                        mask | 1 << j,
+                        blocked | self.masks[j],
+                        total + self.values[j],
+                    )
+
+        return search(0, 0, 0, 0)
+
+
+def cache_key(set_list_id):
+    return f"tmc:exclusions:{set_list_id}"
+
+
+def exclusion_graph(set_list_id):
+    """The `ExclusionGraph` of a set list from the cache, built on a miss."""
+    key = cache_key(set_list_id)
+    graph = cache.get(key)
+    if graph is None:
+        graph = ExclusionGraph.build(set_list_id)
+        cache.set(key, graph, CACHE_TIMEOUT)
+    return graph
+
+
+def invalidate(*set_list_ids):
+    cache.delete_many([cache_key(pk) for pk in set_list_ids if pk is not None])
+
+
+@receiver(pre_save, sender=Piece)
+def piece_moving(sender, instance: Piece, **kwargs):
+    # a piece moved to another set list leaves the graph of the old one
+    if instance.pk is not None:
+        invalidate(
+            *Piece.objects.filter(pk=instance.pk).values_list("set_list", flat=True)
+        )
+
+
+@receiver(post_save, sender=Piece)
+@receiver(post_delete, sender=Piece)
+def piece_changed(sender, instance: Piece, **kwargs):
+    invalidate(instance.set_list_id)
+
+
+@receiver(m2m_changed, sender=Piece.excludes.through)
+def excludes_changed(sender, instance: Piece, action, **kwargs):
+    # exclusions with other set lists are not part of the graph, the one of
+    # the set list of the piece is all that can change
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate(instance.set_list_id)
@@ -0,0 +1,293 @@
+import csv
+import json
+import zipfile
+from itertools import groupby
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from openpyxl import Workbook
+
+from tmc.models import Piece, Recording, Selection
+from tmc.storage import get_backend
+
+CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_FIELDS = ["id", "url", "name", "slug", "target"]
+
+# Rows fetched per round trip of the server-side cursor
+CHUNK_ROWS = 2000
+
+REPERTOIRE_FIELDS = ["id", "first name", "last name", "secret_id"]
+
+
+def recording_target(recording: Recording):
+    """Name of a recording in the exports, `<secret_id>/<nr>_<slug>.<extension>`."""
+    id = recording.uploader.secret_id
+    nr = recording.requirement.nr
+    slug = recording.requirement.slug
+    extension = recording.recording.name.split(".")[-1]
+
+    return f"{id}/{nr:02}_{slug}.{extension}"
+
+
+class _Pipe:
+    """
+    Write-only file that collects what zipfile writes until it is handed on.
+
+    It can't seek, so zipfile writes sizes and checksums after the data of each
+    member instead of going back to the local header.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """
+    Generate a zip archive of `entries` piece by piece.
+
+    `entries` are `(name, chunks)` pairs where `chunks` is an iterable of bytes.
+    Members are stored without compression (videos don't compress), so memory
+    stays bounded by the size of the largest chunk.
+    """
+    pipe = _Pipe()
+
+    with zipfile.ZipFile(pipe, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    yield pipe.pop()
+            yield pipe.pop()
+
+    yield pipe.pop()
+
+
+def manifest_recordings(recordings: QuerySet[Recording]):
+    """All data needed for the manifests in one joined query, streamed from the cursor."""
+    return (
+        recordings.exclude(recording="")
+        .select_related("uploader", "requirement")
+        .only(
+            "recording",
+            "preview",
+            "backend",
+            "uploader__secret_id",
+            "requirement__name",
+            "requirement__nr",
+            "requirement__slug",
+        )
+        .order_by("uploader__secret_id", "requirement__nr")
+        .iterator(chunk_size=2000)
+    )
+
+
+def recording_manifest(recordings: QuerySet[Recording], playback=False):
+    """
+    Yield one row per recording with a presigned url.
+
+    With `playback` the url points to the light rendition when there is one.
+    """
+    for recording in manifest_recordings(recordings):
+        file = recording.playback_file() if playback else recording.recording
+        yield {
+            "id": recording.uploader.secret_id,
+            "url": get_backend(recording.backend).presign_get(file.name),
+            "name": recording.requirement.name,
+            "slug": recording.requirement.slug,
+            "target": recording_target(recording),
+        }
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer, returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def manifest_m3u(rows):
+    yield "#EXTM3U\n\n"
+    for i, row in enumerate(rows):
+        yield f'#EXTINF:{i:03}, {row["id"]} - {row["name"]}\n{row["url"]}\n'
+
+
+def manifest_csv(rows):
+    writer = csv.DictWriter(_Echo(), MANIFEST_FIELDS)
+
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def manifest_json(rows):
+    yield "["
+    for i, row in enumerate(rows):
+        yield ("," if i else "") + "\n" + json.dumps(row)
+    yield "\n]\n"
+
+
+def table_csv(rows):
+    writer = csv.writer(_Echo())
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def table_json(rows):
+    """A list of objects keyed by the first row, like tablib exports json."""
+    rows = iter(rows)
+    headers = next(rows)
+
+    yield "["
+    for i, row in enumerate(rows):
+        yield ("," if i else "") + "\n" + json.dumps(
+            dict(zip(headers, row)), default=str
+        )
+    yield "\n]\n"
+
+
+def resource_queryset(resource, queryset: QuerySet):
+    """
+    Join the foreign keys and prefetch the many-to-many fields a resource exports.
+
+    Attributes like `demand__date__date` are followed through every foreign
+    key, so the whole path is joined and not only its first step.
+    """
+    related = []
+    prefetch = []
+
+    for field in resource.get_export_fields():
+        model = queryset.model
+        path = []
+        for name in (field.attribute or "").split("__"):
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if model_field.many_to_many:
+                prefetch.append("__".join(path + [name]))
+                break
+            if not (model_field.is_relation and model_field.concrete):
+                break
+            path.append(name)
+            model = model_field.related_model
+        if path:
+            related.append("__".join(path))
+
+    return queryset.select_related(*related).prefetch_related(*prefetch)
+
+
+def resource_rows(resource, queryset: QuerySet):
+    """
+    Yield the headers and rows an import_export resource exports for `queryset`.
+
+    The values are the same as the ones of `resource.export()`, but the rows
+    come from a server-side cursor one chunk at a time instead of being
+    collected in a tablib Dataset first.
+    """
+    yield resource.get_export_headers()
+
+    queryset = resource_queryset(resource, queryset)
+    for obj in queryset.iterator(chunk_size=CHUNK_ROWS):
+        yield resource.export_resource(obj)
+
+
+def recording_archive(recordings: QuerySet[Recording]):
+    entries = (
+        (
+            recording_target(recording),
+            get_backend(recording.backend).iter_object(
+                recording.recording.name, CHUNK_SIZE
+            ),
+        )
+        for recording in manifest_recordings(recordings)
+    )
+
+    return stream_zip(entries)
+
+
+def repertoire_column(round_name, set_list_name):
+    return f"{round_name} - {set_list_name}"
+
+
+def repertoire_rows(selections: QuerySet[Selection]):
+    """
+    Yield the header and one row per inscription with its pieces per round.
+
+    The columns are read with one query up front, the selections are then
+    streamed ordered by inscription and folded into a row as soon as the next
+    inscription starts. Inscription, set list and round come with a join and
+    the pieces with one query per chunk.
+    """
+    columns = sorted(
+        {
+            repertoire_column(round_name, set_list_name)
+            for round_name, set_list_name in selections.order_by()
+            .values_list("set_list__round__name", "set_list__name")
+            .distinct()
+        }
+    )
+    positions = {column: i for i, column in enumerate(columns, len(REPERTOIRE_FIELDS))}
+
+    yield REPERTOIRE_FIELDS + columns
+
+    selections = (
+        selections.select_related("inscription", "set_list__round")
+        .only(
+            "inscription__given_name",
+            "inscription__surname",
+            "inscription__secret_id",
+            "set_list__name",
+            "set_list__round__name",
+        )
+        .prefetch_related(
+            Prefetch("pieces", queryset=Piece.objects.only("name").order_by("pk"))
+        )
+        .order_by("inscription__secret_id", "inscription_id")
+        .iterator(chunk_size=2000)
+    )
+
+    for _, group in groupby(selections, key=attrgetter("inscription_id")):
+        row = None
+        for selection in group:
+            if row is None:
+                inscription = selection.inscription
+                row = [
+                    str(inscription.pk),
+                    inscription.given_name,
+                    inscription.surname,
+                    inscription.secret_id,
+                ] + [None] * len(columns)
+
+            column = repertoire_column(
+                selection.set_list.round.name, selection.set_list.name
+            )
+            row[positions[column]] = ",".join(
+                piece.name for piece in selection.pieces.all()
+            )
+        yield row
+
+
+def write_xlsx(rows, file):
+    """Write `rows` to `file` with openpyxl's write-only mode, row by row."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+
+    for row in rows:
+        sheet.append(row)
+
+    workbook.save(file)
@@ -1,10 +1,13 @@
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import HTML, Fieldset, Layout, Submit
 from django import forms
-from django.contrib.admin.widgets import FilteredSelectMultiple
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelectMultiple
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.forms.widgets import DateInput
+from django.urls import reverse
 from django.utils.translation import gettext as _
 
 from tmc.models import (
@@ -15,6 +18,7 @@ from tmc.models import (
     Selection,
     SetList,
 )
+from tmc.services import lock_guests
 
 
 class UserSignupMixin:
@@ -273,25 +277,42 @@ class JuryForm(forms.ModelForm, UserSignupMixin):
         )
 
 
+class GuestSelect(AutocompleteSelectMultiple):
+    """Searches the contestants that still need a host, see `GuestAutocompleteView`."""
+
+    def get_url(self):
+        return reverse("admin:tmc_hostfamily_guests")
+
+
 class HostAdminForm(forms.ModelForm):
     guests = forms.ModelMultipleChoiceField(
-        queryset=Inscription.objects.filter(is_qualified=True),
-        widget=FilteredSelectMultiple(verbose_name="guests", is_stacked=False),
+        queryset=Inscription.objects.none(),
+        widget=GuestSelect(HostFamily._meta.get_field("inscription"), admin.site),
         required=False,
     )
 
     def __init__(self, *args, **kwargs):
         super(HostAdminForm, self).__init__(*args, **kwargs)
+        needs_host = Q(is_qualified=True, accomodation_needed=True, host_family=None)
         if self.instance.pk:
             self.fields["guests"].initial = self.instance.inscription_set.all()
-
-    def clean_guests(self):
-        data = self.cleaned_data["guests"]
-        if len(data) > self.instance.number_of_rooms():
-            raise ValidationError(
-                f"Too many people asigned to this host (max: {self.instance.number_of_rooms()})"
-            )
-        return data
+            needs_host |= Q(host_family=self.instance)
+        self.fields["guests"].queryset = Inscription.objects.filter(needs_host)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if "guests" in cleaned_data:
+            rooms = HostFamily(
+                single_rooms=cleaned_data.get("single_rooms") or 0,
+                double_rooms=cleaned_data.get("double_rooms") or 0,
+            ).number_of_rooms()
+            # the admin saves in the same transaction, the locks are held until
+            # the guests are assigned
+            try:
+                lock_guests(self.instance, cleaned_data["guests"], rooms)
+            except ValidationError as e:
+                self.add_error("guests", e)
+        return cleaned_data
 
     class Meta:
         model = HostFamily
@@ -0,0 +1,214 @@
+import functools
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.db import transaction
+from django.urls import reverse
+from django_q.tasks import async_task
+from django_q_email import backends as queued_email
+from django_countries import countries
+from django_countries.fields import CountryField
+from import_export import resources, widgets
+from import_export.instance_loaders import CachedInstanceLoader
+
+from tmc import services
+from tmc.models import Helper, HostFamily, Inscription, JuryMember
+
+# Welcome mails sent by one task over one connection
+MAIL_BATCH = 50
+
+QUEUED_EMAIL_BACKEND = "django_q_email.backends.DjangoQBackend"
+
+
+class CachedForeignKeyWidget(widgets.ForeignKeyWidget):
+    """Looks every value up once per import instead of once per row."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = {}
+
+    def clean(self, value, row=None, **kwargs):
+        if value not in self.cache:
+            self.cache[value] = super().clean(value, row, **kwargs)
+        return self.cache[value]
+
+
+def clean_related(instance, fields):
+    """
+    Validate foreign keys and countries without the costs of model validation.
+
+    Model validation queries every foreign key again, although the widget
+    just loaded it, and checks countries against the translated list of all
+    of them, which costs more than everything else of a row together.
+    """
+    errors = {}
+    for field in fields:
+        if isinstance(field, CountryField):
+            value = getattr(instance, field.name).code
+        else:
+            value = getattr(instance, field.attname)
+
+        if value in field.empty_values:
+            if not field.blank:
+                errors[field.name] = [field.error_messages["blank"]]
+        elif isinstance(field, CountryField) and value not in countries:
+            errors[field.name] = [
+                field.error_messages["invalid_choice"] % {"value": value}
+            ]
+    return errors
+
+
+class PersonResource(resources.ModelResource):
+    """
+    Imports people that sign in to the portal, in batches.
+
+    Rows are validated in memory and saved with one bulk_create/bulk_update
+    per batch. People without a user get one, the users of a batch are
+    created with a single bulk_create as well (or an existing user with the
+    same email is reused). Welcome mails for the new people are queued once
+    the import is committed, if `base_url` is given.
+    """
+
+    class Meta:
+        use_bulk = True
+        batch_size = 500
+        instance_loader_class = CachedInstanceLoader
+
+    def __init__(self, base_url="", **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.emails = {}
+        self.created = []
+        # the user is only created with the batch
+        self.related_fields = [
+            field
+            for field in self._meta.model._meta.fields
+            if (field.many_to_one or isinstance(field, CountryField))
+            and field.name != "user"
+        ]
+
+    @classmethod
+    def get_fk_widget(cls, field):
+        widget = super().get_fk_widget(field)
+        return functools.partial(CachedForeignKeyWidget, **widget.keywords)
+
+    def before_import(self, dataset, using_transactions, dry_run, **kwargs):
+        """Load who already uses the emails of the file, with one query."""
+        emails = set()
+        if "email" in (dataset.headers or []):
+            emails = {email for email in dataset["email"] if email}
+
+        self.emails = dict(
+            self._meta.model.objects.filter(email__in=emails).values_list("email", "pk")
+        )
+        self.created = []
+
+    def validate_instance(
+        self, instance, import_validation_errors=None, validate_unique=True
+    ):
+        """
+        Run the field validation of the model without touching the database.
+
+        Uniqueness of the email is checked against what `before_import`
+        loaded and the rows before.
+        """
+        errors = dict(import_validation_errors or {})
+        errors.update(clean_related(instance, self.related_fields))
+
+        exclude = [*errors, "user", *(field.name for field in self.related_fields)]
+        try:
+            instance.full_clean(exclude=exclude, validate_unique=False)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        owner = id(instance) if instance._state.adding else instance.pk
+        if self.emails.setdefault(instance.email, owner) != owner:
+            message = instance._meta.get_field("email").error_messages["unique"]
+            errors.setdefault("email", []).append(message)
+
+        if errors:
+            raise ValidationError(errors)
+
+    def create_users(self, instances):
+        """Give every instance a user, creating the missing ones in one query."""
+        User = get_user_model()
+        missing = [instance for instance in instances if instance.user_id is None]
+        existing = User.objects.in_bulk(
+            [instance.email for instance in missing], field_name="username"
+        )
+
+        users = User.objects.bulk_create(
+            services.new_user(instance)
+            for instance in missing
+            if instance.email not in existing
+        )
+        existing.update((user.username, user) for user in users)
+
+        for instance in missing:
+            instance.user = existing[instance.email]
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None):
+        instances = list(self.create_instances)
+
+        # same condition under which import_export writes at all
+        if instances and (using_transactions or not dry_run):
+            self.create_users(instances)
+
+        super().bulk_create(using_transactions, dry_run, raise_errors, batch_size)
+        self.created.extend(instance.pk for instance in instances)
+
+    def after_import(self, dataset, result, using_transactions, dry_run, **kwargs):
+        super().after_import(dataset, result, using_transactions, dry_run, **kwargs)
+
+        if dry_run or not self.base_url or not self.created:
+            return
+
+        label = self._meta.model._meta.label
+        for start in range(0, len(self.created), MAIL_BATCH):
+            end = start + MAIL_BATCH
+            batch = [str(pk) for pk in self.created[start:end]]
+            transaction.on_commit(
+                lambda batch=batch: async_task(
+                    "tmc.imports.send_welcome_mails", label, batch, self.base_url
+                )
+            )
+        self.created = []
+
+
+def mail_connection():
+    """
+    Connection to the backend that delivers the mails.
+
+    The batch already runs on the cluster, queueing every mail as its own task
+    again (what the django_q_email backend does) only adds overhead.
+    """
+    if settings.EMAIL_BACKEND == QUEUED_EMAIL_BACKEND:
+        return get_connection(backend=queued_email.EMAIL_BACKEND)
+    return get_connection()
+
+
+def send_welcome(person, base_url, connection):
+    if isinstance(person, Inscription):
+        url = base_url + reverse("tmc:landing")
+        services.send_signup_message(person, url, connection=connection)
+    elif isinstance(person, HostFamily):
+        url = base_url + reverse("tmc:host_detail", args=(person.pk,))
+        services.send_host_signup(person, url, connection=connection)
+    elif isinstance(person, Helper):
+        url = base_url + reverse("tmc:helper_detail", args=(person.pk,))
+        services.send_helper_signup(person, url, connection=connection)
+    elif isinstance(person, JuryMember):
+        url = base_url + reverse("tmc:jury_detail", args=(person.pk,))
+        services.send_jury_signup(person, url, connection=connection)
+
+
+def send_welcome_mails(label, pks, base_url):
+    """Send the welcome mails of a batch of imported people over one connection."""
+    people = apps.get_model(label).objects.filter(pk__in=pks).select_related("user")
+
+    with mail_connection() as connection:
+        for person in people:
+            send_welcome(person, base_url, connection)
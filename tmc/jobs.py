@@ -0,0 +1,169 @@
+import functools
+import importlib
+import inspect
+import re
+import tempfile
+import time
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.http import HttpResponseRedirect, QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
+from django_q.tasks import async_task
+from import_export.admin import ExportActionMixin
+
+from tmc.models import AdminJob
+
+# Seconds between two updates of the bytes written while a result is stored
+PROGRESS_INTERVAL = 2
+
+# Form fields of the changelist that are not part of the action
+ACTION_FIELDS = ("csrfmiddlewaretoken", "_selected_action", "index", "select_across")
+
+FILENAME = re.compile(r'filename="?([^";]+)"?')
+
+
+def background_action(action):
+    """
+    Turn an admin action into an `AdminJob` that runs on the django_q cluster.
+
+    The action is called in the worker with the selected objects and a
+    `JobRequest`, the file it responds with is kept in the media storage and
+    its messages are stored on the job. The admin is sent to the progress
+    page of the job right away.
+    """
+
+    @functools.wraps(action)
+    def queue_action(modeladmin, request, queryset):
+        opts = modeladmin.model._meta
+        description = getattr(queue_action, "short_description", None) or capfirst(
+            action.__name__.replace("_", " ")
+        )
+        data = request.POST.copy()
+        for key in ACTION_FIELDS:
+            data.pop(key, None)
+
+        job = AdminJob.objects.create(
+            user=request.user,
+            name=description % {"verbose_name_plural": opts.verbose_name_plural},
+            action=f"{action.__module__}:{action.__qualname__}",
+            model=opts.label,
+            pks=[str(pk) for pk in queryset.values_list("pk", flat=True)],
+            data={key: data.getlist(key) for key in data},
+        )
+        async_task("tmc.jobs.run_job", job.pk)
+
+        url = reverse("admin:tmc_adminjob_progress", args=(job.pk,))
+        modeladmin.message_user(
+            request,
+            format_html(
+                _('"{}" runs in the background, <a href="{}">follow its progress</a>.'),
+                job.name,
+                url,
+            ),
+        )
+        return HttpResponseRedirect(url)
+
+    return queue_action
+
+
+class JobRequest:
+    """
+    Stands in for the request of an action that runs in a job.
+
+    It has the user and the posted form of the original request and collects
+    the messages of the action (it is its own message storage).
+    """
+
+    method = "POST"
+
+    def __init__(self, job: AdminJob):
+        self.job = job
+        self.user = job.user or AnonymousUser()
+        self.GET = QueryDict()
+        self.POST = QueryDict(mutable=True)
+        for key, values in job.data.items():
+            self.POST.setlist(key, values)
+        self.META = {}
+        self._messages = self
+
+    def add(self, level, message, extra_tags=""):
+        self.job.message += f"{message}\n"
+
+
+def resolve_action(path):
+    module, qualname = path.split(":")
+
+    target = importlib.import_module(module)
+    for name in qualname.split("."):
+        target = getattr(target, name)
+
+    # the module attribute is the queueing wrapper of `background_action`
+    return inspect.unwrap(target)
+
+
+def store_result(job: AdminJob, response):
+    """Write the content of `response` to the result of the job, chunk by chunk."""
+    match = FILENAME.search(response.get("Content-Disposition", ""))
+    filename = match[1] if match else "result"
+    content = response.streaming_content if response.streaming else [response.content]
+
+    with tempfile.TemporaryFile() as output:
+        reported = time.monotonic()
+        for chunk in content:
+            output.write(chunk)
+            job.size += len(chunk)
+            if time.monotonic() - reported > PROGRESS_INTERVAL:
+                AdminJob.objects.filter(pk=job.pk).update(size=job.size)
+                reported = time.monotonic()
+
+        output.seek(0)
+        job.result.save(filename, File(output), save=False)
+
+    response.close()
+
+
+def run_job(pk):
+    job = AdminJob.objects.select_related("user").get(pk=pk)
+    job.status = AdminJob.RUNNING
+    job.size = 0
+    job.save(update_fields=["status", "size"])
+
+    model = apps.get_model(job.model)
+    modeladmin = admin.site._registry[model]
+    action = resolve_action(job.action)
+
+    try:
+        queryset = model._default_manager.filter(pk__in=job.pks)
+        response = action(modeladmin, JobRequest(job), queryset)
+        if response is not None:
+            store_result(job, response)
+        job.status = AdminJob.DONE
+    except Exception as e:
+        job.status = AdminJob.FAILED
+        job.message += f"{e}\n"
+        raise
+    finally:
+        job.finished = timezone.now()
+        job.save()
+
+
+class BackgroundExportActionMixin(ExportActionMixin):
+    """`ExportActionMixin` whose export action runs as a job."""
+
+    @admin.action(description=gettext_lazy("Export selected %(verbose_name_plural)s"))
+    @background_action
+    def export_admin_action(self, request, queryset):
+        return super().export_admin_action(request, queryset)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions["export_admin_action"] = self.get_action(type(self).export_admin_action)
+        return actions
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tmc.matching import assign_hosts
+
+
+class Command(BaseCommand):
+    help = "Place the qualified contestants that need accommodation with host families"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="compute the placement only"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = assign_hosts(dry_run=options["dry_run"])
+        elapsed = time.perf_counter() - start
+
+        for guest in result.unplaced:
+            self.stderr.write(f"no host for {guest['given_name']} {guest['surname']}")
+        self.stdout.write(
+            f"{result.placed} placed with {len(result.guests)} hosts, "
+            f"{len(result.unplaced)} without host, cost {result.cost} "
+            f"({elapsed:.2f}s)"
+        )
@@ -0,0 +1,59 @@
+import time
+
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tmc.storage import get_backend
+
+KEY = "00000000-0000-0000-0000-000000000000/recordings/01_benchmark.mp4"
+
+
+def presign_with_new_session():
+    """The path signed_upload_url took before the shared backend: a session per call."""
+    session = boto3.Session()
+
+    client = session.client(
+        "s3",
+        region_name=settings.AWS_S3_REGION_NAME,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+    )
+
+    return client.generate_presigned_url(
+        ClientMethod="put_object",
+        Params={"Bucket": settings.AWS_STORAGE_BUCKET_NAME, "Key": KEY},
+        ExpiresIn=60 * 30,
+    )
+
+
+def presign_with_shared_backend():
+    return get_backend().presign_put(KEY)
+
+
+class Command(BaseCommand):
+    help = "Compare presigned urls per second of a session per request and the shared backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=3.0)
+
+    def measure(self, function, seconds):
+        function()  # warm up, builds the shared client once
+
+        count = 0
+        start = time.perf_counter()
+        while (elapsed := time.perf_counter() - start) < seconds:
+            function()
+            count += 1
+        return count / elapsed
+
+    def handle(self, *args, **options):
+        seconds = options["seconds"]
+
+        baseline = self.measure(presign_with_new_session, seconds)
+        shared = self.measure(presign_with_shared_backend, seconds)
+
+        self.stdout.write(f"session per request: {baseline:10.1f} presigns/s")
+        self.stdout.write(f"shared backend:      {shared:10.1f} presigns/s")
+        self.stdout.write(f"speedup:             {shared / baseline:10.1f}x")
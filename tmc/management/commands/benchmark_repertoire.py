@@ -0,0 +1,141 @@
+import datetime
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tmc.exports import repertoire_rows, write_xlsx
+from tmc.models import Inscription, Instrument, Piece, Round, Selection, SetList
+
+ROUNDS = 4
+PIECES = 6
+
+
+def create_selections(count):
+    """Fake contestants with one selection per round, `count` selections in total."""
+    instrument = Instrument.objects.create(name="Benchmark")
+    set_lists = []
+    for i in range(ROUNDS):
+        round = Round.objects.create(name=f"Round {i + 1}", instrument=instrument)
+        set_lists.append(SetList.objects.create(name="Set list", round=round))
+
+    pieces = {
+        set_list.pk: Piece.objects.bulk_create(
+            Piece(name=f"Piece {i + 1}", set_list=set_list) for i in range(PIECES)
+        )
+        for set_list in set_lists
+    }
+
+    users = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"benchmark-{i}@example.com")
+        for i in range(count // ROUNDS)
+    )
+    inscriptions = Inscription.objects.bulk_create(
+        Inscription(
+            user=user,
+            given_name="Clara",
+            surname=f"Schumann {i}",
+            email=user.username,
+            phone="+41791234567",
+            instrument=instrument,
+            gender="f",
+            date_of_birth=datetime.date(2000, 9, 13),
+            nationality="CH",
+            mother_tongue="German",
+            language_of_correspondence="en",
+            education="-",
+            occupation="-",
+            emergency_contact="-",
+            emergency_phone="+41791234567",
+            accomodation_needed=False,
+            is_smoker=False,
+            vegetarian=False,
+            secret_id=f"{i + 1:05}",
+        )
+        for i, user in enumerate(users)
+    )
+
+    selections = Selection.objects.bulk_create(
+        Selection(inscription=inscription, set_list=set_list, is_valid=True)
+        for inscription in inscriptions
+        for set_list in set_lists
+    )
+    Selection.pieces.through.objects.bulk_create(
+        Selection.pieces.through(selection_id=selection.pk, piece_id=piece.pk)
+        for selection in selections
+        for piece in pieces[selection.set_list_id][:3]
+    )
+
+    return Selection.objects.filter(set_list__round__instrument=instrument)
+
+
+def lazy_rows(queryset):
+    """The attribute accesses of the former export, each one a query per selection."""
+    for row in queryset:
+        yield [
+            row.inscription.pk,
+            row.inscription.secret_id,
+            row.inscription.given_name,
+            row.inscription.surname,
+            str(row.round()) + " - " + str(row.set_list.name),
+            ",".join(row.pieces.values_list("name", flat=True)),
+        ]
+
+
+class Command(BaseCommand):
+    help = "Measure the repertoire export on generated selections, nothing is kept"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--selections", type=int, default=10000)
+        parser.add_argument(
+            "--skip-lazy", action="store_true", help="Don't run the former export"
+        )
+        parser.add_argument(
+            "--memory", action="store_true", help="Also trace the peak memory"
+        )
+
+    def measure(self, label, function, memory):
+        queries = 0
+
+        def count(execute, *args):
+            nonlocal queries
+            queries += 1
+            return execute(*args)
+
+        if memory:
+            # tracemalloc slows everything down, the timings are only comparable
+            # between runs with the same options
+            tracemalloc.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            function()
+        elapsed = time.perf_counter() - start
+
+        line = f"{label:<18} {elapsed:8.2f}s {queries:8} queries"
+        if memory:
+            line += f" {tracemalloc.get_traced_memory()[1] / 1024 / 1024:8.1f} MiB peak"
+            tracemalloc.stop()
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            queryset = create_selections(options["selections"])
+            self.stdout.write(f"{queryset.count()} selections")
+
+            if not options["skip_lazy"]:
+                self.measure(
+                    "query per row:",
+                    lambda: list(lazy_rows(queryset)),
+                    options["memory"],
+                )
+
+            def export():
+                with tempfile.TemporaryFile() as output:
+                    write_xlsx(repertoire_rows(queryset), output)
+
+            self.measure("streaming export:", export, options["memory"])
+
+            transaction.set_rollback(True)
@@ -0,0 +1,92 @@
+import csv
+from collections import Counter
+from itertools import islice
+
+import tablib
+from django.core.management.base import BaseCommand
+from openpyxl import load_workbook
+
+from tmc.admin import HelperResource, HostFamilyResource, InscriptionResource, JuryResource
+
+RESOURCES = {
+    "inscription": InscriptionResource,
+    "jury": JuryResource,
+    "host": HostFamilyResource,
+    "helper": HelperResource,
+}
+
+
+def read_rows(path):
+    """Yield the rows of a csv or xlsx file one by one, the header first."""
+    if path.endswith(".xlsx"):
+        workbook = load_workbook(path, read_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield ["" if value is None else value for value in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.reader(f)
+
+
+def count_rows(path):
+    if path.endswith(".xlsx"):
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        # sheets written without their dimensions report None, those are counted
+        if max_row is not None:
+            return max_row - 1
+
+    return sum(1 for _ in read_rows(path)) - 1
+
+
+class Command(BaseCommand):
+    help = "Import people from a csv or xlsx file in chunks, creating their users in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=RESOURCES)
+        parser.add_argument("file")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument(
+            "--base-url",
+            default="",
+            help="Address of the portal, e.g. https://example.com, "
+            "welcome mails are only sent if it is given",
+        )
+
+    def handle(self, *args, **options):
+        resource = RESOURCES[options["model"]](base_url=options["base_url"])
+        total = count_rows(options["file"])
+        rows = read_rows(options["file"])
+        headers = next(rows)
+
+        done = 0
+        totals = Counter()
+        # every chunk is imported in its own transaction, so only one chunk of rows
+        # and results is held in memory
+        while chunk := list(islice(rows, options["chunk_size"])):
+            result = resource.import_data(
+                tablib.Dataset(*chunk, headers=headers),
+                dry_run=options["dry_run"],
+                use_transactions=True,
+            )
+
+            for error in result.base_errors:
+                self.stderr.write(f"{error.error}")
+            for number, errors in result.row_errors():
+                for error in errors:
+                    self.stderr.write(f"row {done + number}: {error.error}")
+            for row in result.invalid_rows:
+                self.stderr.write(f"row {done + row.number}: {row.error_dict}")
+
+            totals.update(result.totals)
+            done += len(chunk)
+            self.stdout.write(
+                f"{done}/{total} rows: {totals['new']} new, {totals['update']} updated, "
+                f"{totals['invalid']} invalid, {totals['error']} errors"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tmc.models import Inscription
+from tmc.progress import update_documents, update_progress
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the documents and recordings flags and the recording and "
+        "selection counts of all inscriptions"
+    )
+
+    def handle(self, *args, **options):
+        inscriptions = Inscription.objects.all()
+
+        with transaction.atomic():
+            update_documents(inscriptions)
+            count = update_progress(inscriptions)
+
+        self.stdout.write(f"{count} inscriptions updated")
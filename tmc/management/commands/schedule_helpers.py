@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tmc.models import StaffingDemand
+from tmc.scheduling import schedule_helpers
+
+
+class Command(BaseCommand):
+    help = "Fill the open shifts of the staffing demands with helpers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="compute the rota only"
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rota = schedule_helpers(dry_run=options["dry_run"])
+        elapsed = time.perf_counter() - start
+
+        demands = StaffingDemand.objects.in_bulk(rota.missing)
+        for pk, missing in rota.missing.items():
+            self.stderr.write(f"{missing} missing for {demands[pk]}")
+        self.stdout.write(
+            f"{rota.filled} shifts filled, {sum(rota.missing.values())} open, "
+            f"cost {rota.cost} ({elapsed:.2f}s)"
+        )
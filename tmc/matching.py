@@ -0,0 +1,290 @@
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from itertools import chain, islice
+
+from django.db import transaction
+from django.db.models import Case, OuterRef, Value, When
+from django.utils import translation
+
+from tmc.models import LANGUAGE_OF_CORRESPONDENCES, HostFamily, Inscription
+from tmc.progress import count_of
+
+# Costs of a guest staying with a host that doesn't speak any of their
+# languages and with one that doesn't allow practicing, the engine places as
+# many guests as possible and among those placements picks the cheapest
+LANGUAGE_COST = 2
+PRACTICE_COST = 1
+
+INFINITY = float("inf")
+
+
+class FlowNetwork:
+    """Min-cost max-flow by successive shortest paths, for small graphs."""
+
+    def __init__(self, size):
+        self.size = size
+        self.targets = []
+        self.capacities = []
+        self.costs = []
+        self.edges = [[] for _ in range(size)]
+
+    def add_edge(self, source, target, capacity, cost=0):
+        """Add an edge and its residual edge, returns the index to read its flow."""
+        index = len(self.targets)
+        for node, other, edge_capacity, edge_cost in (
+            (source, target, capacity, cost),
+            (target, source, 0, -cost),
+        ):
+            self.edges[node].append(len(self.targets))
+            self.targets.append(other)
+            self.capacities.append(edge_capacity)
+            self.costs.append(edge_cost)
+        return index
+
+    def flow(self, index):
+        return self.capacities[index ^ 1]
+
+    def shortest_path(self, source, sink):
+        """Cheapest path with capacity left, residual edges can cost less than 0."""
+        distance = [INFINITY] * self.size
+        parent = [None] * self.size
+        queued = [False] * self.size
+        distance[source] = 0
+        queue = deque([source])
+
+        while queue:
+            node = queue.popleft()
+            queued[node] = False
+            for index in self.edges[node]:
+                if not self.capacities[index]:
+                    continue
+                target = self.targets[index]
+                if distance[node] + self.costs[index] < distance[target]:
+                    distance[target] = distance[node] + self.costs[index]
+                    parent[target] = index
+                    if not queued[target]:
+                        queued[target] = True
+                        queue.append(target)
+
+        return distance[sink], parent
+
+    def solve(self, source, sink):
+        """Send as much as possible from `source` to `sink` at the lowest cost."""
+        total_flow = total_cost = 0
+
+        while True:
+            cost, parent = self.shortest_path(source, sink)
+            if cost == INFINITY:
+                return total_flow, total_cost
+
+            path = []
+            node = sink
+            while node != source:
+                path.append(parent[node])
+                node = self.targets[parent[node] ^ 1]
+
+            amount = min(self.capacities[index] for index in path)
+            for index in path:
+                self.capacities[index] -= amount
+                self.capacities[index ^ 1] += amount
+
+            total_flow += amount
+            total_cost += amount * cost
+
+
+def correspondence_languages():
+    with translation.override("en"):
+        return {code: str(label).lower() for code, label in LANGUAGE_OF_CORRESPONDENCES}
+
+
+def guest_key(guest, languages):
+    """What decides where a contestant can stay, equal keys are interchangeable."""
+    spoken = {guest["mother_tongue"].strip().lower()}
+    spoken.add(languages.get(guest["language_of_correspondence"], ""))
+    return (guest["is_smoker"], guest["gender"], frozenset(spoken - {""}))
+
+
+def host_key(host):
+    return (
+        host["smoking_allowed"],
+        host["preferred_gender"],
+        host["practice_allowed"],
+        frozenset(host["languages"]),
+    )
+
+
+def placement_cost(guest, host):
+    """Cost of a guest with a host, None if the host can't take the guest."""
+    is_smoker, gender, spoken = guest
+    smoking_allowed, preferred_gender, practice_allowed, languages = host
+
+    if is_smoker and not smoking_allowed:
+        return None
+    if preferred_gender and preferred_gender != gender:
+        return None
+
+    cost = 0
+    if not spoken & languages:
+        cost += LANGUAGE_COST
+    if not practice_allowed:
+        cost += PRACTICE_COST
+    return cost
+
+
+@dataclass
+class Assignment:
+    # guests per host id, the hosts without new guests left out
+    guests: dict = field(default_factory=dict)
+    unplaced: list = field(default_factory=list)
+    cost: int = 0
+
+    @property
+    def placed(self):
+        return sum(len(guests) for guests in self.guests.values())
+
+
+def assign(guests, hosts):
+    """
+    Place `guests` with `hosts`, each host taking up to its free beds.
+
+    Both are rows as `values()` returns them, see `assign_hosts`, model
+    instances would take longer to load than the placement takes.
+
+    Contestants and hosts are grouped by their keys, the flow runs between
+    the groups: source → guest group (its size) → host group (the placement
+    cost) → sink (the free beds of the group). Groups keep the network small
+    however many people there are, and any split of a flow between two
+    groups among their members is equally good.
+    """
+    languages = correspondence_languages()
+
+    guest_groups = defaultdict(list)
+    for guest in guests:
+        guest_groups[guest_key(guest, languages)].append(guest)
+    host_groups = defaultdict(list)
+    for host in hosts:
+        if host["free_beds"] > 0:
+            host_groups[host_key(host)].append(host)
+
+    guest_keys = list(guest_groups)
+    host_keys = list(host_groups)
+    source = 0
+    sink = 1 + len(guest_keys) + len(host_keys)
+    network = FlowNetwork(sink + 1)
+
+    for g, key in enumerate(guest_keys, 1):
+        network.add_edge(source, g, len(guest_groups[key]))
+    for h, key in enumerate(host_keys, 1 + len(guest_keys)):
+        beds = sum(host["free_beds"] for host in host_groups[key])
+        network.add_edge(h, sink, beds)
+
+    edges = {}
+    for g, guest_group in enumerate(guest_keys, 1):
+        for h, host_group in enumerate(host_keys, 1 + len(guest_keys)):
+            cost = placement_cost(guest_group, host_group)
+            if cost is not None:
+                edges[guest_group, host_group] = network.add_edge(
+                    g, h, len(guest_groups[guest_group]), cost
+                )
+
+    result = Assignment()
+    _, result.cost = network.solve(source, sink)
+
+    waiting = {key: iter(members) for key, members in guest_groups.items()}
+    for host_group in host_keys:
+        beds = ((host["id"], host["free_beds"]) for host in host_groups[host_group])
+        host, free = next(beds)
+        for guest_group in guest_keys:
+            index = edges.get((guest_group, host_group))
+            amount = 0 if index is None else network.flow(index)
+            for guest in islice(waiting[guest_group], amount):
+                while not free:
+                    host, free = next(beds)
+                result.guests.setdefault(host, []).append(guest)
+                free -= 1
+
+    for members in waiting.values():
+        result.unplaced.extend(members)
+
+    return result
+
+
+def host_rows(hosts):
+    """The hosts with their free beds and the names of their languages, locked."""
+    # counted in a subquery, Postgres doesn't lock rows of a GROUP BY
+    guests = Inscription.objects.filter(host_family=OuterRef("pk"))
+    rows = list(
+        hosts.select_for_update()
+        .annotate(guest_count=count_of(guests, "host_family"))
+        .values(
+            "id",
+            "single_rooms",
+            "double_rooms",
+            "guest_count",
+            "smoking_allowed",
+            "preferred_gender",
+            "practice_allowed",
+        )
+    )
+
+    languages = defaultdict(set)
+    for host, name in HostFamily.languages.through.objects.filter(
+        hostfamily__in=[row["id"] for row in rows]
+    ).values_list("hostfamily", "language__name"):
+        languages[host].add(name.strip().lower())
+
+    for row in rows:
+        rooms = HostFamily(
+            single_rooms=row["single_rooms"], double_rooms=row["double_rooms"]
+        ).number_of_rooms()
+        row["free_beds"] = rooms - row["guest_count"]
+        row["languages"] = languages[row["id"]]
+    return rows
+
+
+def homeless_guests():
+    """Qualified contestants that need accommodation and have none yet."""
+    return Inscription.objects.filter(
+        is_qualified=True, accomodation_needed=True, host_family=None
+    ).order_by("submitted_at")
+
+
+@transaction.atomic
+def assign_hosts(hosts=None, dry_run=False):
+    """
+    Place all contestants without a host with `hosts` (all hosts by default).
+
+    The rows are locked while the placement is computed, the result is
+    written with one UPDATE. That UPDATE has a WHEN per host and takes longer
+    to compile than the placement takes to compute.
+    """
+    if hosts is None:
+        hosts = HostFamily.objects.all()
+
+    guests = (
+        homeless_guests()
+        .select_for_update()
+        .values(
+            "uid",
+            "given_name",
+            "surname",
+            "is_smoker",
+            "gender",
+            "mother_tongue",
+            "language_of_correspondence",
+        )
+    )
+    result = assign(guests, host_rows(hosts))
+
+    if not dry_run and result.guests:
+        placed = chain.from_iterable(result.guests.values())
+        Inscription.objects.filter(pk__in=[guest["uid"] for guest in placed]).update(
+            host_family=Case(
+                *(
+                    When(pk__in=[guest["uid"] for guest in members], then=Value(host))
+                    for host, members in result.guests.items()
+                )
+            )
+        )
+
+    return result
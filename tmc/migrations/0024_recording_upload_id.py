@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmc', '0023_jurymember_insurance_documents_jurymember_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='upload_id',
+            field=models.CharField(blank=True, editable=False, max_length=1024),
+        ),
+    ]
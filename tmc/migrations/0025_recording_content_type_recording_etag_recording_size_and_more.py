@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tmc', '0024_recording_upload_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='content_type',
+            field=models.CharField(blank=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='etag',
+            field=models.CharField(blank=True, editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='size',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='verified',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+
+    Schedule.objects.get_or_create(
+        func="tmc.tasks.reconcile_recordings",
+        defaults={
+            "name": "Reconcile recordings with the bucket",
+            "schedule_type": "H",
+            "repeats": -1,
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(func="tmc.tasks.reconcile_recordings").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0025_recording_content_type_recording_etag_recording_size_and_more"),
+        ("django_q", "0014_schedule_cluster"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
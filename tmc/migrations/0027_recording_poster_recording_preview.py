@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0026_schedule_reconcile_recordings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recording",
+            name="poster",
+            field=models.FileField(blank=True, editable=False, upload_to=""),
+        ),
+        migrations.AddField(
+            model_name="recording",
+            name="preview",
+            field=models.FileField(blank=True, editable=False, upload_to=""),
+        ),
+    ]
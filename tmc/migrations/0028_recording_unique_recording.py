@@ -0,0 +1,36 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep the most recently updated recording per uploader and requirement."""
+    Recording = apps.get_model("tmc", "Recording")
+
+    seen = set()
+    duplicates = []
+    for pk, uploader, requirement in Recording.objects.order_by("-updated").values_list(
+        "pk", "uploader", "requirement"
+    ):
+        if (uploader, requirement) in seen:
+            duplicates.append(pk)
+        seen.add((uploader, requirement))
+
+    Recording.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0027_recording_poster_recording_preview"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="recording",
+            constraint=models.UniqueConstraint(
+                fields=("uploader", "requirement"), name="unique_recording"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0028_recording_unique_recording"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadAttempt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("finished", models.DateTimeField(blank=True, null=True)),
+                ("size", models.BigIntegerField(default=0)),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        choices=[(0, "started"), (1, "completed"), (2, "failed")],
+                        default=0,
+                    ),
+                ),
+                ("error", models.CharField(blank=True, max_length=120)),
+                (
+                    "inscription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.inscription",
+                    ),
+                ),
+                (
+                    "requirement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.requiredrecording",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0029_uploadattempt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recording",
+            name="backend",
+            field=models.CharField(default="default", editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name="recording",
+            name="upload_backend",
+            field=models.CharField(blank=True, editable=False, max_length=30),
+        ),
+    ]
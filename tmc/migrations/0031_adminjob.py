@@ -0,0 +1,67 @@
+# Generated by Django 4.1.7 on 2026-10-18 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import tmc.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tmc", "0030_recording_backend_recording_upload_backend"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdminJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200)),
+                ("action", models.CharField(max_length=200)),
+                ("model", models.CharField(max_length=100)),
+                ("pks", models.JSONField(default=list)),
+                ("data", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "pending"),
+                            (1, "running"),
+                            (2, "done"),
+                            (3, "failed"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("finished", models.DateTimeField(blank=True, null=True)),
+                ("size", models.BigIntegerField(default=0)),
+                (
+                    "result",
+                    models.FileField(blank=True, upload_to=tmc.models.job_result_path),
+                ),
+                ("message", models.TextField(blank=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.1.7 on 2026-10-18 16:12
+
+from django.db import migrations, models
+from django.db.models import (
+    Count,
+    Exists,
+    ExpressionWrapper,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+
+def count_progress(apps, schema_editor):
+    """Fill the new counts and the flags, as `rebuild_progress` does."""
+    Inscription = apps.get_model("tmc", "Inscription")
+    Recording = apps.get_model("tmc", "Recording")
+    Selection = apps.get_model("tmc", "Selection")
+
+    def count_of(queryset, field):
+        counts = queryset.order_by().values(field).annotate(count=Count("pk"))
+        return Coalesce(Subquery(counts.values("count")), Value(0))
+
+    complete = Recording.objects.filter(uploader=OuterRef("pk"), is_complete=True)
+    selections = Selection.objects.filter(inscription=OuterRef("pk"), is_valid=True)
+    Inscription.objects.update(
+        recording_count=count_of(complete, "uploader"),
+        has_recordings=Exists(complete),
+        selection_count=count_of(selections, "inscription"),
+    )
+    documents = ~Q(photo="") & ~Q(passport="")
+    Inscription.objects.update(
+        has_documents=ExpressionWrapper(documents, output_field=models.BooleanField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0031_adminjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inscription",
+            name="recording_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="inscription",
+            name="selection_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.1.7 on 2026-10-18 16:14
+
+import secrets
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import tmc.models
+
+
+def remove_duplicates(apps, schema_editor):
+    """Give every inscription but the first one of a secret id a new random id."""
+    Inscription = apps.get_model("tmc", "Inscription")
+
+    taken = set()
+    duplicates = []
+    for inscription in Inscription.objects.order_by("submitted_at").only("secret_id"):
+        if inscription.secret_id in taken:
+            duplicates.append(inscription)
+        taken.add(inscription.secret_id)
+
+    for inscription in duplicates:
+        while inscription.secret_id in taken:
+            inscription.secret_id = secrets.token_hex(4)
+        taken.add(inscription.secret_id)
+
+    Inscription.objects.bulk_update(duplicates, ["secret_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tmc", "0032_inscription_progress_counts"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="inscription",
+            name="secret_id",
+            field=models.CharField(
+                default=tmc.models.generate_secret_id, max_length=8, unique=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="SecretIdAllocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("seed", models.CharField(max_length=64)),
+                ("assignments", models.JSONField(default=dict)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created"],
+            },
+        ),
+    ]
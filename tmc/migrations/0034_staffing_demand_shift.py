@@ -0,0 +1,105 @@
+# Generated by Django 4.1.7 on 2026-10-18 16:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0033_secret_id_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaffingDemand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "slot",
+                    models.CharField(
+                        choices=[
+                            ("morning", "Morning"),
+                            ("afternoon", "Afternoon"),
+                            ("evening", "Evening"),
+                        ],
+                        max_length=60,
+                        verbose_name="slot",
+                    ),
+                ),
+                ("helpers", models.PositiveSmallIntegerField(verbose_name="helpers")),
+                (
+                    "date",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.dateslot",
+                        verbose_name="datum",
+                    ),
+                ),
+                (
+                    "ressort",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.ressort",
+                        verbose_name="ressort",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date__date", "slot", "ressort__name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="Shift",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "demand",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.staffingdemand",
+                        verbose_name="demand",
+                    ),
+                ),
+                (
+                    "helper",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tmc.helper",
+                        verbose_name="helper",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["demand"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="staffingdemand",
+            constraint=models.UniqueConstraint(
+                fields=("ressort", "date", "slot"), name="unique_staffing_demand"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="shift",
+            constraint=models.UniqueConstraint(
+                fields=("demand", "helper"), name="unique_shift"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tmc", "0034_staffing_demand_shift"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recording",
+            name="expected_size",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
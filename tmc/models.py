@@ -177,10 +177,66 @@ class Recording(models.Model):
     updated = models.DateTimeField(auto_now=True)
 
     is_complete = models.BooleanField(default=False)
+    upload_id = models.CharField(max_length=1024, blank=True, editable=False)
+
+    # name of the storage backend (tmc.storage.get_backend) that holds the
+    # recording and the one the running upload goes to
+    backend = models.CharField(max_length=30, default="default", editable=False)
+    upload_backend = models.CharField(max_length=30, blank=True, editable=False)
+
+    size = models.BigIntegerField(null=True, blank=True, editable=False)
+    # size the upload script announced for the running multipart upload
+    expected_size = models.BigIntegerField(null=True, blank=True, editable=False)
+    content_type = models.CharField(max_length=120, blank=True, editable=False)
+    etag = models.CharField(max_length=120, blank=True, editable=False)
+    verified = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # light rendition and poster frame, created by tmc.tasks.transcode_recording
+    preview = models.FileField(blank=True, editable=False)
+    poster = models.FileField(blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["uploader", "requirement"], name="unique_recording"
+            )
+        ]
 
     def __str__(self):
         return self.recording.name.rsplit("/")[-1]
 
+    def playback_file(self):
+        return self.preview or self.recording
+
+
+class UploadAttempt(models.Model):
+    """One try to upload a recording, from requesting the urls until done or failed."""
+
+    STARTED = 0
+    COMPLETED = 1
+    FAILED = 2
+    STATUS_CHOICES = (
+        (STARTED, _("started")),
+        (COMPLETED, _("completed")),
+        (FAILED, _("failed")),
+    )
+
+    inscription = models.ForeignKey("Inscription", models.CASCADE)
+    requirement = models.ForeignKey(RequiredRecording, models.CASCADE)
+    started = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    size = models.BigIntegerField(default=0)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=STARTED)
+    error = models.CharField(max_length=120, blank=True)
+
+    def __str__(self):
+        return f"{self.inscription_id} - {self.requirement_id}"
+
+    def duration(self):
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
 
 def generate_secret_id():
     return secrets.token_hex(4)
@@ -189,7 +245,7 @@ def generate_secret_id():
 class Inscription(PersonBase):
     uid = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     is_qualified = models.BooleanField(default=False, verbose_name=_("qualified"))
-    secret_id = models.CharField(max_length=8, default=generate_secret_id)
+    secret_id = models.CharField(max_length=8, default=generate_secret_id, unique=True)
     instrument = models.ForeignKey(
         Instrument, models.CASCADE, verbose_name=_("instrument")
     )
@@ -256,8 +312,11 @@ class Inscription(PersonBase):
         blank=True,
     )
 
+    # kept up to date by save and tmc.progress, rebuilt by rebuild_progress
     has_documents = models.BooleanField(default=False)
     has_recordings = models.BooleanField(default=False)
+    recording_count = models.PositiveIntegerField(default=0, editable=False)
+    selection_count = models.PositiveIntegerField(default=0, editable=False)
 
     passport = models.FileField(blank=True, upload_to="documents/")
     photo = models.ImageField(blank=True, upload_to="photos/")
@@ -268,15 +327,21 @@ class Inscription(PersonBase):
     date_of_arrival = models.DateField(blank=True, null=True)
     time_of_arrival = models.TimeField(blank=True, null=True)
 
+    def save(self, *args, update_fields=None, **kwargs):
+        self.has_documents = bool(self.photo and self.passport)
+        if update_fields is not None and {"photo", "passport"} & set(update_fields):
+            update_fields = {*update_fields, "has_documents"}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
     def uploaded_recordings(self):
-        return Recording.objects.filter(uploader=self).exclude(recording="").count()
+        return self.recording_count
 
     def total_recordings(self):
         return RequiredRecording.objects.filter(instrument=self.instrument).count()
 
     def setlists_complete(self):
         return (
-            Selection.objects.filter(inscription=self, is_valid=True).count()
+            self.selection_count
             == SetList.objects.filter(round__instrument=self.instrument).count()
         )
 
@@ -419,6 +484,45 @@ class Helper(PersonBase):
     notes = models.TextField(blank=True, verbose_name=_("notes"))
 
 
+class StaffingDemand(models.Model):
+    """How many helpers a ressort needs in a slot, filled by tmc.scheduling."""
+
+    # a helper available the whole day can work every one of them
+    SHIFTS = TimeSlot.SLOTS[:3]
+
+    ressort = models.ForeignKey(Ressort, models.CASCADE, verbose_name=_("ressort"))
+    date = models.ForeignKey(DateSlot, models.CASCADE, verbose_name=_("datum"))
+    slot = models.CharField(max_length=60, choices=SHIFTS, verbose_name=_("slot"))
+    helpers = models.PositiveSmallIntegerField(verbose_name=_("helpers"))
+
+    class Meta:
+        ordering = ["date__date", "slot", "ressort__name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ressort", "date", "slot"], name="unique_staffing_demand"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ressort}, {self.date}, {self.get_slot_display()}"
+
+
+class Shift(models.Model):
+    """A helper working for the ressort of a demand, part of the rota."""
+
+    demand = models.ForeignKey(StaffingDemand, models.CASCADE, verbose_name=_("demand"))
+    helper = models.ForeignKey(Helper, models.CASCADE, verbose_name=_("helper"))
+
+    class Meta:
+        ordering = ["demand"]
+        constraints = [
+            models.UniqueConstraint(fields=["demand", "helper"], name="unique_shift")
+        ]
+
+    def __str__(self):
+        return f"{self.helper}: {self.demand}"
+
+
 class Round(models.Model):
     name = models.CharField(max_length=120)
     instrument = models.ForeignKey(Instrument, models.CASCADE)
@@ -433,17 +537,18 @@ class SetList(models.Model):
     required = models.FloatField(default=1)
 
     def is_valid_selection(self, pieces):
+        from tmc.exclusions import exclusion_graph
+
         if sum([piece.value for piece in pieces]) != self.required:
             raise ValidationError("The selected amount of pieces is wrong.")
-        piece_set = set(pieces)
-
-        for piece in pieces:
-            excludes = set(piece.excludes.all())
-            overlapp = piece_set.intersection(excludes)
-            if len(overlapp) > 0:
-                raise ValidationError(
-                    f"The selection of {piece} prevents the selection of {','.join({piece.name for piece in overlapp})}"
-                )
+        names = {piece.pk: piece.name for piece in pieces}
+
+        graph = exclusion_graph(self.pk)
+        for piece, overlapp in graph.conflicts(graph.mask(names)):
+            excluded = ",".join({names[pk] for pk in overlapp})
+            raise ValidationError(
+                f"The selection of {names[piece]} prevents the selection of {excluded}"
+            )
         return True
 
     def __str__(self) -> str:
@@ -481,3 +586,69 @@ class Selection(models.Model):
 
     def instrument(self):
         return self.set_list.round.instrument
+
+
+def job_result_path(instance, filename):
+    return f"jobs/{instance.pk}/{filename}"
+
+
+class AdminJob(models.Model):
+    """An admin action that runs on the django_q cluster instead of the request."""
+
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+    STATUS_CHOICES = (
+        (PENDING, _("pending")),
+        (RUNNING, _("running")),
+        (DONE, _("done")),
+        (FAILED, _("failed")),
+    )
+
+    user = models.ForeignKey(get_user_model(), models.SET_NULL, null=True)
+    name = models.CharField(max_length=200)
+
+    # what to run again in the worker: the action, the model admin it belongs
+    # to, the selected objects and the posted action form
+    action = models.CharField(max_length=200)
+    model = models.CharField(max_length=100)
+    pks = models.JSONField(default=list)
+    data = models.JSONField(default=dict)
+
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=PENDING)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # bytes of the result written so far
+    size = models.BigIntegerField(default=0)
+    result = models.FileField(upload_to=job_result_path, blank=True)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return self.name
+
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class SecretIdAllocation(models.Model):
+    """
+    An enumeration of inscriptions by tmc.secret_ids.allocate_secret_ids.
+
+    The seed and the assigned ids are enough to derive the order again.
+    """
+
+    user = models.ForeignKey(get_user_model(), models.SET_NULL, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    seed = models.CharField(max_length=64)
+    # secret id per inscription uid
+    assignments = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.created:%Y-%m-%d %H:%M} ({len(self.assignments)})"
@@ -0,0 +1,63 @@
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tmc.models import Inscription, Recording, Selection
+
+
+def count_of(queryset: QuerySet, field: str):
+    """Number of rows of `queryset` per `field`, as a subquery to update with."""
+    counts = queryset.order_by().values(field).annotate(count=Count("pk"))
+    return Coalesce(Subquery(counts.values("count")), Value(0))
+
+
+def update_progress(inscriptions: QuerySet[Inscription]):
+    """
+    Recount the recordings and valid selections of `inscriptions`.
+
+    One UPDATE with a correlated subquery per counter, so it is the same
+    statement for one inscription after a change and for all of them in
+    `rebuild_progress`. Returns the number of inscriptions updated.
+    """
+    complete = Recording.objects.filter(uploader=OuterRef("pk"), is_complete=True)
+    selections = count_of(
+        Selection.objects.filter(inscription=OuterRef("pk"), is_valid=True),
+        "inscription",
+    )
+    # the SET clauses all see the old row, the flag can't be read off the count
+    return inscriptions.update(
+        recording_count=count_of(complete, "uploader"),
+        has_recordings=Exists(complete),
+        selection_count=selections,
+    )
+
+
+def update_documents(inscriptions: QuerySet[Inscription]):
+    """Set `has_documents` of `inscriptions`, which `Inscription.save` keeps otherwise."""
+    complete = ~Q(photo="") & ~Q(passport="")
+    return inscriptions.update(
+        has_documents=ExpressionWrapper(complete, output_field=BooleanField())
+    )
+
+
+@receiver(post_save, sender=Recording)
+@receiver(post_delete, sender=Recording)
+def recording_changed(sender, instance: Recording, **kwargs):
+    update_progress(Inscription.objects.filter(pk=instance.uploader_id))
+
+
+@receiver(post_save, sender=Selection)
+@receiver(post_delete, sender=Selection)
+def selection_changed(sender, instance: Selection, **kwargs):
+    update_progress(Inscription.objects.filter(pk=instance.inscription_id))
@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from tmc.models import Piece, Selection, SetList
+
+CACHE_KEY = "tmc:repertoire-statistics"
+# Seconds the statistics stay cached, the signals below drop them on changes before
+CACHE_TIMEOUT = 60 * 60
+# Pairs of pieces chosen together listed on the statistics page
+TOP_PAIRS = 50
+
+SET_LIST_FIELDS = {
+    "instrument": F("set_list__round__instrument__name"),
+    "round": F("set_list__round__name"),
+    "set_list_name": F("set_list__name"),
+}
+
+
+def piece_frequencies():
+    """How many selections chose each piece, pieces nobody chose included."""
+    rows = (
+        Piece.objects.values("id", "name", "set_list", **SET_LIST_FIELDS)
+        .annotate(selections=Count("selection"))
+        .order_by("instrument", "round", "set_list_name", "-selections", "name")
+    )
+    return list(rows)
+
+
+def set_list_progress():
+    """Selections per set list, the ones that aren't valid yet and the empty ones."""
+    rows = (
+        SetList.objects.values(
+            "id",
+            instrument=F("round__instrument__name"),
+            round_name=F("round__name"),
+            set_list_name=F("name"),
+        )
+        .annotate(
+            selections=Count("selection"),
+            unfinished=Count("selection", filter=Q(selection__is_valid=False)),
+        )
+        .order_by("instrument", "round_name", "set_list_name")
+    )
+    return list(rows)
+
+
+def co_occurrences(limit=TOP_PAIRS):
+    """
+    The pairs of pieces chosen together most often.
+
+    The selection rows are joined with themselves, each pair is counted
+    once with the lower piece id first. Pairs are grouped by the ids, pieces
+    of different set lists can have the same title, the names are only
+    there to be displayed.
+    """
+    pairs = (
+        Selection.pieces.through.objects.filter(selection__pieces__pk__gt=F("piece"))
+        .values(
+            first_id=F("piece"),
+            second_id=F("selection__pieces"),
+            first=F("piece__name"),
+            second=F("selection__pieces__name"),
+            instrument=F("piece__set_list__round__instrument__name"),
+            set_list_name=F("piece__set_list__name"),
+            round=F("piece__set_list__round__name"),
+        )
+        .annotate(selections=Count("selection"))
+        .order_by("-selections", "first", "second", "first_id", "second_id")
+    )
+    return list(pairs[:limit])
+
+
+def repertoire_statistics():
+    """The statistics of the admin page, from the cache if nothing changed since."""
+    statistics = cache.get(CACHE_KEY)
+    if statistics is None:
+        statistics = {
+            "pieces": piece_frequencies(),
+            "set_lists": set_list_progress(),
+            "pairs": co_occurrences(),
+        }
+        shares = {row["id"]: row["selections"] for row in statistics["set_lists"]}
+        for row in statistics["pieces"]:
+            total = shares.get(row["set_list"])
+            row["share"] = row["selections"] / total if total else None
+        cache.set(CACHE_KEY, statistics, CACHE_TIMEOUT)
+    return statistics
+
+
+def invalidate_statistics():
+    """Drop the cached statistics, after changing selections with `update()`."""
+    cache.delete(CACHE_KEY)
+
+
+@receiver(post_save, sender=Selection)
+@receiver(post_delete, sender=Selection)
+@receiver(post_save, sender=Piece)
+@receiver(post_delete, sender=Piece)
+@receiver(post_save, sender=SetList)
+@receiver(post_delete, sender=SetList)
+@receiver(m2m_changed, sender=Selection.pieces.through)
+def selections_changed(sender, **kwargs):
+    invalidate_statistics()
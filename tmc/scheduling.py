@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import groupby, islice
+
+from django.db import transaction
+
+from tmc.matching import FlowNetwork
+from tmc.models import Helper, Shift, StaffingDemand, TimeSlot
+
+# Costs of a shift for a helper: per shift the helper already has, outside
+# of the ressorts they prefer and in a slot only a spontaneous helper would
+# take, the scheduler fills as many shifts as possible at the lowest cost
+LOAD_COST = 1
+RESSORT_COST = 3
+SPONTANEOUS_COST = 10
+
+SLOT_ORDER = [slot for slot, _ in StaffingDemand.SHIFTS]
+
+
+def expand_slot(slot):
+    """The shifts a declared time slot covers."""
+    return SLOT_ORDER if slot == "whole_day" else [slot]
+
+
+def slot_order(demand):
+    return demand["date_order"], demand["date"], SLOT_ORDER.index(demand["slot"])
+
+
+@dataclass
+class Rota:
+    # helper ids per demand id
+    shifts: dict = field(default_factory=dict)
+    # helpers still missing per demand id
+    missing: dict = field(default_factory=dict)
+    cost: int = 0
+
+    @property
+    def filled(self):
+        return sum(len(helpers) for helpers in self.shifts.values())
+
+
+def schedule(demands, available, helpers):
+    """
+    Fill `demands` with `helpers`.
+
+    `demands` are rows with the id, ressort, date, slot and the number of
+    helpers still `open`. `available` has a (helper, date, slot) tuple per
+    declared shift. `helpers` are rows with the id, the ids of the preferred
+    `ressorts`, `is_spontaneous`, the shifts they have (`load`) and the
+    (date, slot) they work already (`busy`). Loads and busy slots are updated.
+
+    Nobody works two shifts at once and no slot depends on another one, so
+    every slot is filled on its own. The slots are solved in order with a
+    min-cost max-flow between groups of helpers with the same load and
+    preferences and the ressorts of the slot, the cost of a shift growing
+    with the load keeps it even.
+    """
+    rota = Rota()
+
+    for _, slot_demands in groupby(sorted(demands, key=slot_order), key=slot_order):
+        slot_demands = [demand for demand in slot_demands if demand["open"] > 0]
+        if not slot_demands:
+            continue
+        date, slot = slot_demands[0]["date"], slot_demands[0]["slot"]
+        ressorts = {demand["ressort"] for demand in slot_demands}
+
+        groups = defaultdict(list)
+        for helper in helpers:
+            if (date, slot) in helper["busy"]:
+                continue
+            declared = (helper["id"], date, slot) in available
+            if declared or helper["is_spontaneous"]:
+                key = (
+                    helper["load"],
+                    declared,
+                    frozenset(helper["ressorts"] & ressorts),
+                )
+                groups[key].append(helper)
+
+        keys = list(groups)
+        sink = 1 + len(keys) + len(slot_demands)
+        network = FlowNetwork(sink + 1)
+        for g, key in enumerate(keys, 1):
+            network.add_edge(0, g, len(groups[key]))
+        edges = {}
+        for d, demand in enumerate(slot_demands, 1 + len(keys)):
+            network.add_edge(d, sink, demand["open"])
+            for g, key in enumerate(keys, 1):
+                load, declared, preferred = key
+                cost = load * LOAD_COST
+                if demand["ressort"] not in preferred:
+                    cost += RESSORT_COST
+                if not declared:
+                    cost += SPONTANEOUS_COST
+                edges[key, demand["id"]] = network.add_edge(
+                    g, d, len(groups[key]), cost
+                )
+
+        _, cost = network.solve(0, sink)
+        rota.cost += cost
+
+        waiting = {key: iter(members) for key, members in groups.items()}
+        for demand in slot_demands:
+            for key in keys:
+                amount = network.flow(edges[key, demand["id"]])
+                for helper in islice(waiting[key], amount):
+                    rota.shifts.setdefault(demand["id"], []).append(helper["id"])
+                    helper["load"] += 1
+                    helper["busy"].add((date, slot))
+
+    for demand in demands:
+        missing = demand["open"] - len(rota.shifts.get(demand["id"], []))
+        if missing > 0:
+            rota.missing[demand["id"]] = missing
+
+    return rota
+
+
+def helper_rows(helpers):
+    rows = {row["id"]: row for row in helpers.values("id", "is_spontaneous")}
+    for row in rows.values():
+        row.update(ressorts=set(), load=0, busy=set())
+
+    for helper, ressort in Helper.ressorts.through.objects.filter(
+        helper__in=list(rows)
+    ).values_list("helper", "ressort"):
+        rows[helper]["ressorts"].add(ressort)
+    for helper, date, slot in Shift.objects.filter(helper__in=list(rows)).values_list(
+        "helper", "demand__date", "demand__slot"
+    ):
+        rows[helper]["load"] += 1
+        rows[helper]["busy"].add((date, slot))
+
+    return list(rows.values())
+
+
+def availability(helpers):
+    return {
+        (helper, date, shift)
+        for helper, date, slot in TimeSlot.objects.filter(
+            helper__in=helpers
+        ).values_list("helper", "date", "slot")
+        for shift in expand_slot(slot)
+    }
+
+
+def demand_rows(demands):
+    rows = list(
+        demands.values("id", "ressort", "date", "date__date", "slot", "helpers")
+    )
+    taken = Counter(
+        Shift.objects.filter(demand__in=[row["id"] for row in rows]).values_list(
+            "demand", flat=True
+        )
+    )
+    for row in rows:
+        row["date_order"] = row.pop("date__date")
+        row["open"] = row["helpers"] - taken[row["id"]]
+    return rows
+
+
+@transaction.atomic
+def schedule_helpers(demands=None, dry_run=False):
+    """
+    Fill the open shifts of `demands` (all demands by default) with helpers.
+
+    Shifts that are already in the rota stay, they count towards the demand
+    and the load of their helper. The rota is locked while the shifts are
+    computed, the new ones are inserted at once.
+    """
+    if demands is None:
+        demands = StaffingDemand.objects.all()
+    demands = demands.select_for_update(of=("self",))
+    helpers = Helper.objects.all()
+
+    rota = schedule(demand_rows(demands), availability(helpers), helper_rows(helpers))
+
+    if not dry_run:
+        Shift.objects.bulk_create(
+            Shift(demand_id=demand, helper_id=helper)
+            for demand, members in rota.shifts.items()
+            for helper in members
+        )
+
+    return rota
@@ -0,0 +1,71 @@
+import random
+import secrets
+from itertools import count, islice
+
+from django.db import transaction
+
+from tmc.models import Inscription, SecretIdAllocation
+
+# Digits of the ids handed out, more if there are more inscriptions
+WIDTH = 4
+
+
+def permute(pks, numbers, seed):
+    """
+    Pair the inscriptions with the ids in the random order given by `seed`.
+
+    Only depends on the sets of `pks` and `numbers`, which is what makes an
+    allocation reproducible from what is stored about it.
+    """
+    shuffled = random.Random(seed).sample(sorted(pks), len(pks))
+    return dict(zip(shuffled, sorted(numbers)))
+
+
+def free_ids(amount, taken):
+    """The lowest `amount` ids that are not in `taken`."""
+    width = max(WIDTH, len(str(amount + len(taken))))
+    ids = (f"{number:0{width}}" for number in count(1))
+    return list(islice((id for id in ids if id not in taken), amount))
+
+
+@transaction.atomic
+def allocate_secret_ids(inscriptions, seed=None, user=None):
+    """
+    Number `inscriptions` densely from 1 in a random order.
+
+    Ids held by other inscriptions are skipped, so they stay unique. The
+    secret ids are written with two bulk updates, the first one moves the
+    inscriptions to temporary ids so the unique constraint holds while the
+    ids are swapped among them.
+    """
+    seed = seed or secrets.token_hex(16)
+    pks = [
+        str(pk) for pk in inscriptions.select_for_update().values_list("pk", flat=True)
+    ]
+    taken = set(
+        Inscription.objects.exclude(pk__in=pks)
+        .select_for_update()
+        .values_list("secret_id", flat=True)
+    )
+
+    assignments = permute(pks, free_ids(len(pks), taken), seed)
+
+    # Inscription.save isn't needed, only the ids change
+    objs = [Inscription(pk=pk, secret_id=f"_{i:07}") for i, pk in enumerate(pks)]
+    Inscription.objects.bulk_update(objs, ["secret_id"], batch_size=500)
+    for obj in objs:
+        obj.secret_id = assignments[str(obj.pk)]
+    Inscription.objects.bulk_update(objs, ["secret_id"], batch_size=500)
+
+    return SecretIdAllocation.objects.create(
+        user=user, seed=seed, assignments=assignments
+    )
+
+
+def replay(allocation: SecretIdAllocation):
+    """The assignments `allocation` would make again, to audit it."""
+    return permute(
+        list(allocation.assignments),
+        list(allocation.assignments.values()),
+        allocation.seed,
+    )
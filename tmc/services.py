@@ -1,9 +1,10 @@
 from constance import config
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.core.mail import send_mail
 from django.db import transaction
+from django.db.models import Case, Q, Value, When
 from django.shortcuts import get_object_or_404, reverse
 from sesame.utils import get_query_string
 
@@ -11,7 +12,8 @@ from tmc.models import Helper, HostFamily, Inscription, JuryMember
 
 EXCLUDED_FIELDS = [
     'secret_id', 'internal_note', 'host_family', 'user', 'passport', 'photo', 'recording',
-    'has_recordings', 'has_documents', 'payment', 'payment_date', 'is_qualified', 'selection'
+    'has_recordings', 'has_documents', 'recording_count', 'selection_count', 'payment',
+    'payment_date', 'is_qualified', 'selection'
 ]
 
 
@@ -28,7 +30,7 @@ def fetch_inscription(pk, user):
 
     instance = get_object_or_404(Inscription, uid=pk)
 
-    if instance.user.pk != user.pk and not user.is_staff:
+    if instance.user_id != user.pk and not user.is_staff:
         raise PermissionDenied()
     return instance
 
@@ -36,7 +38,7 @@ def fetch_inscription(pk, user):
 def fetch_host(pk, user):
     host = get_object_or_404(HostFamily, pk=pk)
 
-    if host.user.pk != user.pk and not user.is_staff:
+    if host.user_id != user.pk and not user.is_staff:
         raise PermissionDenied()
 
     return host
@@ -45,7 +47,7 @@ def fetch_host(pk, user):
 def fetch_jury(pk, user):
     jury = get_object_or_404(JuryMember, pk=pk)
 
-    if jury.user.pk != user.pk and not user.is_staff:
+    if jury.user_id != user.pk and not user.is_staff:
         raise PermissionDenied()
 
     return jury
@@ -54,26 +56,60 @@ def fetch_jury(pk, user):
 def fetch_helper(pk, user):
     helper = get_object_or_404(Helper, pk=pk)
 
-    if helper.user.pk != user.pk and not user.is_staff:
+    if helper.user_id != user.pk and not user.is_staff:
         raise PermissionDenied()
 
     return helper
 
 
-def create_user(inscription):
-
-    user = get_user_model().objects.create(
+def new_user(inscription):
+    return get_user_model()(
         username=inscription.email,
         email=inscription.email,
         first_name=inscription.given_name,
         last_name=inscription.surname,
     )
+
+
+def create_user(inscription):
+
+    user = new_user(inscription)
+    user.save()
     inscription.user = user
     inscription.save()
 
     return user
 
 
+def lock_guests(host, guests, capacity):
+    """
+    Check that `guests` can stay with `host`, holding row locks on both until the transaction
+    ends.
+
+    A concurrent assignment to the same host or of the same guests waits for the locks and then
+    sees the guests taken, so hosts can't be overfilled.
+    """
+    if host.pk:
+        HostFamily.objects.select_for_update().get(pk=host.pk)
+
+    locked = Inscription.objects.select_for_update().filter(pk__in=[guest.pk for guest in guests])
+    taken = [guest for guest in locked if guest.host_family_id not in (None, host.pk)]
+
+    if taken:
+        raise ValidationError(
+            f'Already staying with another host: {", ".join(str(guest) for guest in taken)}')
+    if len(guests) > capacity:
+        raise ValidationError(f'Too many people asigned to this host (max: {capacity})')
+
+
+def assign_guests(host, guests):
+    """Make `guests` the guests of `host` and release the others, with one UPDATE."""
+    pks = [guest.pk for guest in guests]
+
+    Inscription.objects.filter(Q(host_family=host) | Q(pk__in=pks)).update(
+        host_family=Case(When(pk__in=pks, then=Value(host.pk)), default=None))
+
+
 @transaction.atomic
 def process_signup(form, target_url):
     inscription: Inscription = form.save(commit=False)
@@ -131,6 +167,7 @@ def send_message(
     inscription=None,
     user=None,
     target_url='',
+    connection=None,
 ):
 
     if user is None:
@@ -151,27 +188,41 @@ def send_message(
         message,
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[email],
+        connection=connection,
     )
 
 
-def send_signup_message(inscription: Inscription, target_url):
-    send_message(config.WELCOME_SUBJECT, config.WELCOME_TEXT, inscription, target_url=target_url)
+def send_signup_message(inscription: Inscription, target_url, connection=None):
+    send_message(config.WELCOME_SUBJECT,
+                 config.WELCOME_TEXT,
+                 inscription,
+                 target_url=target_url,
+                 connection=connection)
 
 
 def send_auth_message(inscription: Inscription, target_url):
     send_message(config.AUTH_SUBJECT, config.AUTH_TEXT, None, inscription, target_url=target_url)
 
 
-def send_host_signup(host, target_url):
-    send_message(config.HOST_SIGNUP_SUBJECT, config.HOST_SIGNUP_TEXT, host, target_url=target_url)
+def send_host_signup(host, target_url, connection=None):
+    send_message(config.HOST_SIGNUP_SUBJECT,
+                 config.HOST_SIGNUP_TEXT,
+                 host,
+                 target_url=target_url,
+                 connection=connection)
 
 
-def send_helper_signup(helper, target_url):
+def send_helper_signup(helper, target_url, connection=None):
     send_message(config.HELPER_SIGNUP_SUBJECT,
                  config.HELPER_SIGNUP_TEXT,
                  helper,
-                 target_url=target_url)
+                 target_url=target_url,
+                 connection=connection)
 
 
-def send_jury_signup(jury, target_url):
-    send_message(config.JURY_SIGNUP_SUBJECT, config.JURY_SIGNUP_TEXT, jury, target_url=target_url)
+def send_jury_signup(jury, target_url, connection=None):
+    send_message(config.JURY_SIGNUP_SUBJECT,
+                 config.JURY_SIGNUP_TEXT,
+                 jury,
+                 target_url=target_url,
+                 connection=connection)
@@ -0,0 +1,354 @@
+import datetime
+import functools
+import mimetypes
+import os
+import secrets
+import shutil
+from typing import Union
+
+import boto3
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils._os import safe_join
+
+PRESIGN_EXPIRES = 60 * 30
+
+READ_SALT = "tmc.storage.read"
+WRITE_SALT = "tmc.storage.write"
+
+
+class S3Backend:
+    """
+    Presigns urls and talks to the recordings bucket.
+
+    Building a boto3 session and client takes tens of milliseconds, so one
+    instance is shared by all requests of a process (clients are thread-safe),
+    see `get_backend`.
+    """
+
+    def __init__(
+        self,
+        bucket,
+        region_name=None,
+        endpoint_url=None,
+        access_key_id=None,
+        secret_access_key=None,
+        querystring_expire=None,
+    ):
+        self.bucket = bucket
+        self.querystring_expire = querystring_expire or PRESIGN_EXPIRES
+        self.client = boto3.session.Session().client(
+            "s3",
+            region_name=region_name or None,
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+        )
+
+    def read_url(self, key):
+        """Location a local process like ffmpeg can read the object from."""
+        return self.presign_get(key)
+
+    def presign(self, method, key, expires=PRESIGN_EXPIRES, **params):
+        return self.client.generate_presigned_url(
+            ClientMethod=method,
+            Params={"Bucket": self.bucket, "Key": key, **params},
+            ExpiresIn=expires,
+        )
+
+    def presign_get(self, key):
+        return self.presign("get_object", key, expires=self.querystring_expire)
+
+    def presign_put(self, key):
+        return self.presign("put_object", key)
+
+    def presign_part(self, key, upload_id, number):
+        return self.presign("upload_part", key, UploadId=upload_id, PartNumber=number)
+
+    def create_multipart(self, key, content_type=""):
+        params = {"Bucket": self.bucket, "Key": key}
+        if content_type:
+            params["ContentType"] = content_type
+
+        return self.client.create_multipart_upload(**params)["UploadId"]
+
+    def list_parts(self, key, upload_id):
+        """Return the parts S3 already received for a multipart upload."""
+        paginator = self.client.get_paginator("list_parts")
+
+        parts = []
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts.append(
+                    {
+                        "PartNumber": part["PartNumber"],
+                        "ETag": part["ETag"],
+                        "Size": part["Size"],
+                    }
+                )
+        return parts
+
+    def complete_multipart(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    def upload(self, filename, key, content_type):
+        self.client.upload_file(
+            filename, self.bucket, key, ExtraArgs={"ContentType": content_type}
+        )
+
+    def iter_object(self, key, chunk_size):
+        """Stream the content of an object without loading it into memory."""
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def head(self, key):
+        """Return the metadata of an object or None if it doesn't exist."""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def list_objects(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            yield from page.get("Contents", [])
+
+    def abort_multipart(self, key, upload_id):
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+        except ClientError:
+            # The upload was already completed or cleaned up by the bucket lifecycle.
+            pass
+
+
+class LocalBackend:
+    """
+    Keeps the recordings in a directory, for editions that run without S3.
+
+    It speaks the same protocol as `S3Backend`: the "presigned" urls point to
+    `recording_file` and `recording_upload`, which check the signature instead
+    of a login. Multipart uploads are collected as one file per part in
+    `.uploads/<upload_id>/` and concatenated on completion.
+    """
+
+    def __init__(self, root, base_url="", querystring_expire=None):
+        self.root = str(root)
+        self.base_url = base_url
+        self.querystring_expire = querystring_expire or PRESIGN_EXPIRES
+
+    def path(self, key):
+        if key.startswith("/") or ".." in key:
+            raise SuspiciousFileOperation(f"Invalid recording key {key!r}")
+        return safe_join(self.root, key)
+
+    def upload_path(self, upload_id, number=None):
+        path = safe_join(self.root, ".uploads", upload_id)
+        if number is None:
+            return path
+        return os.path.join(path, str(number))
+
+    def read_url(self, key):
+        return self.path(key)
+
+    def sign(self, url_name, salt, **data):
+        return self.base_url + reverse(url_name, args=(signing.dumps(data, salt=salt),))
+
+    def presign_get(self, key):
+        return self.sign("tmc:recording_file", READ_SALT, key=key)
+
+    def presign_put(self, key):
+        return self.sign("tmc:recording_upload", WRITE_SALT, key=key)
+
+    def presign_part(self, key, upload_id, number):
+        return self.sign(
+            "tmc:recording_upload", WRITE_SALT, key=key, upload=upload_id, part=number
+        )
+
+    def unsign_read(self, token):
+        return signing.loads(token, salt=READ_SALT, max_age=self.querystring_expire)
+
+    def unsign_write(self, token):
+        return signing.loads(token, salt=WRITE_SALT, max_age=PRESIGN_EXPIRES)
+
+    def write(self, target, chunks):
+        """Write `chunks` to `target`, the file only appears once it is complete."""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = f"{target}.partial"
+
+        with open(partial, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(partial, target)
+
+    def create_multipart(self, key, content_type=""):
+        upload_id = secrets.token_hex(16)
+        os.makedirs(self.upload_path(upload_id))
+        return upload_id
+
+    def list_parts(self, key, upload_id):
+        """Raises FileNotFoundError for unknown uploads, like S3 raises NoSuchUpload."""
+        numbers = sorted(
+            int(name)
+            for name in os.listdir(self.upload_path(upload_id))
+            if name.isdigit()
+        )
+        return [
+            {
+                "PartNumber": number,
+                "ETag": "",
+                "Size": os.path.getsize(self.upload_path(upload_id, number)),
+            }
+            for number in numbers
+        ]
+
+    def complete_multipart(self, key, upload_id, parts):
+        def chunks():
+            for part in sorted(parts, key=lambda part: part["PartNumber"]):
+                with open(self.upload_path(upload_id, part["PartNumber"]), "rb") as f:
+                    while chunk := f.read(1024 * 1024):
+                        yield chunk
+
+        self.write(self.path(key), chunks())
+        self.abort_multipart(key, upload_id)
+
+    def abort_multipart(self, key, upload_id):
+        shutil.rmtree(self.upload_path(upload_id), ignore_errors=True)
+
+    def upload(self, filename, key, content_type):
+        os.makedirs(os.path.dirname(self.path(key)), exist_ok=True)
+        shutil.copyfile(filename, self.path(key))
+
+    def iter_object(self, key, chunk_size):
+        with open(self.path(key), "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def describe(self, key, stat):
+        return {
+            "Key": key,
+            "Size": stat.st_size,
+            "ContentLength": stat.st_size,
+            "ContentType": mimetypes.guess_type(key)[0] or "",
+            "ETag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            "LastModified": datetime.datetime.fromtimestamp(
+                stat.st_mtime, tz=datetime.timezone.utc
+            ),
+        }
+
+    def head(self, key):
+        try:
+            return self.describe(key, os.stat(self.path(key)))
+        except FileNotFoundError:
+            return None
+
+    def list_objects(self, prefix):
+        for directory, _, names in os.walk(self.path(prefix)):
+            for name in names:
+                if name.endswith(".partial"):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                yield self.describe(key, os.stat(path))
+
+
+Backend = Union[S3Backend, LocalBackend]
+
+
+DEFAULT_BACKEND = "default"
+
+
+def get_backend(name=DEFAULT_BACKEND) -> Backend:
+    """
+    Return the backend called `name`, built once per process.
+
+    "default" is configured by the AWS_* settings (or MEDIA_ROOT in local mode),
+    the regional ones by RECORDING_BACKENDS.
+    """
+    return _build_backend(name or DEFAULT_BACKEND)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_backend(name) -> Backend:
+    if name != DEFAULT_BACKEND:
+        options = dict(settings.RECORDING_BACKENDS[name])
+        options.pop("probe_url", None)
+        return S3Backend(
+            options.pop("bucket"),
+            querystring_expire=settings.AWS_QUERYSTRING_EXPIRE,
+            **options,
+        )
+
+    if settings.RECORDING_STORAGE == "local":
+        return LocalBackend(
+            settings.MEDIA_ROOT,
+            base_url=settings.RECORDING_BASE_URL,
+            querystring_expire=settings.AWS_QUERYSTRING_EXPIRE,
+        )
+
+    return S3Backend(
+        settings.AWS_STORAGE_BUCKET_NAME,
+        region_name=settings.AWS_S3_REGION_NAME,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
+        secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+        querystring_expire=settings.AWS_QUERYSTRING_EXPIRE,
+    )
+
+
+def backend_names():
+    return [DEFAULT_BACKEND, *settings.RECORDING_BACKENDS]
+
+
+def choose_backend(instance, hint=""):
+    """
+    Pick the backend a contestant uploads to.
+
+    `hint` is the backend the upload script measured the lowest latency to,
+    otherwise RECORDING_BACKEND_COUNTRIES maps the nationality to a backend.
+    The hint only counts if every backend could be probed, one that wasn't
+    measured would never win.
+    """
+    urls = probe_urls()
+    if hint in urls and len(urls) == len(backend_names()):
+        return hint
+
+    return settings.RECORDING_BACKEND_COUNTRIES.get(
+        instance.nationality.code, DEFAULT_BACKEND
+    )
+
+
+def probe_urls():
+    """Urls the upload script measures the latency to, one per backend."""
+    if not settings.RECORDING_BACKENDS:
+        return {}
+
+    urls = {
+        DEFAULT_BACKEND: settings.RECORDING_PROBE_URL or settings.AWS_S3_ENDPOINT_URL
+    }
+    for name, options in settings.RECORDING_BACKENDS.items():
+        urls[name] = options.get("probe_url") or options.get("endpoint_url")
+    return {name: url for name, url in urls.items() if url}
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    if setting.startswith("AWS_") or setting.startswith("RECORDING_"):
+        _build_backend.cache_clear()
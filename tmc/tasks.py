@@ -0,0 +1,220 @@
+import os
+import re
+import subprocess
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from tmc.models import Inscription, Recording, RequiredRecording
+from tmc.progress import update_progress
+from tmc.storage import choose_backend, get_backend
+
+RECORDING_NAME = re.compile(r"^(?P<nr>\d+)_(?P<slug>[-\w]+)\.(?P<extension>\w+)$")
+
+VERIFIED_FIELDS = [
+    "recording",
+    "is_complete",
+    "size",
+    "content_type",
+    "etag",
+    "verified",
+]
+
+
+def verify_recording(pk):
+    """
+    Check that the object of a recording exists on the bucket and store its metadata.
+
+    Queued by `upload_completed`, the client only tells us that it finished uploading.
+    """
+    recording = Recording.objects.filter(pk=pk).first()
+
+    if recording is None or not recording.recording:
+        return
+
+    head = get_backend(recording.backend).head(recording.recording.name)
+
+    if head is None:
+        recording.is_complete = False
+        recording.size = None
+        recording.etag = ""
+    else:
+        recording.size = head["ContentLength"]
+        # a truncated object is no recording the jury can watch
+        recording.is_complete = recording.expected_size in (None, recording.size)
+        recording.content_type = head.get("ContentType", "")
+        recording.etag = head["ETag"].strip('"')
+
+    recording.verified = timezone.now()
+    recording.save(update_fields=VERIFIED_FIELDS + ["updated"])
+
+    if recording.is_complete and not recording.preview:
+        async_task("tmc.tasks.transcode_recording", recording.pk)
+
+
+def preview_key(recording: Recording, extension):
+    name = recording.recording.name.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+    return f"{recording.uploader_id}/previews/{name}.{extension}"
+
+
+def transcode_recording(pk):
+    """
+    Create a low-bitrate mp4 and a poster frame of a recording with ffmpeg.
+
+    ffmpeg reads the original directly from the storage, so only the
+    rendition and the poster are written to disk.
+    """
+    recording = Recording.objects.filter(pk=pk, is_complete=True).first()
+
+    if recording is None or not recording.recording:
+        return
+
+    backend = get_backend(recording.backend)
+    source = backend.read_url(recording.recording.name)
+    bitrate = settings.RECORDING_PREVIEW_BITRATE
+
+    with tempfile.TemporaryDirectory() as directory:
+        preview = os.path.join(directory, "preview.mp4")
+        poster = os.path.join(directory, "poster.jpg")
+
+        # -2 keeps the aspect ratio with an even width, smaller videos are not scaled up
+        scale = f"scale=-2:'min({settings.RECORDING_PREVIEW_HEIGHT},ih)'"
+        base = [settings.FFMPEG_BINARY, "-nostdin", "-loglevel", "error", "-y"]
+
+        command = base + ["-i", source, "-vf", scale, "-pix_fmt", "yuv420p"]
+        command += ["-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main"]
+        command += ["-b:v", bitrate, "-maxrate", bitrate, "-bufsize", "3000k"]
+        command += ["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart", preview]
+        subprocess.run(command, check=True)
+
+        command = base + ["-i", preview, "-vf", "thumbnail,scale=-2:360"]
+        command += ["-frames:v", "1", poster]
+        subprocess.run(command, check=True)
+
+        recording.preview = preview_key(recording, "mp4")
+        recording.poster = preview_key(recording, "jpg")
+        backend.upload(preview, recording.preview.name, "video/mp4")
+        backend.upload(poster, recording.poster.name, "image/jpeg")
+
+    # the original might have been replaced while transcoding
+    Recording.objects.filter(pk=recording.pk, etag=recording.etag).update(
+        preview=recording.preview.name, poster=recording.poster.name
+    )
+
+
+def reconcile_recordings(pks=None):
+    """
+    Bring the recordings in the database in line with the objects on the bucket.
+
+    Lists `<uid>/recordings/` of every inscription (all of them, or the ones in
+    `pks`), creates missing `Recording` rows, updates size and ETag of the
+    existing ones and marks recordings whose object disappeared as incomplete.
+    Every backend the inscription could have uploaded to is listed. A
+    recording whose object changed loses its preview and poster, they are
+    transcoded again.
+    """
+    inscriptions = Inscription.objects.all()
+    if pks is not None:
+        inscriptions = inscriptions.filter(pk__in=pks)
+
+    requirements = {
+        (requirement.instrument_id, requirement.nr, requirement.slug): requirement.pk
+        for requirement in RequiredRecording.objects.all()
+    }
+
+    existing = defaultdict(dict)
+    for recording in Recording.objects.filter(uploader__in=inscriptions):
+        existing[recording.uploader_id][recording.requirement_id] = recording
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    to_transcode = []
+
+    for inscription in inscriptions.only("uid", "instrument_id", "nationality"):
+        uid = inscription.uid
+        recordings = existing[uid]
+        backends = {choose_backend(inscription)}
+        backends.update(recording.backend for recording in recordings.values())
+
+        found = {}
+        for name in sorted(backends):
+            for obj in get_backend(name).list_objects(f"{uid}/recordings/"):
+                match = RECORDING_NAME.match(obj["Key"].rsplit("/", 1)[-1])
+                if match is None:
+                    continue
+                requirement_id = requirements.get(
+                    (inscription.instrument_id, int(match["nr"]), match["slug"])
+                )
+                if requirement_id is None:
+                    continue
+                # Keep the most recent upload if a recording exists with several
+                # extensions or on several backends
+                current = found.get(requirement_id)
+                if current is None or obj["LastModified"] > current["LastModified"]:
+                    found[requirement_id] = {**obj, "Backend": name}
+
+        for requirement_id, obj in found.items():
+            recording = recordings.get(requirement_id)
+            if recording is None:
+                recording = Recording(uploader_id=uid, requirement_id=requirement_id)
+                to_create.append(recording)
+            else:
+                to_update.append(recording)
+
+            etag = obj["ETag"].strip('"')
+            if (recording.recording.name, recording.backend, recording.etag) != (
+                obj["Key"],
+                obj["Backend"],
+                etag,
+            ):
+                # the preview and poster belong to the previous object
+                recording.preview = ""
+                recording.poster = ""
+                to_transcode.append(recording)
+
+            recording.recording = obj["Key"]
+            recording.backend = obj["Backend"]
+            recording.is_complete = True
+            recording.size = obj["Size"]
+            recording.etag = etag
+            recording.verified = now
+
+        for requirement_id, recording in recordings.items():
+            if requirement_id in found or recording.upload_id:
+                continue
+            if not recording.is_complete and recording.size is None:
+                continue
+            recording.is_complete = False
+            recording.size = None
+            recording.etag = ""
+            recording.verified = now
+            to_update.append(recording)
+
+    with transaction.atomic():
+        Recording.objects.bulk_create(to_create, batch_size=500)
+        Recording.objects.bulk_update(
+            to_update,
+            [
+                "recording",
+                "backend",
+                "is_complete",
+                "size",
+                "etag",
+                "verified",
+                "preview",
+                "poster",
+            ],
+            batch_size=500,
+        )
+        update_progress(inscriptions)
+
+    for recording in to_transcode:
+        async_task("tmc.tasks.transcode_recording", recording.pk)
+
+    return len(to_create), len(to_update)
@@ -1,3 +1,1955 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import tablib
+from botocore.stub import Stubber
+from constance import config
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+from tmc import uploads
+from tmc.admin import InscriptionResource, ShiftResource, download_playlist
+from tmc.exclusions import exclusion_graph
+from tmc.exports import (
+    recording_manifest,
+    repertoire_rows,
+    resource_rows,
+    stream_zip,
+    table_csv,
+)
+from tmc.management.commands.benchmark_repertoire import create_selections
+from tmc.management.commands.import_people import count_rows
+from tmc.jobs import run_job
+from tmc.matching import assign_hosts
+from tmc.models import (
+    AdminJob,
+    DateSlot,
+    Helper,
+    HostFamily,
+    Inscription,
+    Instrument,
+    JuryMember,
+    Language,
+    Piece,
+    Recording,
+    RequiredRecording,
+    Ressort,
+    Round,
+    Selection,
+    SetList,
+    Shift,
+    StaffingDemand,
+    TimeSlot,
+    UploadAttempt,
+)
+from tmc.repertoire import repertoire_statistics
+from tmc.scheduling import schedule_helpers
+from tmc.secret_ids import allocate_secret_ids, replay
+from tmc.services import assign_guests, lock_guests
+from tmc.storage import (
+    LocalBackend,
+    S3Backend,
+    _build_backend,
+    choose_backend,
+    get_backend,
+    probe_urls,
+)
+from tmc.tasks import reconcile_recordings, transcode_recording, verify_recording
+from tmc.transport import transport_runs
+from tmc.views import bulk_upsert_recordings
+
+S3_SETTINGS = {
+    "AWS_STORAGE_BUCKET_NAME": "tmc",
+    "AWS_S3_REGION_NAME": "us-east-1",
+    "AWS_S3_ENDPOINT_URL": "http://localhost:9000",
+    "AWS_S3_ACCESS_KEY_ID": "access",
+    "AWS_S3_SECRET_ACCESS_KEY": "secret",
+}
+
+
+def create_inscription(instrument, email="contestant@example.com"):
+    user = get_user_model().objects.create(username=email, email=email)
+
+    return Inscription.objects.create(
+        user=user,
+        given_name="Clara",
+        surname="Schumann",
+        email=email,
+        phone="+41791234567",
+        instrument=instrument,
+        gender="f",
+        date_of_birth=datetime.date(2000, 9, 13),
+        nationality="CH",
+        mother_tongue="German",
+        language_of_correspondence="en",
+        education="-",
+        occupation="-",
+        emergency_contact="-",
+        emergency_phone="+41791234567",
+        accomodation_needed=False,
+        is_smoker=False,
+        vegetarian=False,
+    )
+
+
+@override_settings(**S3_SETTINGS)
+class S3TestCase(TestCase):
+    """Runs against a stubbed client of the shared backend instead of a real bucket."""
+
+    def setUp(self):
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.inscription = create_inscription(self.instrument)
+        self.requirement = RequiredRecording.objects.create(
+            name="Etude", slug="etude", nr=1, instrument=self.instrument
+        )
+
+        self.stubber = Stubber(get_backend().client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def key(self, name="01_etude.mp4"):
+        return f"{self.inscription.uid}/recordings/{name}"
+
+
+class VerifyRecordingTest(S3TestCase):
+    def test_stores_object_metadata(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key(),
+        )
+        self.stubber.add_response(
+            "head_object",
+            {"ContentLength": 1024, "ContentType": "video/mp4", "ETag": '"abc-3"'},
+            {"Bucket": "tmc", "Key": self.key()},
+        )
+
+        verify_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.inscription.refresh_from_db()
+        self.assertTrue(recording.is_complete)
+        self.assertEqual(recording.size, 1024)
+        self.assertEqual(recording.content_type, "video/mp4")
+        self.assertEqual(recording.etag, "abc-3")
+        self.assertTrue(self.inscription.has_recordings)
+
+    def test_missing_object(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key(),
+            is_complete=True,
+        )
+        self.stubber.add_client_error("head_object", "404", http_status_code=404)
+
+        verify_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.inscription.refresh_from_db()
+        self.assertFalse(recording.is_complete)
+        self.assertFalse(self.inscription.has_recordings)
+
+
+class ReconcileRecordingsTest(S3TestCase):
+    def list_response(self, *keys):
+        modified = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+        self.stubber.add_response(
+            "list_objects_v2",
+            {
+                "Contents": [
+                    {
+                        "Key": key,
+                        "Size": 2048,
+                        "ETag": '"etag"',
+                        "LastModified": modified,
+                    }
+                    for key in keys
+                ],
+                "IsTruncated": False,
+            },
+            {"Bucket": "tmc", "Prefix": f"{self.inscription.uid}/recordings/"},
+        )
+
+    @mock.patch("tmc.tasks.async_task")
+    def test_creates_missing_recordings(self, async_task):
+        self.list_response(self.key(), self.key("99_unknown.mp4"))
+
+        self.assertEqual(reconcile_recordings(), (1, 0))
+
+        recording = Recording.objects.get()
+        async_task.assert_called_once_with(
+            "tmc.tasks.transcode_recording", recording.pk
+        )
+        self.inscription.refresh_from_db()
+        self.assertEqual(recording.recording.name, self.key())
+        self.assertEqual(recording.size, 2048)
+        self.assertTrue(recording.is_complete)
+        self.assertTrue(self.inscription.has_recordings)
+
+    @mock.patch("tmc.tasks.async_task")
+    def test_changed_object_is_transcoded_again(self, async_task):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key("01_etude.mov"),
+            is_complete=True,
+            etag="old",
+            preview=f"{self.inscription.uid}/previews/01_etude.mp4",
+            poster=f"{self.inscription.uid}/previews/01_etude.jpg",
+        )
+        self.list_response(self.key())
+
+        reconcile_recordings()
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.recording.name, self.key())
+        self.assertEqual((recording.preview.name, recording.poster.name), ("", ""))
+        async_task.assert_called_once_with(
+            "tmc.tasks.transcode_recording", recording.pk
+        )
+
+        # the same object again keeps its preview
+        Recording.objects.filter(pk=recording.pk).update(preview="preview.mp4")
+        async_task.reset_mock()
+        self.list_response(self.key())
+
+        reconcile_recordings()
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.preview.name, "preview.mp4")
+        async_task.assert_not_called()
+
+    def test_marks_vanished_recordings(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key(),
+            is_complete=True,
+            size=2048,
+        )
+        self.list_response()
+
+        self.assertEqual(reconcile_recordings([self.inscription.pk]), (0, 1))
+
+        recording.refresh_from_db()
+        self.assertFalse(recording.is_complete)
+        self.assertIsNone(recording.size)
+
+
+REGIONAL_BACKENDS = {
+    "asia": {
+        "bucket": "tmc-asia",
+        "region_name": "ap-southeast-1",
+        "endpoint_url": "https://s3.ap-southeast-1.amazonaws.com",
+        "probe_url": "https://probe.ap-southeast-1.example.com",
+    },
+    "america": {
+        "bucket": "tmc-america",
+        "region_name": "us-west-2",
+        "endpoint_url": "https://s3.us-west-2.amazonaws.com",
+    },
+}
+
+
+@override_settings(
+    RECORDING_BACKENDS=REGIONAL_BACKENDS,
+    RECORDING_BACKEND_COUNTRIES={"CN": "asia"},
+    **S3_SETTINGS,
+)
+class StorageTest(TestCase):
+    def setUp(self):
+        _build_backend.cache_clear()
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.inscription = create_inscription(self.instrument)
+
+    def tearDown(self):
+        _build_backend.cache_clear()
+
+    def test_backends_are_built_once(self):
+        self.assertIs(get_backend(), get_backend("default"))
+        self.assertIs(get_backend("asia"), get_backend("asia"))
+        self.assertEqual(get_backend().bucket, "tmc")
+        self.assertEqual(get_backend("asia").bucket, "tmc-asia")
+        self.assertEqual(get_backend("asia").client.meta.region_name, "ap-southeast-1")
+
+        with override_settings(RECORDING_STORAGE="local"):
+            self.assertIsInstance(get_backend(), LocalBackend)
+        self.assertIsInstance(get_backend(), S3Backend)
+
+    def test_choose_backend(self):
+        self.assertEqual(choose_backend(self.inscription), "default")
+        self.assertEqual(choose_backend(self.inscription, "america"), "america")
+        self.assertEqual(choose_backend(self.inscription, "mars"), "default")
+
+        self.inscription.nationality = "CN"
+        self.assertEqual(choose_backend(self.inscription), "asia")
+        self.assertEqual(choose_backend(self.inscription, "default"), "default")
+        self.assertEqual(choose_backend(self.inscription, "mars"), "asia")
+
+    def test_probe_urls(self):
+        self.assertEqual(
+            probe_urls(),
+            {
+                "default": "http://localhost:9000",
+                "asia": "https://probe.ap-southeast-1.example.com",
+                "america": "https://s3.us-west-2.amazonaws.com",
+            },
+        )
+
+        with override_settings(RECORDING_PROBE_URL="https://probe.example.com"):
+            self.assertEqual(probe_urls()["default"], "https://probe.example.com")
+        with override_settings(RECORDING_BACKENDS={}):
+            self.assertEqual(probe_urls(), {})
+
+    @override_settings(AWS_S3_ENDPOINT_URL="")
+    def test_hint_needs_every_backend_probed(self):
+        # plain AWS has no endpoint url, the default bucket can't be measured
+        self.assertNotIn("default", probe_urls())
+        self.inscription.nationality = "CN"
+        self.assertEqual(choose_backend(self.inscription, "america"), "asia")
+        self.inscription.nationality = "CH"
+        self.assertEqual(choose_backend(self.inscription, "america"), "default")
+
+        with override_settings(RECORDING_PROBE_URL="https://probe.example.com"):
+            self.assertEqual(choose_backend(self.inscription, "america"), "america")
+
+
+class MultipartUploadTest(S3TestCase):
+    PART_SIZE = 16 * 1024 * 1024
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.inscription.user)
+        self.recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            upload_id="upload-1",
+            upload_backend="default",
+            expected_size=self.PART_SIZE + 1024,
+        )
+
+    def list_parts(self, *sizes, upload_id="upload-1"):
+        self.stubber.add_response(
+            "list_parts",
+            {
+                "Parts": [
+                    {"PartNumber": number, "ETag": f'"etag-{number}"', "Size": size}
+                    for number, size in sizes
+                ]
+            },
+            {"Bucket": "tmc", "Key": self.key(), "UploadId": upload_id},
+        )
+
+    def post(self, name, data):
+        return self.client.post(
+            reverse(name, args=(self.inscription.pk, self.requirement.pk)), data
+        )
+
+    def test_resume_lists_received_parts(self):
+        self.list_parts((1, self.PART_SIZE))
+
+        upload_id, parts = uploads.start_multipart(
+            get_backend(), self.recording, self.key(), resume="upload-1", size=2048
+        )
+
+        self.assertEqual((upload_id, parts), ("upload-1", [1]))
+        self.assertEqual(self.recording.expected_size, 2048)
+        self.stubber.assert_no_pending_responses()
+
+    def test_expired_upload_starts_over(self):
+        self.stubber.add_client_error(
+            "list_parts", "NoSuchUpload", http_status_code=404
+        )
+        self.stubber.add_response(
+            "abort_multipart_upload",
+            {},
+            {"Bucket": "tmc", "Key": self.key(), "UploadId": "upload-1"},
+        )
+        self.stubber.add_response(
+            "create_multipart_upload",
+            {"UploadId": "upload-2"},
+            {"Bucket": "tmc", "Key": self.key()},
+        )
+
+        upload_id, parts = uploads.start_multipart(
+            get_backend(), self.recording, self.key(), resume="upload-1"
+        )
+
+        self.assertEqual((upload_id, parts), ("upload-2", []))
+        self.assertEqual(self.recording.upload_id, "upload-2")
+        self.stubber.assert_no_pending_responses()
+
+    def test_part_urls_are_presigned_in_batches(self):
+        data = {"extension": "mp4", "upload_id": "upload-1", "parts": "3,4,5"}
+        response = self.post("tmc:upload_recording_parts", data)
+
+        urls = response.json()["urls"]
+        self.assertEqual(list(urls), ["3", "4", "5"])
+        self.assertIn("partNumber=4", urls["4"])
+        self.assertIn("uploadId=upload-1", urls["4"])
+
+        for parts in ("0", "1,x", f"{uploads.MAX_PARTS + 1}"):
+            response = self.post("tmc:upload_recording_parts", {**data, "parts": parts})
+            self.assertEqual(response.status_code, 400)
+        response = self.post(
+            "tmc:upload_recording_parts", {**data, "upload_id": "upload-2"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_requests_are_rejected(self):
+        requests = [
+            ("tmc:upload_recording_url", {"extension": "mp4", "size": "abc"}),
+            ("tmc:upload_recording_url", {"extension": "mp4", "size": -1}),
+            ("tmc:upload_recording_url", {"extension": "mp4", "size": 0}),
+            ("tmc:upload_recording_url", {"size": 10}),
+            ("tmc:upload_recording_parts", {"extension": "mp4", "parts": "1"}),
+            (
+                "tmc:upload_recording_parts",
+                {"extension": "mp4", "upload_id": "upload-1"},
+            ),
+            ("tmc:upload_recording_done", {"upload_id": "upload-1"}),
+            ("tmc:upload_recording_done", {"extension": "mp4", "upload_id": "other"}),
+        ]
+
+        for name, data in requests:
+            response = self.post(name, data)
+            self.assertEqual(response.status_code, 400, (name, data))
+            self.assertIn("error", response.json())
+
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.upload_id, "upload-1")
+        self.assertFalse(UploadAttempt.objects.exists())
+
+    @mock.patch("tmc.views.async_task")
+    def test_completion_sends_the_received_parts(self, async_task):
+        self.list_parts((1, self.PART_SIZE), (2, 1024))
+        self.stubber.add_response(
+            "complete_multipart_upload",
+            {},
+            {
+                "Bucket": "tmc",
+                "Key": self.key(),
+                "UploadId": "upload-1",
+                "MultipartUpload": {
+                    "Parts": [
+                        {"PartNumber": 1, "ETag": '"etag-1"'},
+                        {"PartNumber": 2, "ETag": '"etag-2"'},
+                    ]
+                },
+            },
+        )
+
+        response = self.post(
+            "tmc:upload_recording_done", {"extension": "mp4", "upload_id": "upload-1"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.upload_id, "")
+        self.assertEqual(self.recording.recording.name, self.key())
+        async_task.assert_called_once_with(
+            "tmc.tasks.verify_recording", self.recording.pk
+        )
+        self.stubber.assert_no_pending_responses()
+
+    @mock.patch("tmc.views.async_task")
+    def test_incomplete_parts_are_rejected(self, async_task):
+        self.list_parts((1, self.PART_SIZE), (3, 1024))
+        self.list_parts((1, self.PART_SIZE), (2, 512))
+
+        for _ in range(2):
+            response = self.post(
+                "tmc:upload_recording_done",
+                {"extension": "mp4", "upload_id": "upload-1"},
+            )
+            self.assertEqual(response.status_code, 400)
+
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.upload_id, "upload-1")
+        async_task.assert_not_called()
+        self.stubber.assert_no_pending_responses()
+
+    def test_verify_compares_the_announced_size(self):
+        self.recording.recording = self.key()
+        self.recording.upload_id = ""
+        self.recording.save()
+        self.stubber.add_response(
+            "head_object",
+            {"ContentLength": self.PART_SIZE, "ETag": '"abc-1"'},
+            {"Bucket": "tmc", "Key": self.key()},
+        )
+
+        verify_recording(self.recording.pk)
+
+        self.recording.refresh_from_db()
+        self.assertFalse(self.recording.is_complete)
+        self.assertEqual(self.recording.size, self.PART_SIZE)
+
+
+@override_settings(RECORDING_BACKENDS=REGIONAL_BACKENDS)
+class UploadViewTest(S3TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.inscription.user)
+
+    def post_json(self, name, body):
+        return self.client.post(
+            reverse(name, args=(self.inscription.pk,)),
+            body,
+            content_type="application/json",
+        )
+
+    def test_resume_stays_on_its_backend(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            upload_id="upload-1",
+            upload_backend="default",
+        )
+        uploads.record_started(
+            self.inscription, {self.requirement.pk: 20 * 1024 * 1024}
+        )
+        self.stubber.add_response(
+            "list_parts",
+            {"Parts": [{"PartNumber": 1, "ETag": '"a"', "Size": 16 * 1024 * 1024}]},
+            {"Bucket": "tmc", "Key": self.key(), "UploadId": "upload-1"},
+        )
+
+        response = self.post_json(
+            "tmc:upload_recording_urls",
+            {
+                "backend": "asia",
+                "files": [
+                    {
+                        "requirement": self.requirement.pk,
+                        "extension": "mp4",
+                        "size": 20 * 1024 * 1024,
+                        "upload_id": "upload-1",
+                    }
+                ],
+            },
+        )
+
+        upload = response.json()["uploads"][str(self.requirement.pk)]
+        self.assertEqual(upload["backend"], "default")
+        self.assertEqual(upload["upload_id"], "upload-1")
+        self.assertEqual(upload["parts"], [1])
+        self.assertEqual(list(upload["urls"]), ["2"])
+        recording.refresh_from_db()
+        self.assertEqual(recording.upload_backend, "default")
+        self.assertEqual(recording.upload_id, "upload-1")
+        # the attempt goes on instead of being counted as a failure
+        self.assertEqual(
+            list(UploadAttempt.objects.values_list("status", flat=True)),
+            [UploadAttempt.STARTED],
+        )
+        self.stubber.assert_no_pending_responses()
+
+    def test_new_upload_follows_the_hint(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            upload_id="upload-1",
+            upload_backend="default",
+        )
+        asia = Stubber(get_backend("asia").client)
+        asia.activate()
+        self.addCleanup(asia.deactivate)
+        self.stubber.add_response(
+            "abort_multipart_upload",
+            {},
+            {"Bucket": "tmc", "Key": self.key(), "UploadId": "upload-1"},
+        )
+        asia.add_response(
+            "create_multipart_upload",
+            {"UploadId": "upload-2"},
+            {"Bucket": "tmc-asia", "Key": self.key(), "ContentType": "video/mp4"},
+        )
+
+        response = self.client.post(
+            reverse(
+                "tmc:upload_recording_url",
+                args=(self.inscription.pk, self.requirement.pk),
+            ),
+            {
+                "extension": "mp4",
+                "size": 1024,
+                "content_type": "video/mp4",
+                "backend": "asia",
+            },
+        )
+
+        self.assertEqual(response.json()["backend"], "asia")
+        self.assertEqual(response.json()["upload_id"], "upload-2")
+        recording.refresh_from_db()
+        self.assertEqual(recording.upload_backend, "asia")
+        self.assertEqual(recording.upload_id, "upload-2")
+        self.stubber.assert_no_pending_responses()
+        asia.assert_no_pending_responses()
+
+    def test_malformed_payloads_are_rejected(self):
+        file = {"requirement": self.requirement.pk, "extension": "mp4", "size": 10}
+        payloads = [
+            {},
+            {"files": "abc"},
+            {"files": [{"extension": "mp4"}]},
+            {"files": [{**file, "requirement": "abc"}]},
+            {"files": [{**file, "size": "big"}]},
+            {"files": [{**file, "size": -1}]},
+            {"files": [{**file, "size": 0}]},
+            {"files": [{**file, "extension": "exe"}]},
+            {"files": [{"requirement": self.requirement.pk, "size": 10}]},
+            {"files": [{"requirement": self.requirement.pk}]},
+        ]
+
+        for name in ("tmc:upload_recording_urls", "tmc:upload_recordings_done"):
+            for payload in payloads:
+                response = self.post_json(name, payload)
+                self.assertEqual(response.status_code, 400, (name, payload))
+                self.assertIn("error", response.json())
+
+        response = self.post_json("tmc:upload_recordings_failed", {"files": [{}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recording.objects.exists())
+        # failure reports don't name the file
+        response = self.post_json(
+            "tmc:upload_recordings_failed",
+            {"files": [{"requirement": self.requirement.pk, "error": "offline"}]},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch("tmc.views.async_task")
+    def test_completion_failures_are_reported_per_file(self, async_task):
+        sonata = RequiredRecording.objects.create(
+            name="Sonata", slug="sonata", nr=2, instrument=self.instrument
+        )
+        broken = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            upload_id="upload-1",
+            upload_backend="default",
+        )
+        uploads.record_started(
+            self.inscription, {self.requirement.pk: 10, sonata.pk: 10}
+        )
+        self.stubber.add_client_error(
+            "list_parts", "NoSuchUpload", http_status_code=404
+        )
+
+        response = self.post_json(
+            "tmc:upload_recordings_done",
+            {
+                "files": [
+                    {
+                        "requirement": self.requirement.pk,
+                        "extension": "mp4",
+                        "upload_id": "upload-1",
+                    },
+                    {"requirement": sonata.pk, "extension": "mp4"},
+                ]
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()["urls"]), [str(sonata.pk)])
+        self.assertIn(
+            "NoSuchUpload", response.json()["failed"][str(self.requirement.pk)]
+        )
+        broken.refresh_from_db()
+        self.assertEqual(broken.upload_id, "upload-1")
+        self.assertEqual(broken.recording.name, "")
+        self.assertEqual(
+            Recording.objects.get(requirement=sonata).recording.name,
+            self.key("02_sonata.mp4"),
+        )
+        self.assertEqual(
+            dict(UploadAttempt.objects.values_list("requirement", "status")),
+            {
+                self.requirement.pk: UploadAttempt.FAILED,
+                sonata.pk: UploadAttempt.COMPLETED,
+            },
+        )
+        async_task.assert_called_once()
+
+    def test_bulk_upsert_updates_existing_rows(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key(),
+            upload_id="upload-1",
+            size=10,
+        )
+
+        bulk_upsert_recordings(
+            [
+                Recording(
+                    uploader=self.inscription,
+                    requirement=self.requirement,
+                    recording=self.key("01_etude.mov"),
+                    upload_id="",
+                    backend="asia",
+                )
+            ],
+            ["recording", "upload_id", "backend"],
+        )
+
+        updated = Recording.objects.get()
+        self.assertEqual(updated.pk, recording.pk)
+        self.assertEqual(updated.recording.name, self.key("01_etude.mov"))
+        self.assertEqual(updated.upload_id, "")
+        self.assertEqual(updated.backend, "asia")
+        self.assertEqual(updated.size, 10)
+
+
+def token(url):
+    return resolve(urlsplit(url).path).kwargs["token"]
+
+
+@override_settings(
+    RECORDING_STORAGE="local",
+    SENDFILE_HEADER="X-Accel-Redirect",
+    SENDFILE_URL="/protected/",
+)
+class LocalStorageTest(TestCase):
+    """The signed urls of the local storage and the views that answer them."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        media_root = override_settings(MEDIA_ROOT=self.root)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        _build_backend.cache_clear()
+        self.addCleanup(_build_backend.cache_clear)
+        self.backend = get_backend()
+
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.inscription = create_inscription(self.instrument)
+        self.requirement = RequiredRecording.objects.create(
+            name="Etude", slug="etude", nr=1, instrument=self.instrument
+        )
+
+    def key(self, name="01_etude.mp4"):
+        return f"{self.inscription.uid}/recordings/{name}"
+
+    def put(self, url, content=b"video"):
+        return self.client.put(
+            urlsplit(url).path, content, content_type="application/octet-stream"
+        )
+
+    def get(self, url):
+        return self.client.get(urlsplit(url).path)
+
+    def test_upload_and_send_file(self):
+        self.assertEqual(
+            self.put(self.backend.presign_put(self.key())).status_code, 200
+        )
+
+        response = self.get(self.backend.presign_get(self.key()))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected/{self.key()}")
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response.content, b"")
+
+        with override_settings(SENDFILE_HEADER=""):
+            response = self.get(self.backend.presign_get(self.key()))
+            self.assertEqual(b"".join(response.streaming_content), b"video")
+
+    def test_multipart_upload(self):
+        upload_id = self.backend.create_multipart(self.key())
+        for number, content in ((2, b"part two"), (1, b"part one, ")):
+            url = self.backend.presign_part(self.key(), upload_id, number)
+            self.assertEqual(self.put(url, content).status_code, 200)
+
+        parts = self.backend.list_parts(self.key(), upload_id)
+        self.assertEqual([part["PartNumber"] for part in parts], [1, 2])
+        self.backend.complete_multipart(self.key(), upload_id, parts)
+
+        with open(self.backend.path(self.key()), "rb") as f:
+            self.assertEqual(f.read(), b"part one, part two")
+        self.assertFalse(os.path.exists(self.backend.upload_path(upload_id)))
+
+    def test_tokens_only_allow_their_purpose(self):
+        self.put(self.backend.presign_put(self.key()))
+        read_token = token(self.backend.presign_get(self.key()))
+        write_token = token(self.backend.presign_put(self.key()))
+
+        response = self.put(reverse("tmc:recording_upload", args=(read_token,)))
+        self.assertEqual(response.status_code, 403)
+        response = self.get(reverse("tmc:recording_file", args=(write_token,)))
+        self.assertEqual(response.status_code, 404)
+        response = self.put(reverse("tmc:recording_file", args=(read_token,)))
+        self.assertEqual(response.status_code, 405)
+
+        with open(self.backend.path(self.key()), "rb") as f:
+            self.assertEqual(f.read(), b"video")
+
+    def test_tampered_and_expired_tokens(self):
+        self.put(self.backend.presign_put(self.key()))
+        read_token = token(self.backend.presign_get(self.key()))
+        write_token = token(self.backend.presign_put(self.key()))
+
+        tampered = signing.dumps({"key": self.key("02_other.mp4")}, salt="other")
+        self.assertEqual(
+            self.get(reverse("tmc:recording_file", args=(tampered,))).status_code, 404
+        )
+        self.assertEqual(
+            self.put(reverse("tmc:recording_upload", args=(tampered,))).status_code,
+            403,
+        )
+        # another payload under the signature of a valid token
+        forged = f"{tampered.split(':')[0]}:{read_token.split(':', 1)[1]}"
+        self.assertEqual(
+            self.get(reverse("tmc:recording_file", args=(forged,))).status_code, 404
+        )
+
+        later = time.time() + self.backend.querystring_expire + 1
+        with mock.patch("django.core.signing.time") as clock:
+            clock.time.return_value = later
+            response = self.get(reverse("tmc:recording_file", args=(read_token,)))
+            self.assertEqual(response.status_code, 404)
+            response = self.put(reverse("tmc:recording_upload", args=(write_token,)))
+            self.assertEqual(response.status_code, 403)
+
+    def test_keys_outside_the_recordings_are_rejected(self):
+        for key in ("../settings.py", "/etc/passwd", f"{self.inscription.uid}/../x"):
+            with self.assertRaises(SuspiciousFileOperation):
+                self.backend.path(key)
+
+        response = self.put(self.backend.presign_put("../../escaped.mp4"))
+        self.assertEqual(response.status_code, 400)
+        response = self.get(self.backend.presign_get("../settings.py"))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "..", "escaped.mp4")))
+
+        other = create_inscription(self.instrument, "other@example.com")
+        for key in (f"{other.uid}/recordings/01_etude.mp4", f"{self.key()}/../../x"):
+            with self.assertRaises(uploads.UploadError):
+                uploads.presign_read(self.inscription, self.backend, key)
+
+    @mock.patch("tmc.views.async_task")
+    def test_upload_views_only_accept_recording_extensions(self, async_task):
+        self.client.force_login(self.inscription.user)
+
+        for extension in ("mp4/../../../escaped", "php", ""):
+            response = self.client.post(
+                reverse(
+                    "tmc:upload_recording_url",
+                    args=(self.inscription.pk, self.requirement.pk),
+                ),
+                {"extension": extension, "size": 10},
+            )
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(
+                reverse(
+                    "tmc:upload_recording_done",
+                    args=(self.inscription.pk, self.requirement.pk),
+                ),
+                {"extension": extension},
+            )
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            reverse(
+                "tmc:upload_recording_done",
+                args=(self.inscription.pk, self.requirement.pk),
+            ),
+            {"extension": "MP4"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Recording.objects.get().recording.name, self.key())
+        async_task.assert_called_once()
+        self.assertFalse(UploadAttempt.objects.exists())
+
+
+class TranscodeRecordingTest(S3TestCase):
+    def setUp(self):
+        super().setUp()
+        self.recording = Recording.objects.create(
+            uploader=self.inscription,
+            requirement=self.requirement,
+            recording=self.key(),
+            is_complete=True,
+            etag="abc-1",
+        )
+
+    def preview(self, extension):
+        return f"{self.inscription.uid}/previews/01_etude.{extension}"
+
+    @mock.patch.object(S3Backend, "upload")
+    @mock.patch("tmc.tasks.subprocess.run")
+    def test_creates_preview_and_poster(self, run, upload):
+        transcode_recording(self.recording.pk)
+
+        command = run.call_args_list[0].args[0]
+        self.assertIn(self.key(), command[command.index("-i") + 1])
+        self.assertEqual(command[command.index("-vf") + 1], "scale=-2:'min(720,ih)'")
+        self.assertEqual(command[command.index("-movflags") + 1], "+faststart")
+        poster = run.call_args_list[1].args[0]
+        self.assertEqual(poster[poster.index("-i") + 1], command[-1])
+
+        self.assertEqual(
+            [(call.args[1], call.args[2]) for call in upload.call_args_list],
+            [(self.preview("mp4"), "video/mp4"), (self.preview("jpg"), "image/jpeg")],
+        )
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.preview.name, self.preview("mp4"))
+        self.assertEqual(self.recording.poster.name, self.preview("jpg"))
+
+    @mock.patch("tmc.views.async_task")
+    def test_new_upload_clears_preview(self, async_task):
+        self.recording.preview = self.preview("mp4")
+        self.recording.poster = self.preview("jpg")
+        self.recording.save()
+        self.client.force_login(self.inscription.user)
+
+        self.client.post(
+            reverse(
+                "tmc:upload_recording_done",
+                args=(self.inscription.pk, self.requirement.pk),
+            ),
+            {"extension": "mp4"},
+        )
+
+        self.recording.refresh_from_db()
+        self.assertEqual(self.recording.preview.name, "")
+        self.assertEqual(self.recording.poster.name, "")
+        self.assertFalse(self.recording.is_complete)
+
+    def test_playlist_prefers_preview(self):
+        other = create_inscription(self.instrument, "other@example.com")
+        Recording.objects.create(
+            uploader=other,
+            requirement=self.requirement,
+            recording=f"{other.uid}/recordings/01_etude.mp4",
+            is_complete=True,
+        )
+        self.recording.preview = self.preview("mp4")
+        self.recording.save()
+
+        response = download_playlist.__wrapped__(None, None, Inscription.objects.all())
+        playlist = b"".join(response.streaming_content).decode()
+
+        self.assertIn(f"/{self.preview('mp4')}?", playlist)
+        self.assertNotIn(f"/{self.key()}?", playlist)
+        self.assertIn(f"/{other.uid}/recordings/01_etude.mp4?", playlist)
+
+
+class RecordingManifestTest(S3TestCase):
+    def test_single_query_for_all_recordings(self):
+        sonata = RequiredRecording.objects.create(
+            name="Sonata", slug="sonata", nr=2, instrument=self.instrument
+        )
+        inscriptions = [self.inscription] + [
+            create_inscription(self.instrument, f"contestant{i}@example.com")
+            for i in range(3)
+        ]
+        for inscription in inscriptions:
+            for requirement in (self.requirement, sonata):
+                Recording.objects.create(
+                    uploader=inscription,
+                    requirement=requirement,
+                    recording=f"{inscription.uid}/recordings/{requirement.nr:02}.mp4",
+                    preview=f"{inscription.uid}/previews/{requirement.nr:02}.mp4",
+                )
+        Recording.objects.create(
+            uploader=self.inscription,
+            requirement=RequiredRecording.objects.create(
+                name="Scales", slug="scales", nr=3, instrument=self.instrument
+            ),
+        )
+
+        with self.assertNumQueries(1):
+            rows = list(recording_manifest(Recording.objects.all(), playback=True))
+
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(
+            [row["target"] for row in rows],
+            sorted(
+                f"{inscription.secret_id}/{nr}"
+                for inscription in inscriptions
+                for nr in ("01_etude.mp4", "02_sonata.mp4")
+            ),
+        )
+        self.assertTrue(all("/previews/" in row["url"] for row in rows))
+
+
+class StreamZipTest(TestCase):
+    def entries(self, count, chunks, chunk_size):
+        for i in range(count):
+            yield f"{i:04}/01_etude.mp4", (
+                bytes([i]) * chunk_size for _ in range(chunks)
+            )
+
+    def test_archive_is_readable(self):
+        data = b"".join(stream_zip(self.entries(3, 4, 1000)))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+            self.assertEqual(archive.read("0002/01_etude.mp4"), bytes([2]) * 4000)
+
+    def test_memory_is_bounded_by_chunk_size(self):
+        chunk_size = 256 * 1024
+        total = 0
+
+        tracemalloc.start()
+        try:
+            # 64 MiB in total, never held at once
+            for piece in stream_zip(self.entries(4, 64, chunk_size)):
+                total += len(piece)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertGreater(total, 64 * 1024 * 1024)
+        self.assertLess(peak, 4 * chunk_size)
+
+
+class RepertoireExportTest(TestCase):
+    def test_fixed_number_of_queries(self):
+        queryset = create_selections(40)
+
+        # columns, selections with inscription/set list/round and their pieces
+        with self.assertNumQueries(3):
+            rows = list(repertoire_rows(queryset))
+
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0][4:], [f"Round {i} - Set list" for i in range(1, 5)])
+        self.assertEqual(rows[1][3], "00001")
+        self.assertEqual(rows[1][4], "Piece 1,Piece 2,Piece 3")
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+    RECORDING_STORAGE="local",
+)
+class AdminJobTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_root_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_root_settings.enable()
+        self.addCleanup(media_root_settings.disable)
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        self.inscription = create_inscription(Instrument.objects.create(name="Piano"))
+
+    def run_action(self, action, **data):
+        with mock.patch("tmc.jobs.async_task") as async_task:
+            response = self.client.post(
+                reverse("admin:tmc_inscription_changelist"),
+                {"action": action, "_selected_action": [self.inscription.pk], **data},
+            )
+        job = AdminJob.objects.get()
+        self.assertRedirects(
+            response, reverse("admin:tmc_adminjob_progress", args=(job.pk,))
+        )
+        async_task.assert_called_once_with("tmc.jobs.run_job", job.pk)
+
+        run_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_export_runs_in_job(self):
+        job = self.run_action("export_admin_action", file_format="0")
+
+        self.assertEqual(job.status, AdminJob.DONE)
+        self.assertEqual(job.pks, [str(self.inscription.pk)])
+        self.assertIn(b"Schumann", job.result.read())
+
+        status = self.client.get(
+            reverse("admin:tmc_adminjob_status", args=(job.pk,))
+        ).json()
+        self.assertTrue(status["finished"])
+        self.assertEqual(
+            status["download"],
+            reverse("admin:tmc_adminjob_download", args=(job.pk,)),
+        )
+
+
+class ResourceExportTest(TestCase):
+    def test_rows_match_import_export(self):
+        instrument = Instrument.objects.create(name="Piano")
+        for i in range(3):
+            create_inscription(instrument, f"contestant{i}@example.com")
+        queryset = Inscription.objects.order_by("email")
+
+        with self.assertNumQueries(1):
+            content = "".join(table_csv(resource_rows(InscriptionResource(), queryset)))
+
+        self.assertEqual(content, InscriptionResource().export(queryset).csv)
+
+
+class PersonImportTest(TestCase):
+    headers = ["given_name", "surname", "email", "phone", "instrument", "gender"]
+    headers += ["date_of_birth", "nationality", "mother_tongue"]
+    headers += ["language_of_correspondence", "education", "occupation"]
+    headers += ["emergency_contact", "emergency_phone", "accomodation_needed"]
+    headers += ["is_smoker", "vegetarian"]
+
+    def row(self, email, instrument, nationality="CH"):
+        return (
+            ["Clara", "Schumann", email, "+41791234567", instrument.pk, "f"]
+            + ["2000-09-13", nationality, "German", "en", "-", "-", "-", "+41791234567"]
+            + [0, 0, 0]
+        )
+
+    @mock.patch("tmc.imports.async_task")
+    def test_creates_users_in_bulk(self, async_task):
+        instrument = Instrument.objects.create(name="Piano")
+        create_inscription(instrument, "taken@example.com")
+        get_user_model().objects.create(username="known@example.com")
+        dataset = tablib.Dataset(
+            self.row("new@example.com", instrument),
+            self.row("known@example.com", instrument),
+            self.row("new@example.com", instrument),
+            self.row("taken@example.com", instrument),
+            self.row("other@example.com", instrument, nationality="XX"),
+            headers=self.headers,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = InscriptionResource(base_url="http://testserver").import_data(
+                dataset, use_transactions=True
+            )
+
+        self.assertEqual(result.totals["new"], 2)
+        self.assertEqual([row.number for row in result.invalid_rows], [3, 4, 5])
+        self.assertIn("nationality", result.invalid_rows[2].error_dict)
+        known = Inscription.objects.get(email="known@example.com")
+        self.assertEqual(known.user.username, "known@example.com")
+        self.assertEqual(get_user_model().objects.count(), 3)
+        async_task.assert_called_once()
+
+    def test_count_rows_of_unsized_sheets(self):
+        workbook = Workbook()
+        for row in [self.headers] + [["-"] * len(self.headers)] * 3:
+            workbook.active.append(row)
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as f:
+            workbook.save(f.name)
+
+            self.assertEqual(count_rows(f.name), 3)
+            with mock.patch.object(
+                ReadOnlyWorksheet, "max_row", new_callable=mock.PropertyMock
+            ) as max_row:
+                max_row.return_value = None
+                self.assertEqual(count_rows(f.name), 3)
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class InscriptionChangelistTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.requirements = [
+            RequiredRecording.objects.create(
+                name=f"Piece {nr}",
+                slug=f"piece-{nr}",
+                nr=nr,
+                instrument=self.instrument,
+            )
+            for nr in range(2)
+        ]
+
+    def add_inscription(self, recordings):
+        inscription = create_inscription(
+            self.instrument, f"contestant{Inscription.objects.count()}@example.com"
+        )
+        for requirement in self.requirements[:recordings]:
+            Recording.objects.create(
+                uploader=inscription,
+                requirement=requirement,
+                recording="a.mp4",
+                is_complete=True,
+            )
+        return inscription
+
+    def get_changelist(self, **params):
+        return self.client.get(reverse("admin:tmc_inscription_changelist"), params)
+
+    def column(self, name):
+        # the changelist numbers its columns after the checkbox of the actions
+        return admin.site._registry[Inscription].list_display.index(name) + 1
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_inscription(recordings=1)
+        with CaptureQueriesContext(connection) as one:
+            self.get_changelist()
+
+        for recordings in range(3):
+            self.add_inscription(recordings)
+        with self.assertNumQueries(len(one)):
+            response = self.get_changelist(o=self.column("uploaded_recordings"))
+
+        uploaded = [row.recording_count for row in response.context["cl"].result_list]
+        self.assertEqual(uploaded, [0, 1, 1, 2])
+
+    def test_filter_by_recordings(self):
+        self.add_inscription(recordings=0)
+        incomplete = self.add_inscription(recordings=1)
+        self.add_inscription(recordings=2)
+
+        response = self.get_changelist(recordings="incomplete")
+
+        self.assertEqual(list(response.context["cl"].result_list), [incomplete])
+
+
+class UploadAttemptTest(TestCase):
+    def setUp(self):
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.inscription = create_inscription(self.instrument)
+        self.etude = RequiredRecording.objects.create(
+            name="Etude", slug="etude", nr=1, instrument=self.instrument
+        )
+        self.sonata = RequiredRecording.objects.create(
+            name="Sonata", slug="sonata", nr=2, instrument=self.instrument
+        )
+
+    def attempts(self):
+        return list(
+            UploadAttempt.objects.order_by("pk").values_list(
+                "requirement", "status", "error"
+            )
+        )
+
+    def test_lifecycle(self):
+        etude, sonata = self.etude.pk, self.sonata.pk
+        uploads.record_started(self.inscription, {etude: 10, sonata: 20})
+        # the etude is resumed, the sonata started over with another file
+        uploads.record_started(
+            self.inscription, {etude: 10, sonata: 30}, resumed=[etude]
+        )
+        self.assertEqual(
+            self.attempts(),
+            [
+                (etude, UploadAttempt.STARTED, ""),
+                (sonata, UploadAttempt.FAILED, "restarted"),
+                (sonata, UploadAttempt.STARTED, ""),
+            ],
+        )
+
+        uploads.record_finished(self.inscription, [etude])
+        uploads.record_finished(self.inscription, [sonata], "x" * 200)
+        # resuming an upload without an open attempt starts a new one
+        uploads.record_started(self.inscription, {sonata: 30}, resumed=[sonata])
+
+        self.assertEqual(
+            self.attempts(),
+            [
+                (etude, UploadAttempt.COMPLETED, ""),
+                (sonata, UploadAttempt.FAILED, "restarted"),
+                (sonata, UploadAttempt.FAILED, "x" * 120),
+                (sonata, UploadAttempt.STARTED, ""),
+            ],
+        )
+        self.assertIsNotNone(UploadAttempt.objects.get(status=1).finished)
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_report(self):
+        now = timezone.now()
+        uploads.record_started(self.inscription, {self.etude.pk: 2 * 1024 * 1024})
+        uploads.record_started(self.inscription, {self.sonata.pk: 0})
+        uploads.record_finished(self.inscription, [self.sonata.pk], "error")
+        UploadAttempt.objects.filter(requirement=self.etude).update(
+            status=UploadAttempt.COMPLETED,
+            started=now - datetime.timedelta(seconds=4),
+            finished=now,
+        )
+        old = UploadAttempt.objects.create(
+            inscription=self.inscription, requirement=self.etude
+        )
+        UploadAttempt.objects.filter(pk=old.pk).update(
+            started=now - datetime.timedelta(days=40)
+        )
+
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+
+        for days in ("abc", "", "-5"):
+            response = self.client.get(
+                reverse("admin:tmc_uploadattempt_report"), {"days": days}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["days"], 1)
+
+        response = self.client.get(
+            reverse("admin:tmc_uploadattempt_report"), {"days": "abc"}
+        )
+        self.assertEqual(response.context["days"], 30)
+        [row] = response.context["rows"]
+        self.assertEqual(row["nationality"], "CH")
+        self.assertEqual(
+            (row["attempts"], row["completed"], row["failed"], row["open"]),
+            (2, 1, 1, 0),
+        )
+        self.assertEqual(row["average_duration"], datetime.timedelta(seconds=4))
+        self.assertAlmostEqual(row["throughput"], 0.5)
+
+        response = self.client.get(
+            reverse("admin:tmc_uploadattempt_report"), {"days": "60"}
+        )
+        self.assertEqual(sum(row["attempts"] for row in response.context["rows"]), 3)
+
+
+class ProgressTest(TestCase):
+    def setUp(self):
+        self.inscription = create_inscription(Instrument.objects.create(name="Piano"))
+        self.requirement = RequiredRecording.objects.create(
+            name="Etude", slug="etude", nr=1, instrument=self.inscription.instrument
+        )
+
+    def test_recordings_are_counted(self):
+        recording = Recording.objects.create(
+            uploader=self.inscription, requirement=self.requirement, is_complete=True
+        )
+        self.inscription.refresh_from_db()
+        self.assertEqual(self.inscription.recording_count, 1)
+        self.assertTrue(self.inscription.has_recordings)
+
+        recording.delete()
+        self.inscription.refresh_from_db()
+        self.assertEqual(self.inscription.recording_count, 0)
+        self.assertFalse(self.inscription.has_recordings)
+
+    def test_documents_are_flagged_on_save(self):
+        self.inscription.photo = "photos/a.jpg"
+        self.inscription.passport = "documents/a.pdf"
+        self.inscription.save(update_fields=["photo", "passport"])
+        self.inscription.refresh_from_db()
+        self.assertTrue(self.inscription.has_documents)
+
+    def test_rebuild(self):
+        Recording.objects.bulk_create(
+            [
+                Recording(
+                    uploader=self.inscription,
+                    requirement=self.requirement,
+                    is_complete=True,
+                )
+            ]
+        )
+        Inscription.objects.update(has_documents=True)
+
+        call_command("rebuild_progress", stdout=io.StringIO())
+
+        self.inscription.refresh_from_db()
+        self.assertEqual(self.inscription.recording_count, 1)
+        self.assertTrue(self.inscription.has_recordings)
+        self.assertFalse(self.inscription.has_documents)
+
+
+class SecretIdAllocationTest(TestCase):
+    def setUp(self):
+        instrument = Instrument.objects.create(name="Piano")
+        for i in range(5):
+            create_inscription(instrument, f"contestant{i}@example.com")
+
+    def test_dense_unique_and_reproducible(self):
+        Inscription.objects.filter(email="contestant0@example.com").update(
+            secret_id="0002"
+        )
+        queryset = Inscription.objects.exclude(email="contestant0@example.com")
+
+        with self.assertNumQueries(7):
+            allocation = allocate_secret_ids(queryset, seed="seed")
+
+        self.assertEqual(
+            sorted(queryset.values_list("secret_id", flat=True)),
+            ["0001", "0003", "0004", "0005"],
+        )
+        self.assertEqual(replay(allocation), allocation.assignments)
+        self.assertEqual(
+            allocate_secret_ids(queryset, seed="seed").assignments,
+            allocation.assignments,
+        )
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class RecordingChangelistTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        instrument = Instrument.objects.create(name="Piano")
+        requirement = RequiredRecording.objects.create(
+            name="Etude", slug="etude", nr=1, instrument=instrument
+        )
+        self.recordings = [
+            Recording.objects.create(
+                uploader=create_inscription(instrument, f"contestant{i}@example.com"),
+                requirement=requirement,
+            )
+            for i in range(3)
+        ]
+
+    def test_filter_by_uploader_with_autocomplete(self):
+        uploader = self.recordings[0].uploader
+        response = self.client.get(
+            reverse("admin:tmc_recording_changelist"),
+            {"uploader__uid__exact": uploader.pk},
+        )
+
+        self.assertEqual(list(response.context["cl"].result_list), self.recordings[:1])
+        # only the selected inscription is rendered as an option
+        self.assertContains(response, f'<option value="{uploader.pk}" selected>')
+        for recording in self.recordings[1:]:
+            self.assertNotContains(response, recording.uploader.pk)
+        self.assertContains(response, "admin/js/autocomplete.js")
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class InscriptionChangeFormTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        self.instrument = Instrument.objects.create(name="Piano")
+
+    def create_recordings(self, inscription, count):
+        for nr in range(count):
+            Recording.objects.create(
+                uploader=inscription,
+                requirement=RequiredRecording.objects.create(
+                    name=f"Etude {nr}",
+                    slug=f"etude-{nr}",
+                    nr=nr,
+                    instrument=self.instrument,
+                ),
+                recording=f"{inscription.pk}/recordings/{nr:02}_etude-{nr}.mp4",
+            )
+
+    def test_recordings_are_loaded_separately(self):
+        empty = create_inscription(self.instrument, "empty@example.com")
+        url = reverse("admin:tmc_inscription_change", args=(empty.pk,))
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as expected:
+            self.client.get(url)
+
+        inscription = create_inscription(self.instrument)
+        self.create_recordings(inscription, 25)
+
+        with mock.patch("tmc.admin.get_backend") as get_backend:
+            with self.assertNumQueries(len(expected)):
+                self.client.get(
+                    reverse("admin:tmc_inscription_change", args=(inscription.pk,))
+                )
+            with self.assertNumQueries(5):
+                response = self.client.get(
+                    reverse("admin:tmc_inscription_recordings", args=(inscription.pk,)),
+                    {"page": 2},
+                )
+        get_backend.assert_not_called()
+        self.assertEqual(len(response.context["page"]), 5)
+
+    def test_url_is_signed_when_opened(self):
+        inscription = create_inscription(self.instrument)
+        self.create_recordings(inscription, 1)
+        recording = Recording.objects.get()
+
+        with mock.patch("tmc.admin.get_backend") as get_backend:
+            get_backend.return_value.presign_get.return_value = "https://signed"
+            response = self.client.get(
+                reverse(
+                    "admin:tmc_inscription_open_recording",
+                    args=(inscription.pk, recording.pk),
+                )
+            )
+
+        self.assertRedirects(response, "https://signed", fetch_redirect_response=False)
+        get_backend.return_value.presign_get.assert_called_once_with(
+            recording.recording.name
+        )
+
+
+def create_host(email="host@example.com", single_rooms=1, double_rooms=0):
+    user = get_user_model().objects.create(username=email, email=email)
+
+    return HostFamily.objects.create(
+        user=user,
+        given_name="Robert",
+        surname="Schumann",
+        email=email,
+        phone="+41791234567",
+        single_rooms=single_rooms,
+        double_rooms=double_rooms,
+        provides_breakfast=True,
+        has_own_bathroom=False,
+        has_wifi=True,
+        provides_transport=False,
+        practice_allowed=True,
+        smoking_allowed=False,
+    )
+
+
+class GuestAssignmentTest(TestCase):
+    def setUp(self):
+        instrument = Instrument.objects.create(name="Piano")
+        self.guests = []
+        for i in range(3):
+            guest = create_inscription(instrument, f"contestant{i}@example.com")
+            guest.is_qualified = guest.accomodation_needed = True
+            guest.save()
+            self.guests.append(guest)
+
+    def test_assign_with_one_update(self):
+        host = create_host(single_rooms=1, double_rooms=1)
+        Inscription.objects.filter(pk=self.guests[0].pk).update(host_family=host)
+
+        with self.assertNumQueries(1):
+            assign_guests(host, self.guests[1:])
+
+        self.assertEqual(set(host.inscription_set.all()), set(self.guests[1:]))
+
+    def test_guests_must_fit_and_be_free(self):
+        host = create_host()
+        other = create_host("other@example.com")
+        assign_guests(other, self.guests[:1])
+
+        with self.assertRaisesMessage(ValidationError, "another host"):
+            lock_guests(host, self.guests[:1], host.number_of_rooms())
+        with self.assertRaisesMessage(ValidationError, "max: 1"):
+            lock_guests(host, self.guests[1:], host.number_of_rooms())
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_autocomplete_offers_guests_without_host(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        assign_guests(create_host(), self.guests[:1])
+
+        response = self.client.get(
+            reverse("admin:tmc_hostfamily_guests"),
+            {
+                "app_label": "tmc",
+                "model_name": "hostfamily",
+                "field_name": "inscription",
+                "term": "Clara",
+            },
+        )
+
+        self.assertEqual(
+            {result["id"] for result in response.json()["results"]},
+            {str(guest.pk) for guest in self.guests[1:]},
+        )
+
+
+class HostMatchingTest(TestCase):
+    def setUp(self):
+        self.instrument = Instrument.objects.create(name="Piano")
+
+    def create_guest(self, email, **fields):
+        guest = create_inscription(self.instrument, email)
+        for name, value in dict(
+            is_qualified=True, accomodation_needed=True, **fields
+        ).items():
+            setattr(guest, name, value)
+        guest.save()
+        return guest
+
+    def test_constraints_and_capacity(self):
+        smoker = self.create_guest("smoker@example.com", is_smoker=True)
+        man = self.create_guest("man@example.com", gender="m")
+        women = [self.create_guest(f"woman{i}@example.com") for i in range(3)]
+        host = create_host(single_rooms=1, double_rooms=1)
+        host.preferred_gender = "f"
+        host.save()
+
+        with CaptureQueriesContext(connection) as context:
+            result = assign_hosts()
+
+        updates = [q for q in context.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(result.placed, 3)
+        self.assertEqual(set(host.inscription_set.all()), set(women))
+        self.assertEqual(
+            {guest["uid"] for guest in result.unplaced}, {smoker.pk, man.pk}
+        )
+
+    def test_prefers_common_language(self):
+        guest = self.create_guest("guest@example.com", mother_tongue="Italian")
+        create_host()
+        italian = create_host("italian@example.com")
+        italian.languages.add(Language.objects.create(name="Italian"))
+
+        result = assign_hosts(dry_run=True)
+
+        self.assertEqual(result.guests, {italian.pk: [mock.ANY]})
+        self.assertEqual(result.cost, 0)
+        guest.refresh_from_db()
+        self.assertIsNone(guest.host_family)
+
+
+def create_helper(email, is_spontaneous=False, ressorts=(), slots=()):
+    user = get_user_model().objects.create(username=email, email=email)
+    helper = Helper.objects.create(
+        user=user,
+        given_name="Fanny",
+        surname="Hensel",
+        email=email,
+        phone="+41791234567",
+        is_spontaneous=is_spontaneous,
+    )
+    helper.ressorts.set(ressorts)
+    for date, slot in slots:
+        TimeSlot.objects.create(helper=helper, date=date, slot=slot)
+    return helper
+
+
+class SchedulingTest(TestCase):
+    def setUp(self):
+        self.bar = Ressort.objects.create(name="Bar")
+        self.stage = Ressort.objects.create(name="Stage")
+        self.date = DateSlot.objects.create(date=datetime.date(2027, 5, 1), note="")
+
+    def demand(self, ressort, slot, helpers=1):
+        return StaffingDemand.objects.create(
+            ressort=ressort, date=self.date, slot=slot, helpers=helpers
+        )
+
+    def test_availability_and_preferences(self):
+        bar = self.demand(self.bar, "morning")
+        stage = self.demand(self.stage, "morning")
+        evening = self.demand(self.bar, "evening", helpers=2)
+        anna = create_helper(
+            "anna@example.com", ressorts=[self.stage], slots=[(self.date, "whole_day")]
+        )
+        bert = create_helper(
+            "bert@example.com", ressorts=[self.bar], slots=[(self.date, "morning")]
+        )
+        spontaneous = create_helper("carl@example.com", is_spontaneous=True)
+        create_helper("dora@example.com")
+
+        rota = schedule_helpers()
+
+        self.assertEqual(
+            rota.shifts,
+            {bar.pk: [bert.pk], stage.pk: [anna.pk], evening.pk: mock.ANY},
+        )
+        self.assertEqual(set(rota.shifts[evening.pk]), {anna.pk, spontaneous.pk})
+        self.assertEqual(rota.missing, {})
+        self.assertEqual(Shift.objects.count(), 4)
+
+    def test_balances_load_and_keeps_shifts(self):
+        slots = ["morning", "afternoon", "evening"]
+        demands = [self.demand(self.bar, slot) for slot in slots]
+        helpers = [
+            create_helper(f"helper{i}@example.com", slots=[(self.date, "whole_day")])
+            for i in range(2)
+        ]
+        Shift.objects.create(demand=demands[0], helper=helpers[0])
+
+        rota = schedule_helpers(dry_run=True)
+
+        self.assertEqual(
+            rota.shifts, {demands[1].pk: [helpers[1].pk], demands[2].pk: mock.ANY}
+        )
+        self.assertEqual(Shift.objects.count(), 1)
+
+        rota = schedule_helpers(StaffingDemand.objects.filter(pk=demands[0].pk))
+        self.assertEqual(rota.shifts, {})
+
+    def test_rota_export(self):
+        demand = self.demand(self.bar, "morning", helpers=2)
+        create_helper("anna@example.com", slots=[(self.date, "morning")])
+        schedule_helpers()
+
+        dataset = ShiftResource().export(Shift.objects.all())
+
+        self.assertEqual(dataset.headers[:3], ["date", "slot", "ressort"])
+        self.assertEqual(
+            dataset[0][:5], ("2027-05-01", "Morning", "Bar", "Fanny", "Hensel")
+        )
+        self.assertEqual(schedule_helpers().missing, {demand.pk: 1})
+
+    def test_rota_export_joins_the_whole_path(self):
+        for slot in ("morning", "afternoon", "evening"):
+            self.demand(self.bar, slot, helpers=1)
+        for i in range(3):
+            create_helper(
+                f"helper{i}@example.com",
+                slots=[
+                    (self.date, slot) for slot in ("morning", "afternoon", "evening")
+                ],
+            )
+        schedule_helpers()
+        self.assertEqual(Shift.objects.count(), 3)
+
+        with self.assertNumQueries(1):
+            rows = list(resource_rows(ShiftResource(), Shift.objects.all()))
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row[2] for row in rows[1:]}, {"Bar"})
+
+
+class TransportTest(TestCase):
+    def setUp(self):
+        self.instrument = Instrument.objects.create(name="Piano")
+        self.start = datetime.datetime(2027, 5, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def create_jury(self, email, minutes, location="Zurich Airport", terminal="1"):
+        user = get_user_model().objects.create(username=email, email=email)
+        return JuryMember.objects.create(
+            user=user,
+            given_name="Franz",
+            surname=email.split("@")[0],
+            email=email,
+            phone="+41791234567",
+            instrument=self.instrument,
+            transport_arrival=True,
+            date_of_arrival=self.start + datetime.timedelta(minutes=minutes),
+            location_of_arrival=location,
+            terminal_of_arrival=terminal,
+        )
+
+    def test_pools_by_place_window_and_capacity(self):
+        for i, minutes in enumerate([0, 10, 20, 30, 50, 200]):
+            self.create_jury(f"early{i}@example.com", minutes)
+        self.create_jury("bern@example.com", 5, location="Bern ")
+        self.create_jury(
+            "terminal@example.com", 5, location=" zurich  airport", terminal="2"
+        )
+        self.create_jury("same@example.com", 15, location="ZURICH AIRPORT")
+        JuryMember.objects.filter(surname="early5").update(transport_arrival=False)
+
+        runs = transport_runs(window=30, capacity=4)
+
+        self.assertEqual(
+            [[member["name"] for member in run.members] for run in runs],
+            [
+                ["Franz early0", "Franz early1", "Franz same", "Franz early2"],
+                ["Franz bern"],
+                ["Franz terminal"],
+                ["Franz early3", "Franz early4"],
+            ],
+        )
+        self.assertEqual(runs[0].end - runs[0].start, datetime.timedelta(minutes=20))
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_report_and_export(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        self.create_jury("anna@example.com", 0)
+        self.create_jury("bert@example.com", 90)
+        url = reverse("admin:tmc_jurymember_transport")
+
+        response = self.client.get(url, {"window": 60})
+        self.assertEqual(len(response.context["runs"]), 2)
+        self.assertContains(response, "Franz anna")
+
+        response = self.client.get(url, {"window": 120, "format": "csv"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "run,direction,location,terminal,time,name,phone")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(
+            lines[2].startswith("1,arrival,Zurich Airport,1,2027-05-01 11:30")
+        )
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_invalid_parameters_fall_back(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+        self.create_jury("anna@example.com", 0)
+        url = reverse("admin:tmc_jurymember_transport")
+
+        response = self.client.get(url, {"window": "soon", "capacity": "many"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["window"], config.TRANSPORT_WINDOW)
+        self.assertEqual(response.context["capacity"], config.VEHICLE_CAPACITY)
+
+        response = self.client.get(url, {"window": 10**20, "capacity": -3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["window"], 24 * 60)
+        self.assertEqual(response.context["capacity"], 1)
+        self.assertEqual(len(response.context["runs"]), 1)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ExclusionGraphTest(TestCase):
+    def setUp(self):
+        round = Round.objects.create(
+            name="Round 1", instrument=Instrument.objects.create(name="Piano")
+        )
+        self.set_list = SetList.objects.create(name="A", round=round, required=2)
+        self.a, self.b, self.c, self.d = [
+            Piece.objects.create(name=name, set_list=self.set_list)
+            for name in ("Bach", "Chopin", "Liszt", "Ravel")
+        ]
+        other = SetList.objects.create(name="B", round=round)
+        self.e = Piece.objects.create(name="Satie", set_list=other)
+        self.a.excludes.add(self.b, self.e)
+        self.c.excludes.add(self.d)
+
+    def test_validation_from_cache(self):
+        self.set_list.is_valid_selection([self.a, self.c])
+        with self.assertNumQueries(0):
+            self.set_list.is_valid_selection([self.b, self.d])
+            with self.assertRaisesMessage(
+                ValidationError,
+                "The selection of Bach prevents the selection of Chopin",
+            ):
+                self.set_list.is_valid_selection([self.a, self.b])
+        with self.assertRaisesMessage(ValidationError, "amount of pieces is wrong"):
+            self.set_list.is_valid_selection([self.a])
+
+    def test_invalidated_on_changes(self):
+        self.set_list.is_valid_selection([self.a, self.d])
+
+        self.a.excludes.add(self.d)
+        with self.assertRaises(ValidationError):
+            self.set_list.is_valid_selection([self.a, self.d])
+
+        self.a.excludes.clear()
+        self.set_list.is_valid_selection([self.a, self.b])
+
+        self.d.set_list = self.e.set_list
+        self.d.save()
+        self.assertNotIn(self.d.pk, exclusion_graph(self.set_list.pk).pieces)
+
+    def test_combinations(self):
+        graph = exclusion_graph(self.set_list.pk)
+
+        combinations = [
+            {Piece.objects.get(pk=pk).name for pk in graph.members(mask)}
+            for mask in graph.combinations(self.set_list.required)
+        ]
+
+        self.assertCountEqual(
+            combinations,
+            [
+                {"Bach", "Liszt"},
+                {"Bach", "Ravel"},
+                {"Chopin", "Liszt"},
+                {"Chopin", "Ravel"},
+            ],
+        )
+        self.assertEqual(len(list(graph.combinations(3))), 0)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class RepertoireStatisticsTest(TestCase):
+    def setUp(self):
+        instrument = Instrument.objects.create(name="Piano")
+        round = Round.objects.create(name="Round 1", instrument=instrument)
+        self.set_list = SetList.objects.create(name="A", round=round)
+        self.pieces = [
+            Piece.objects.create(name=name, set_list=self.set_list)
+            for name in ("Bach", "Chopin", "Liszt")
+        ]
+        for i, chosen in enumerate([[0, 1], [0, 1], [0, 2], []]):
+            selection = Selection.objects.create(
+                set_list=self.set_list,
+                inscription=create_inscription(
+                    instrument, f"contestant{i}@example.com"
+                ),
+                is_valid=bool(chosen),
+            )
+            selection.pieces.set(self.pieces[j] for j in chosen)
+        self.selection = selection
+
+    def test_statistics(self):
+        with self.assertNumQueries(3):
+            statistics = repertoire_statistics()
+
+        self.assertEqual(
+            [
+                (row["name"], row["selections"], row["share"])
+                for row in statistics["pieces"]
+            ],
+            [("Bach", 3, 0.75), ("Chopin", 2, 0.5), ("Liszt", 1, 0.25)],
+        )
+        self.assertEqual(
+            [(row["selections"], row["unfinished"]) for row in statistics["set_lists"]],
+            [(4, 1)],
+        )
+        self.assertEqual(
+            [
+                (row["first"], row["second"], row["selections"])
+                for row in statistics["pairs"]
+            ],
+            [("Bach", "Chopin", 2), ("Bach", "Liszt", 1)],
+        )
+
+    def test_pairs_of_pieces_with_the_same_title(self):
+        violin = Instrument.objects.create(name="Violin")
+        set_list = SetList.objects.create(
+            name="A", round=Round.objects.create(name="Round 1", instrument=violin)
+        )
+        bach, chopin = (
+            Piece.objects.create(name=name, set_list=set_list)
+            for name in ("Bach", "Chopin")
+        )
+        selection = Selection.objects.create(
+            set_list=set_list,
+            inscription=create_inscription(violin, "violinist@example.com"),
+        )
+        selection.pieces.set([bach, chopin])
+
+        self.assertEqual(
+            [
+                (row["instrument"], row["first"], row["second"], row["selections"])
+                for row in repertoire_statistics()["pairs"]
+            ],
+            [
+                ("Piano", "Bach", "Chopin", 2),
+                ("Violin", "Bach", "Chopin", 1),
+                ("Piano", "Bach", "Liszt", 1),
+            ],
+        )
+
+    def test_cached_until_selections_change(self):
+        repertoire_statistics()
+        with self.assertNumQueries(0):
+            repertoire_statistics()
+
+        self.selection.pieces.add(self.pieces[2])
+
+        self.assertEqual(repertoire_statistics()["pieces"][-1]["selections"], 2)
+
+    @override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+    )
+    def test_admin_page(self):
+        user = get_user_model().objects.create_superuser("admin", "admin@example.com")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("admin:tmc_selection_statistics"))
+
+        self.assertContains(response, "<td>Bach, Chopin</td>", html=True)
+        self.assertContains(response, "<td>75%</td>", html=True)
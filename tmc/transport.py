@@ -0,0 +1,128 @@
+import datetime
+from dataclasses import dataclass, field
+from operator import itemgetter
+
+from constance import config
+from django.utils import timezone
+
+from tmc.models import JuryMember
+
+DIRECTIONS = ("arrival", "departure")
+
+
+@dataclass
+class Run:
+    """Jury members picked up together at one location and terminal."""
+
+    direction: str
+    location: str
+    terminal: str
+    members: list = field(default_factory=list)
+
+    @property
+    def start(self):
+        return self.members[0]["time"]
+
+    @property
+    def end(self):
+        return self.members[-1]["time"]
+
+
+def place_key(value):
+    return " ".join(value.split()).casefold()
+
+
+def transport_requests(direction, queryset=None):
+    """
+    The jury members that need transport on `direction` as rows with a common
+    `time`, `location` and `terminal`, the ones without a time are left out.
+    """
+    if queryset is None:
+        queryset = JuryMember.objects.all()
+
+    return [
+        {
+            "id": row["id"],
+            "name": f"{row['given_name']} {row['surname']}",
+            "phone": row["phone"],
+            "time": row[f"date_of_{direction}"],
+            "location": row[f"location_of_{direction}"],
+            "terminal": row[f"terminal_of_{direction}"],
+        }
+        for row in queryset.filter(
+            **{f"transport_{direction}": True, f"date_of_{direction}__isnull": False}
+        ).values(
+            "id",
+            "given_name",
+            "surname",
+            "phone",
+            f"date_of_{direction}",
+            f"location_of_{direction}",
+            f"terminal_of_{direction}",
+        )
+    ]
+
+
+def pool(direction, rows, window, capacity):
+    """
+    Split `rows` into runs of at most `capacity` people at the same location
+    and terminal within `window` of the first one.
+
+    One sort and one sweep: a run takes the next person of its place until
+    the window or the vehicle is full. Starting each run with the earliest
+    person that is left gives the fewest runs for a place.
+    """
+    runs = []
+    current = place = None
+
+    def order(row):
+        return place_key(row["location"]), place_key(row["terminal"]), row["time"]
+
+    for key, row in sorted(((order(row), row) for row in rows), key=itemgetter(0)):
+        if (
+            key[:2] != place
+            or row["time"] - current.start > window
+            or len(current.members) >= capacity
+        ):
+            current = Run(direction, row["location"], row["terminal"])
+            place = key[:2]
+            runs.append(current)
+        current.members.append(row)
+
+    return runs
+
+
+def transport_runs(queryset=None, window=None, capacity=None):
+    """
+    The pickup runs of both directions in the order of time, the window in
+    minutes and the capacity default to the TRANSPORT_WINDOW and
+    VEHICLE_CAPACITY settings.
+    """
+    if window is None:
+        window = config.TRANSPORT_WINDOW
+    if capacity is None:
+        capacity = config.VEHICLE_CAPACITY
+    window = datetime.timedelta(minutes=window)
+
+    runs = []
+    for direction in DIRECTIONS:
+        rows = transport_requests(direction, queryset)
+        runs.extend(pool(direction, rows, window, capacity))
+    return sorted(runs, key=lambda run: run.start)
+
+
+def run_rows(runs):
+    """The headers and a row per jury member of `runs`, for `tmc.exports.table_csv`."""
+    yield ["run", "direction", "location", "terminal", "time", "name", "phone"]
+
+    for number, run in enumerate(runs, 1):
+        for member in run.members:
+            yield [
+                number,
+                run.direction,
+                run.location,
+                run.terminal,
+                f"{timezone.localtime(member['time']):%Y-%m-%d %H:%M}",
+                member["name"],
+                member["phone"],
+            ]
@@ -0,0 +1,190 @@
+import math
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.utils import timezone
+
+from tmc.models import Inscription, Recording, RequiredRecording, UploadAttempt
+from tmc.storage import DEFAULT_BACKEND, Backend, get_backend
+
+# S3 allows at most 10000 parts per upload and at least 5 MiB per part
+# (except for the last one).
+MAX_PARTS = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Number of part urls presigned together with the start of an upload
+FIRST_URLS = 20
+
+# The file types the upload form accepts
+RECORDING_EXTENSIONS = ("mov", "mp4", "mkv", "wav", "webm")
+
+
+class UploadError(Exception):
+    """A request of the upload script that can't be served, answered with 400."""
+
+
+def clean_extension(extension):
+    """The extension becomes part of the key, so only known ones are let through."""
+    extension = str(extension).lower()
+    if extension not in RECORDING_EXTENSIONS:
+        raise UploadError(f"unsupported file type {extension!r}")
+    return extension
+
+
+def clean_size(size):
+    """The size of a file to upload in bytes, which has to be a positive integer."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError(f"invalid size {size!r}")
+    if size <= 0:
+        raise UploadError("the file is empty")
+    return size
+
+
+def recording_key(instance: Inscription, requirement: RequiredRecording, extension):
+    name = f"{requirement.nr:02}_{requirement.slug}.{clean_extension(extension)}"
+
+    return f"{instance.uid}/recordings/{name}"
+
+
+def presign_read(instance: Inscription, backend: Backend, key):
+    """Presign `key` for reading, as long as it is one of the files of `instance`."""
+    if not key.startswith(f"{instance.uid}/") or ".." in key:
+        raise UploadError(f"{key!r} doesn't belong to {instance.uid}")
+
+    return backend.presign_get(key)
+
+
+def part_size_for(size):
+    part_size = max(settings.RECORDING_PART_SIZE, MIN_PART_SIZE)
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def part_count(size, part_size):
+    return max(1, math.ceil(size / part_size))
+
+
+def switch_backend(recording: Recording, name, key, resume=""):
+    """
+    Let the next upload of `recording` go to the backend called `name`.
+
+    A multipart upload can't move between buckets: one that is resumed stays
+    where its parts are, whatever the latency probe says this time, one that
+    is still open on another backend for a new upload is aborted there.
+    Returns the backend.
+    """
+    current = recording.upload_backend or DEFAULT_BACKEND
+    if recording.upload_id and resume == recording.upload_id:
+        recording.upload_backend = current
+        return get_backend(current)
+
+    if recording.upload_id and current != name:
+        get_backend(current).abort_multipart(key, recording.upload_id)
+        recording.upload_id = ""
+
+    recording.upload_backend = name
+    return get_backend(name)
+
+
+def start_multipart(
+    backend: Backend, recording: Recording, key, content_type="", resume="", size=None
+):
+    """
+    Open a multipart upload for `key`, or resume the one stored on the recording.
+
+    An upload can only be resumed if the client still knows its id, otherwise a
+    reload with a different file would append to the wrong upload. Returns the
+    upload id and the numbers of the parts that were already received, the
+    caller saves the recording.
+    """
+    recording.expected_size = size
+
+    if resume and resume == recording.upload_id:
+        try:
+            parts = backend.list_parts(key, resume)
+            return resume, [part["PartNumber"] for part in parts]
+        except (ClientError, OSError):
+            # the upload expired or was completed in the meantime
+            pass
+
+    if recording.upload_id:
+        backend.abort_multipart(key, recording.upload_id)
+
+    upload_id = backend.create_multipart(key, content_type)
+    recording.upload_id = upload_id
+
+    return upload_id, []
+
+
+def presign_parts(backend: Backend, key, upload_id, part_numbers):
+    return {
+        number: backend.presign_part(key, upload_id, number) for number in part_numbers
+    }
+
+
+def complete_multipart(backend: Backend, recording: Recording, key, upload_id):
+    """
+    Assemble the uploaded parts on S3.
+
+    The part list is read back from S3 instead of trusting the ETags collected
+    in the browser, which also means the bucket doesn't need to expose them
+    through CORS. It has to run from 1 without gaps and add up to the size
+    announced at the start, otherwise an `UploadError` is raised and the
+    upload stays open.
+    """
+    parts = backend.list_parts(key, upload_id)
+    numbers = [part["PartNumber"] for part in parts]
+
+    if not parts or numbers != list(range(1, len(parts) + 1)):
+        raise UploadError(f"parts of {key} are missing")
+    if recording.expected_size is not None and recording.expected_size != sum(
+        part["Size"] for part in parts
+    ):
+        raise UploadError(f"{key} doesn't have the announced size")
+
+    backend.complete_multipart(
+        key,
+        upload_id,
+        [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in parts],
+    )
+
+    recording.upload_id = ""
+    recording.backend = recording.upload_backend or DEFAULT_BACKEND
+
+
+def open_attempts(instance: Inscription, requirements):
+    return UploadAttempt.objects.filter(
+        inscription=instance,
+        requirement__in=requirements,
+        status=UploadAttempt.STARTED,
+    )
+
+
+def record_started(instance: Inscription, sizes, resumed=()):
+    """
+    Track new uploads, `sizes` maps requirement ids to file sizes in bytes.
+
+    The open attempt of a requirement in `resumed` goes on, the ones of the
+    other requirements are closed as restarted.
+    """
+    restarted = [requirement for requirement in sizes if requirement not in resumed]
+    open_attempts(instance, restarted).update(
+        status=UploadAttempt.FAILED, finished=timezone.now(), error="restarted"
+    )
+    running = set(
+        open_attempts(instance, resumed).values_list("requirement_id", flat=True)
+    )
+    UploadAttempt.objects.bulk_create(
+        UploadAttempt(inscription=instance, requirement_id=requirement, size=size)
+        for requirement, size in sizes.items()
+        if requirement not in running
+    )
+
+
+def record_finished(instance: Inscription, requirements, error=""):
+    open_attempts(instance, requirements).update(
+        status=UploadAttempt.FAILED if error else UploadAttempt.COMPLETED,
+        finished=timezone.now(),
+        error=error[: UploadAttempt._meta.get_field("error").max_length],
+    )
@@ -1,7 +1,30 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 
-from tmc.views import helper_signup, host_signup, jury_signup, landing, recordings, set_list_view, signed_upload_url, signup, update_documents, update_signup, upload_completed, view_helper, view_jury, view_signup, login_view, view_host
+from tmc.views import (
+    helper_signup,
+    host_signup,
+    jury_signup,
+    landing,
+    login_view,
+    recording_file,
+    recording_upload,
+    recordings,
+    set_list_view,
+    signed_part_urls,
+    signed_upload_url,
+    signed_upload_urls,
+    signup,
+    update_documents,
+    update_signup,
+    upload_completed,
+    uploads_completed,
+    uploads_failed,
+    view_helper,
+    view_host,
+    view_jury,
+    view_signup,
+)
 
 app_name = "tmc"
 
@@ -12,12 +35,20 @@ urlpatterns = [
     path('inscription/<uuid:pk>/recordings/', recordings, name="recordings"),
     path('inscription/<uuid:pk>/documents/', update_documents, name="documents"),
     path('inscription/<uuid:pk>/setlist/', set_list_view, name="setlist"),
+    path('inscription/<uuid:pk>/upload/', signed_upload_urls, name="upload_recording_urls"),
+    path('inscription/<uuid:pk>/upload/done/', uploads_completed, name="upload_recordings_done"),
+    path('inscription/<uuid:pk>/upload/failed/', uploads_failed, name="upload_recordings_failed"),
     path('inscription/<uuid:inscription_pk>/upload/<int:requirement_pk>/url/',
          signed_upload_url,
          name="upload_recording_url"),
+    path('inscription/<uuid:inscription_pk>/upload/<int:requirement_pk>/parts/',
+         signed_part_urls,
+         name="upload_recording_parts"),
     path('inscription/<uuid:inscription_pk>/upload/<int:requirement_pk>/done/',
          upload_completed,
          name="upload_recording_done"),
+    path('recordings/<str:token>/', recording_file, name="recording_file"),
+    path('recordings/<str:token>/upload/', recording_upload, name="recording_upload"),
     path('host-family/<int:pk>/', view_host, name="host_detail"),
     path('host-family/', host_signup, name="host_signup"),
     path('helper/<int:pk>/', view_helper, name="helper_detail"),
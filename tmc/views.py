@@ -1,15 +1,31 @@
-import boto3
-from django.conf import settings
+import functools
+import json
+import mimetypes
+import os
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db import transaction
 from django.forms import inlineformset_factory, modelformset_factory
-from django.http import JsonResponse
+from django.conf import settings
+from django.core import signing
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls.base import reverse
 from django.utils.translation import gettext as _
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from django_q.tasks import async_task
 
+from tmc import uploads
 from tmc.forms import (
     DocumentForm,
     HelperForm,
@@ -23,12 +39,15 @@ from tmc.forms import (
 )
 from tmc.models import (
     Helper,
+    Inscription,
     Recording,
     RequiredRecording,
     Selection,
     SetList,
     TimeSlot,
 )
+from tmc.progress import update_progress
+from tmc.repertoire import invalidate_statistics
 from tmc.services import (
     all_fields,
     fetch_helper,
@@ -42,10 +61,29 @@ from tmc.services import (
     process_update,
     send_auth_message,
 )
+from tmc.storage import (
+    LocalBackend,
+    choose_backend,
+    get_backend,
+    probe_urls,
+)
 
 # Create your views here.
 
 
+def upload_errors(view):
+    """Answer the `UploadError`s of the upload views with 400 instead of 500."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except uploads.UploadError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return wrapper
+
+
 def landing(request):
     if not request.user.is_authenticated:
         return redirect("tmc:signup")
@@ -143,67 +181,431 @@ def recordings(request, pk):
         requirement.recording = Recording.objects.filter(
             requirement=requirement, uploader=instance
         ).first()
+        if requirement.recording:
+            backend = get_backend(requirement.recording.backend)
+        if requirement.recording and requirement.recording.is_complete:
+            requirement.recording.playback_url = uploads.presign_read(
+                instance, backend, requirement.recording.playback_file().name
+            )
+        if requirement.recording and requirement.recording.poster:
+            requirement.recording.poster_url = uploads.presign_read(
+                instance, backend, requirement.recording.poster.name
+            )
         requirements.append(requirement)
 
     return render(
         request,
         "tmc/recordings.html",
-        {"requirements": requirements, "instance": instance},
+        {
+            "requirements": requirements,
+            "instance": instance,
+            "probe_urls": probe_urls(),
+        },
     )
 
 
 @require_POST
 @login_required
+@upload_errors
 def signed_upload_url(request, inscription_pk, requirement_pk):
-    session = boto3.Session()
-
     requirement = get_object_or_404(RequiredRecording, pk=requirement_pk)
 
     instance = fetch_inscription(inscription_pk, request.user)
-    extension = request.POST["extension"]
-
-    client = session.client(
-        "s3",
-        region_name=settings.AWS_S3_REGION_NAME,
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_S3_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_S3_SECRET_ACCESS_KEY,
+    extension = request.POST.get("extension", "")
+
+    name = choose_backend(instance, request.POST.get("backend", ""))
+    path = uploads.recording_key(instance, requirement, extension)
+
+    if "size" not in request.POST:
+        uploads.record_started(instance, {requirement.pk: 0})
+        return JsonResponse(
+            {"url": get_backend(name).presign_put(path), "backend": name}
+        )
+
+    size = uploads.clean_size(request.POST["size"])
+    recording, _ = Recording.objects.get_or_create(
+        uploader=instance, requirement=requirement
+    )
+    resume = request.POST.get("upload_id", "")
+    backend = uploads.switch_backend(recording, name, path, resume)
+    upload_id, parts = uploads.start_multipart(
+        backend,
+        recording,
+        path,
+        content_type=request.POST.get("content_type", ""),
+        resume=resume,
+        size=size,
+    )
+    recording.save(
+        update_fields=["upload_id", "upload_backend", "expected_size", "updated"]
+    )
+    uploads.record_started(
+        instance,
+        {requirement.pk: size},
+        resumed=[requirement.pk] if resume and upload_id == resume else [],
     )
-    name = f"{requirement.nr:02}_{requirement.slug}.{extension}"
 
-    path = f"{instance.uid}/recordings/{name}"
+    return JsonResponse(
+        {
+            "backend": recording.upload_backend,
+            "upload_id": upload_id,
+            "part_size": uploads.part_size_for(size),
+            "parts": parts,
+        }
+    )
 
-    url = client.generate_presigned_url(
-        ClientMethod="put_object",
-        Params={
-            "Bucket": settings.AWS_STORAGE_BUCKET_NAME,
-            "Key": path,
-        },
-        ExpiresIn=60 * 30,
+
+@require_POST
+@login_required
+@upload_errors
+def signed_part_urls(request, inscription_pk, requirement_pk):
+    requirement = get_object_or_404(RequiredRecording, pk=requirement_pk)
+    instance = fetch_inscription(inscription_pk, request.user)
+    extension = request.POST.get("extension", "")
+    upload_id = request.POST.get("upload_id", "")
+
+    if not upload_id:
+        raise uploads.UploadError("missing upload id")
+
+    recording = get_object_or_404(
+        Recording, uploader=instance, requirement=requirement, upload_id=upload_id
+    )
+
+    try:
+        numbers = [int(number) for number in request.POST.get("parts", "").split(",")]
+    except ValueError:
+        raise uploads.UploadError("invalid part numbers")
+
+    if not all(1 <= number <= uploads.MAX_PARTS for number in numbers):
+        raise uploads.UploadError("invalid part numbers")
+
+    urls = uploads.presign_parts(
+        get_backend(recording.upload_backend),
+        uploads.recording_key(instance, requirement, extension),
+        recording.upload_id,
+        numbers,
     )
 
-    return JsonResponse({"url": url})
+    return JsonResponse({"urls": urls})
 
 
 @require_POST
 @login_required
+@upload_errors
 def upload_completed(request, inscription_pk, requirement_pk):
     requirement = get_object_or_404(RequiredRecording, pk=requirement_pk)
     instance = fetch_inscription(inscription_pk, request.user)
-    extension = request.POST["extension"]
+    path = uploads.recording_key(
+        instance, requirement, request.POST.get("extension", "")
+    )
 
     recording, _ = Recording.objects.get_or_create(
         uploader=instance, requirement=requirement
     )
-    name = f"{requirement.nr:02}_{requirement.slug}.{extension}"
 
-    path = f"{instance.uid}/recordings/{name}"
+    upload_id = request.POST.get("upload_id")
+    if upload_id:
+        if upload_id != recording.upload_id:
+            raise uploads.UploadError("unknown upload")
+        uploads.complete_multipart(
+            get_backend(recording.upload_backend),
+            recording,
+            path,
+            upload_id,
+        )
+    else:
+        # single uploads don't keep a recording around while they run
+        recording.backend = choose_backend(instance, request.POST.get("backend", ""))
+        recording.expected_size = None
+
+    backend = get_backend(recording.backend)
 
     recording.recording = path
-    recording.is_complete = True
+    recording.is_complete = False
+    recording.preview = ""
+    recording.poster = ""
     recording.save()
 
-    return JsonResponse({"url": recording.recording.url})
+    uploads.record_finished(instance, [requirement.pk])
+
+    async_task("tmc.tasks.verify_recording", recording.pk)
+
+    return JsonResponse({"url": uploads.presign_read(instance, backend, path)})
+
+
+def parse_files(request, extension=True):
+    """
+    Read the `files` list of a batch upload request, keyed by requirement.
+
+    Sizes and extensions (required unless `extension` is false) are checked
+    before any upload is touched, a payload the upload script wouldn't send
+    raises `UploadError`.
+    """
+    try:
+        files = json.loads(request.body)["files"]
+        files = {int(file["requirement"]): file for file in files}
+        for file in files.values():
+            if "size" in file:
+                file["size"] = uploads.clean_size(file["size"])
+            if extension:
+                file["extension"] = uploads.clean_extension(file["extension"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise uploads.UploadError(f"malformed files: {e}")
+
+    return files
+
+
+def parse_hint(request):
+    """The backend the upload script found to be the fastest, if any."""
+    try:
+        return str(json.loads(request.body).get("backend") or "")
+    except (ValueError, AttributeError):
+        return ""
+
+
+def bulk_upsert_recordings(recordings, fields):
+    Recording.objects.bulk_create(
+        recordings,
+        update_conflicts=True,
+        unique_fields=["uploader", "requirement"],
+        update_fields=fields + ["updated"],
+    )
+
+
+@require_POST
+@login_required
+@upload_errors
+def signed_upload_urls(request, pk):
+    instance = fetch_inscription(pk, request.user)
+    files = parse_files(request)
+
+    requirements = RequiredRecording.objects.filter(
+        pk__in=files, instrument_id=instance.instrument_id
+    )
+    recordings = {
+        recording.requirement_id: recording
+        for recording in Recording.objects.filter(
+            uploader=instance, requirement__in=files
+        )
+    }
+    name = choose_backend(instance, parse_hint(request))
+
+    results = {}
+    started = []
+    resumed = []
+    for requirement in requirements:
+        file = files[requirement.pk]
+        path = uploads.recording_key(instance, requirement, file["extension"])
+
+        if "size" not in file:
+            results[requirement.pk] = {
+                "url": get_backend(name).presign_put(path),
+                "backend": name,
+            }
+            continue
+
+        recording = recordings.get(requirement.pk) or Recording(
+            uploader=instance, requirement=requirement
+        )
+        resume = file.get("upload_id", "")
+        backend = uploads.switch_backend(recording, name, path, resume)
+        upload_id, parts = uploads.start_multipart(
+            backend,
+            recording,
+            path,
+            content_type=file.get("content_type", ""),
+            resume=resume,
+            size=file["size"],
+        )
+        started.append(recording)
+        if resume and upload_id == resume:
+            resumed.append(requirement.pk)
+
+        part_size = uploads.part_size_for(file["size"])
+        pending = [
+            number
+            for number in range(1, uploads.part_count(file["size"], part_size) + 1)
+            if number not in parts
+        ]
+        results[requirement.pk] = {
+            "backend": recording.upload_backend,
+            "upload_id": upload_id,
+            "part_size": part_size,
+            "parts": parts,
+            "urls": uploads.presign_parts(
+                backend, path, upload_id, pending[: uploads.FIRST_URLS]
+            ),
+        }
+
+    bulk_upsert_recordings(started, ["upload_id", "upload_backend", "expected_size"])
+    uploads.record_started(
+        instance, {pk: files[pk].get("size", 0) for pk in results}, resumed
+    )
+
+    return JsonResponse({"uploads": results})
+
+
+@require_POST
+@login_required
+@upload_errors
+def uploads_completed(request, pk):
+    instance = fetch_inscription(pk, request.user)
+    files = parse_files(request)
+
+    requirements = RequiredRecording.objects.filter(
+        pk__in=files, instrument_id=instance.instrument_id
+    )
+    recordings = {
+        recording.requirement_id: recording
+        for recording in Recording.objects.filter(
+            uploader=instance, requirement__in=files
+        )
+    }
+
+    urls = {}
+    failed = {}
+    completed = []
+    for requirement in requirements:
+        file = files[requirement.pk]
+        path = uploads.recording_key(instance, requirement, file["extension"])
+        recording = recordings.get(requirement.pk) or Recording(
+            uploader=instance, requirement=requirement
+        )
+
+        upload_id = file.get("upload_id")
+        if upload_id:
+            if upload_id != recording.upload_id:
+                failed[requirement.pk] = "unknown upload"
+                continue
+            # one upload that can't be completed doesn't hold back the others
+            try:
+                uploads.complete_multipart(
+                    get_backend(recording.upload_backend),
+                    recording,
+                    path,
+                    upload_id,
+                )
+            except (ClientError, OSError, uploads.UploadError) as e:
+                failed[requirement.pk] = str(e)
+                continue
+        else:
+            recording.backend = choose_backend(instance, file.get("backend", ""))
+            recording.expected_size = None
+
+        recording.recording = path
+        recording.is_complete = False
+        recording.preview = ""
+        recording.poster = ""
+        completed.append(recording)
+        urls[requirement.pk] = uploads.presign_read(
+            instance, get_backend(recording.backend), path
+        )
+
+    bulk_upsert_recordings(
+        completed,
+        [
+            "recording",
+            "backend",
+            "is_complete",
+            "upload_id",
+            "expected_size",
+            "preview",
+            "poster",
+        ],
+    )
+    update_progress(Inscription.objects.filter(pk=instance.pk))
+    uploads.record_finished(instance, urls)
+    for requirement, error in failed.items():
+        uploads.record_finished(instance, [requirement], error)
+
+    for recording_pk in Recording.objects.filter(
+        uploader=instance, requirement__in=urls
+    ).values_list("pk", flat=True):
+        async_task("tmc.tasks.verify_recording", recording_pk)
+
+    return JsonResponse({"urls": urls, "failed": failed})
+
+
+@require_POST
+@login_required
+@upload_errors
+def uploads_failed(request, pk):
+    """Let the upload script report uploads it gave up on."""
+    instance = fetch_inscription(pk, request.user)
+    files = parse_files(request, extension=False)
+
+    for requirement, file in files.items():
+        uploads.record_finished(
+            instance, [requirement], str(file.get("error") or "failed")
+        )
+
+    return JsonResponse({})
+
+
+@require_http_methods(["GET", "HEAD"])
+def recording_file(request, token):
+    """
+    Send a recording of the local storage.
+
+    The signed token authorizes the request like a presigned S3 url. The file
+    itself is sent by the web server, which also answers range requests, so no
+    worker is tied up while a video streams. With nginx this needs an internal
+    location that aliases MEDIA_ROOT:
+
+        location /protected/ { internal; alias /media/; }
+    """
+    backend = get_backend()
+
+    if not isinstance(backend, LocalBackend):
+        raise Http404()
+
+    try:
+        key = backend.unsign_read(token)["key"]
+    except signing.BadSignature:
+        raise Http404()
+
+    path = backend.path(key)
+
+    if not os.path.exists(path):
+        raise Http404()
+
+    if not settings.SENDFILE_HEADER:
+        return FileResponse(open(path, "rb"))
+
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(key)[0] or "application/octet-stream"
+    )
+    if settings.SENDFILE_HEADER == "X-Accel-Redirect":
+        response[settings.SENDFILE_HEADER] = settings.SENDFILE_URL + quote(key)
+    else:
+        response[settings.SENDFILE_HEADER] = path
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+def recording_upload(request, token):
+    """Receive a file or a part of a multipart upload for the local storage."""
+    backend = get_backend()
+
+    if not isinstance(backend, LocalBackend):
+        raise Http404()
+
+    try:
+        data = backend.unsign_write(token)
+    except signing.BadSignature:
+        return HttpResponseForbidden()
+
+    if "upload" in data:
+        if not os.path.isdir(backend.upload_path(data["upload"])):
+            raise Http404()
+        target = backend.upload_path(data["upload"], data["part"])
+    else:
+        target = backend.path(data["key"])
+
+    backend.write(target, iter(lambda: request.read(64 * 1024), b""))
+
+    return HttpResponse()
 
 
 @login_required
@@ -218,19 +620,22 @@ def set_list_view(request, pk):
         )
     SelectionFormSet = modelformset_factory(Selection, form=SelectionForm, extra=0)
 
-    formset = SelectionFormSet(queryset=Selection.objects.filter(inscription=instance))
+    selections = Selection.objects.filter(inscription=instance).select_related(
+        "set_list"
+    )
+    formset = SelectionFormSet(queryset=selections)
 
     if request.method == "POST":
 
-        formset = SelectionFormSet(
-            request.POST, queryset=Selection.objects.filter(inscription=instance)
-        )
+        formset = SelectionFormSet(request.POST, queryset=selections)
 
         if formset.is_valid():
 
             formset.save()
 
             Selection.objects.filter(inscription=instance).update(is_valid=True)
+            update_progress(Inscription.objects.filter(pk=instance.pk))
+            invalidate_statistics()
 
     return render(
         request,